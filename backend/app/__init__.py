@@ -3,7 +3,7 @@ from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from dotenv import load_dotenv
 from config import config
-from app.models import db
+from app.models import db, upgrade_schema
 import os
 
 # 加载环境变量
@@ -23,6 +23,10 @@ def create_app(config_name='development'):
     CORS(app, origins=app.config['CORS_ORIGINS'], supports_credentials=True)
     JWTManager(app)
 
+    from app.services.event_bus import event_bus, record_events
+    event_bus.init_app(app)
+    record_events.init_app(app)
+
     # 注册蓝图
     from app.api.user import bp as user_bp
     from app.api.paper import bp as paper_bp
@@ -36,8 +40,13 @@ def create_app(config_name='development'):
     app.register_blueprint(chat_bp, url_prefix='/api/chat')
     app.register_blueprint(health_bp, url_prefix='/api')
 
+    # 命令行：flask --app run papers ...
+    from app.cli import papers_cli
+    app.cli.add_command(papers_cli)
+
     # 创建数据库表
     with app.app_context():
         db.create_all()
+        upgrade_schema()
 
     return app
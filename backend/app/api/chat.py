@@ -1,10 +1,16 @@
 import json
 import logging
-from datetime import datetime
-from flask import Blueprint, request, jsonify
+from datetime import datetime, timedelta
+from typing import Dict, Iterator
+from flask import Blueprint, Response, current_app, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models import db, Paper, GenerateRecord, KnowledgeBase
+from app.models import db, Paper, GenerateRecord, KnowledgeBase, TranslationSegment
 from app.services.ai_generator import AIGenerator
+from app.services import page_store, translation
+from app.services.chunker import input_budget, max_chars
+from app.services.event_bus import sse
+from app.services.generate_tasks import enqueue_generation
+from app.api.generate import request_flag
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -114,12 +120,12 @@ def translate_paper():
     if not paper:
         return jsonify({'code': 404, 'message': '论文不存在'}), 404
 
-    # 检查是否有进行中的翻译任务
-    existing = GenerateRecord.query.filter_by(
-        user_id=user_id,
-        paper_id=paper_id,
-        type='translate',
-        status='generating'
+    # 检查是否有排队或进行中的翻译任务
+    existing = GenerateRecord.query.filter(
+        GenerateRecord.user_id == user_id,
+        GenerateRecord.paper_id == paper_id,
+        GenerateRecord.type == 'translate',
+        GenerateRecord.status.in_(['pending', 'generating'])
     ).first()
 
     if existing:
@@ -130,93 +136,110 @@ def translate_paper():
         }), 409
 
     try:
-        start_time = datetime.now()
-        logger.info(f"开始翻译: paper_id={paper_id}, user_id={user_id}, target_lang={target_lang}")
+        logger.info(f"加入翻译任务: paper_id={paper_id}, user_id={user_id}, target_lang={target_lang}")
 
-        # 创建生成记录
+        # 翻译在 worker 中按页分段并发执行，分段通过 /translate/<recordId>/segments 逐段读取，
+        # 全部完成后记录内容为 {originalSections, translatedContent}
         record = GenerateRecord(
             user_id=user_id,
             paper_id=paper_id,
             type='translate',
-            status='generating'
+            status='pending'
         )
         db.session.add(record)
-        db.session.commit()
-
-        # 调用AI翻译
-        generator = AIGenerator()
-        paper_info = {
-            'title': paper.title,
-            'authors': paper.authors,
-            'abstract': paper.abstract,
-            'keywords': paper.keywords,
-            'sections': paper.sections,
-            'filepath': paper.filepath  # 添加文件路径
-        }
-
-        logger.info(f"调用AI翻译服务: filepath={paper.filepath}")
-        result = generator.translate_paper(paper_info, target_lang)
-        logger.info(f"AI翻译完成: 原文段数={len(result.get('originalSections', []))}, 译文长度={len(result.get('translatedContent', ''))}")
-
-        end_time = datetime.now()
-        duration = (end_time - start_time).total_seconds()
-
-        # 更新记录 - 保存翻译内容
-        record.content = result.get('translatedContent', '')
-        record.status = 'completed'
-        record.description = f'《{paper.title}》的翻译'
-        record.duration = duration
-
+        enqueue_generation(record, current_app.config['DEFAULT_AI_MODEL'], {'targetLang': target_lang})
         db.session.commit()
 
         return jsonify({
-            'code': 200,
-            'message': '翻译成功',
+            'code': 202,
+            'message': '已加入翻译队列',
             'data': {
                 'recordId': record.id,
-                'originalSections': result.get('originalSections', []),
-                'translatedContent': result.get('translatedContent', '')
+                'status': record.status
             }
-        })
-
-    except TimeoutError as e:
-        logger.error(f"翻译超时: paper_id={paper_id}, user_id={user_id}, error={str(e)}")
-        if record:
-            record.status = 'failed'
-            record.error_message = f'请求超时: {str(e)}'
-            db.session.commit()
+        }), 202
 
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"创建翻译任务失败: paper_id={paper_id}, user_id={user_id}, error={str(e)}", exc_info=True)
         return jsonify({
-            'code': 408,
-            'message': '请求超时，请检查网络连接后重试',
-            'data': {'recordId': record.id if record else None}
-        }), 408
+            'code': 500,
+            'message': '服务器错误，请稍后重试'
+        }), 500
 
-    except ValueError as e:
-        logger.error(f"翻译参数错误: paper_id={paper_id}, user_id={user_id}, error={str(e)}")
-        if record:
-            record.status = 'failed'
-            record.error_message = f'参数错误: {str(e)}'
-            db.session.commit()
 
-        return jsonify({
-            'code': 400,
-            'message': f'请求参数错误: {str(e)}',
-            'data': {'recordId': record.id if record else None}
-        }), 400
+def _stream_answer(generator: AIGenerator, deltas: Iterator[str], extra: Dict, log_context: str) -> Response:
+    """
+    以 Server-Sent Events 逐段返回对话回答（请求体 stream 为 true 时）
+
+    事件类型：
+    - delta: 回答的增量文本，data 为 {text}
+    - done: 回答结束，data 为 {answer, firstTokenTime, ...extra}
+    - error: 对话失败，data 为 {message}
+    """
+    def events():
+        parts = []
+        try:
+            for delta in deltas:
+                parts.append(delta)
+                yield sse('delta', {'text': delta})
+
+            logger.info(f"流式对话完成: {log_context}, 首个token耗时: {generator.first_token_time}秒")
+            yield sse('done', {'answer': ''.join(parts), 'firstTokenTime': generator.first_token_time, **extra})
+
+        except TimeoutError as e:
+            logger.error(f"对话超时: {log_context}, error={str(e)}")
+            yield sse('error', {'message': '请求超时，请检查网络连接后重试'})
+
+        except Exception as e:
+            logger.error(f"对话失败: {log_context}, error={str(e)}", exc_info=True)
+            yield sse('error', {'message': '服务器错误，请稍后重试'})
+
+    return Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
 
-    except Exception as e:
-        logger.error(f"翻译失败: paper_id={paper_id}, user_id={user_id}, error={str(e)}", exc_info=True)
-        if record:
-            record.status = 'failed'
-            record.error_message = f'翻译失败: {str(e)}'
-            db.session.commit()
 
-        return jsonify({
-            'code': 500,
-            'message': '服务器错误，请稍后重试',
-            'data': {'recordId': record.id if record else None}
-        }), 500
+@bp.route('/translate/<int:record_id>/segments', methods=['GET'])
+@jwt_required()
+def get_translation_segments(record_id):
+    """
+    获取翻译的分段（每段完成后即可读取，不必等待全文完成）
+
+    查询参数 since：只返回该时间（上次响应的 serverTime）之后更新的分段，不传时返回全部分段。
+    serverTime 留有几秒余量，避免漏掉查询时尚未提交的分段，同一分段可能重复返回，客户端按 ordinal 合并
+    """
+    user_id = get_jwt_identity()
+    record = GenerateRecord.query.filter_by(id=record_id, user_id=user_id, type='translate').first()
+    if not record:
+        return jsonify({'code': 404, 'message': '记录不存在'}), 404
+
+    server_time = datetime.utcnow() - timedelta(seconds=2)
+    query = TranslationSegment.query.filter_by(record_id=record_id)
+    since = request.args.get('since')
+    if since:
+        try:
+            query = query.filter(TranslationSegment.updated_at >= datetime.fromisoformat(since))
+        except ValueError:
+            return jsonify({'code': 400, 'message': 'since 格式错误'}), 400
+
+    segments = query.order_by(TranslationSegment.ordinal).all()
+    finished, total = translation.segment_progress(record_id)
+
+    return jsonify({
+        'code': 200,
+        'message': '获取成功',
+        'data': {
+            'recordId': record.id,
+            'status': record.status,
+            'errorMessage': record.error_message or '',
+            'total': total,
+            'finished': finished,
+            'segments': [segment.to_dict() for segment in segments],
+            'serverTime': server_time.isoformat()
+        }
+    })
 
 
 @bp.route('/papers', methods=['POST'])
@@ -247,17 +270,24 @@ def chat_with_papers():
             }), 404
 
         # 构建论文信息列表
+        # 前10篇论文平分正文节选的token预算
+        excerpt_chars = max_chars(input_budget('chat') // min(len(papers), 10))
         papers_info = []
         for paper in papers:
             paper_dict = {
                 'title': paper.title,
                 'abstract': paper.abstract,
-                'keywords': paper.keywords
+                'keywords': paper.keywords,
+                'body': page_store.load_excerpt(paper, excerpt_chars) if len(papers_info) < 10 else ''
             }
             papers_info.append(paper_dict)
 
         # 调用AI对话
         generator = AIGenerator()
+        if request_flag(data, 'stream'):
+            deltas = generator.stream_chat_with_papers(question, papers_info, conversation_history)
+            return _stream_answer(generator, deltas, {'papersCount': len(papers)}, f"user_id={user_id}")
+
         answer = generator.chat_with_papers(question, papers_info, conversation_history)
 
         return jsonify({
@@ -286,7 +316,7 @@ def chat_with_papers():
 
 @bp.route('/papers/<int:paper_id>', methods=['POST'])
 @jwt_required()
-def chat_with_paper():
+def chat_with_paper(paper_id):
     """与单篇论文对话"""
     user_id = get_jwt_identity()
     data = request.get_json()
@@ -310,11 +340,16 @@ def chat_with_paper():
         papers_info = [{
             'title': paper.title,
             'abstract': paper.abstract,
-            'keywords': paper.keywords
+            'keywords': paper.keywords,
+            'body': page_store.load_excerpt(paper, max_chars(input_budget('chat')))  # 正文开头（逐页文本存储）
         }]
 
         # 调用AI对话
         generator = AIGenerator()
+        if request_flag(data, 'stream'):
+            deltas = generator.stream_chat_with_papers(question, papers_info, conversation_history)
+            return _stream_answer(generator, deltas, {}, f"paper_id={paper_id}, user_id={user_id}")
+
         answer = generator.chat_with_papers(question, papers_info, conversation_history)
 
         return jsonify({
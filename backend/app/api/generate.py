@@ -1,10 +1,16 @@
 import json
 import logging
 from datetime import datetime
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models import db, Paper, GenerateRecord
-from app.services.ai_generator import AIGenerator
+from app.services import generation_cache
+from app.services.event_bus import record_events, record_snapshot
+from app.services.generate_tasks import (
+    ALL_TYPES, GENERATION_TYPES, STREAMING_TYPES,
+    build_paper_info, enqueue_generate_all, enqueue_generation, stream_generation
+)
+from app.api.paper import identity_from_request
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -12,28 +18,41 @@ logger = logging.getLogger(__name__)
 bp = Blueprint('generate', __name__)
 
 
-@bp.route('/mindmap', methods=['POST'])
-@jwt_required()
-def generate_mindmap():
-    """生成思维导图"""
+def request_flag(data: dict, name: str) -> bool:
+    """请求体或查询参数中的布尔开关，如 force=true 跳过生成结果缓存、stream=true 流式返回"""
+    value = data.get(name, request.args.get(name, False))
+    if isinstance(value, str):
+        return value.lower() in ('1', 'true', 'yes')
+    return bool(value)
+
+
+def _generate(gen_type: str):
+    """
+    生成接口的公共流程：检查论文和进行中的任务，命中缓存时直接返回结果（200），
+    否则创建生成记录并加入 generate 任务，立即返回 recordId（202）
+
+    请求体: {paperId, force, stream}，force 为 true 时跳过缓存重新生成（结果仍会更新缓存）；
+    stream 为 true 时（仅 STREAMING_TYPES）在请求中生成，以 Server-Sent Events 逐段返回模型输出，
+    事件见 generate_tasks.stream_generation
+    """
+    label = GENERATION_TYPES[gen_type]['label']
     user_id = get_jwt_identity()
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     paper_id = data.get('paperId')
 
     if not paper_id:
         return jsonify({'code': 400, 'message': '论文ID不能为空'}), 400
 
-    # 获取论文
     paper = Paper.query.filter_by(id=paper_id, user_id=user_id).first()
     if not paper:
         return jsonify({'code': 404, 'message': '论文不存在'}), 404
 
-    # 检查是否有进行中的相同请求
-    existing = GenerateRecord.query.filter_by(
-        user_id=user_id,
-        paper_id=paper_id,
-        type='mindmap',
-        status='generating'
+    # 检查是否有排队或进行中的相同请求
+    existing = GenerateRecord.query.filter(
+        GenerateRecord.user_id == user_id,
+        GenerateRecord.paper_id == paper_id,
+        GenerateRecord.type == gen_type,
+        GenerateRecord.status.in_(['pending', 'generating'])
     ).first()
 
     if existing:
@@ -43,548 +62,243 @@ def generate_mindmap():
             'data': {'recordId': existing.id}
         }), 409
 
+    model = current_app.config['DEFAULT_AI_MODEL']
     try:
-        # 记录开始时间
         start_time = datetime.now()
 
-        # 创建生成记录
-        record = GenerateRecord(
-            user_id=user_id,
-            paper_id=paper_id,
-            type='mindmap',
-            status='generating'
-        )
-        db.session.add(record)
-        db.session.commit()
-
-        # 调用AI生成
-        generator = AIGenerator()
-        paper_info = {
-            'title': paper.title,
-            'authors': paper.authors,
-            'abstract': paper.abstract,
-            'keywords': paper.keywords,
-            'sections': paper.sections  # 添加章节数据
-        }
-
-        # 调试日志
-        print(f"[DEBUG] 生成思维导图 - 论文信息:")
-        print(f"[DEBUG]   标题: {paper_info['title'][:50] if paper_info['title'] else '无'}...")
-        print(f"[DEBUG]   摘要长度: {len(paper_info.get('abstract', ''))}")
-        print(f"[DEBUG]   章节数据: {'有' if paper_info.get('sections') else '无'}")
-
-        result = generator.generate_mindmap(paper_info)
-
-        # 计算耗时
-        end_time = datetime.now()
-        duration = (end_time - start_time).total_seconds()
-
-        # 更新记录
-        record.content = json.dumps(result, ensure_ascii=False)
-        record.status = 'completed'
-        record.description = f'《{paper.title}》的思维导图'
-        record.duration = duration
-
-        db.session.commit()
-
-        return jsonify({
-            'code': 200,
-            'message': '生成成功',
-            'data': {
-                'recordId': record.id,
-                'content': result
-            }
-        })
-
-    except TimeoutError as e:
-        # 处理超时错误
-        logger.error(f"生成思维导图超时: paper_id={paper_id}, user_id={user_id}, error={str(e)}")
-        if record:
-            record.status = 'failed'
-            record.error_message = f'请求超时: {str(e)}'
-            db.session.commit()
-
-        return jsonify({
-            'code': 408,
-            'message': '请求超时，请检查网络连接后重试',
-            'data': {'recordId': record.id if record else None}
-        }), 408
-
-    except ValueError as e:
-        # 处理参数错误
-        logger.error(f"生成思维导图参数错误: paper_id={paper_id}, user_id={user_id}, error={str(e)}")
-        if record:
-            record.status = 'failed'
-            record.error_message = f'参数错误: {str(e)}'
-            db.session.commit()
-
-        return jsonify({
-            'code': 400,
-            'message': f'请求参数错误: {str(e)}',
-            'data': {'recordId': record.id if record else None}
-        }), 400
-
-    except Exception as e:
-        # 处理其他错误
-        logger.error(f"生成思维导图失败: paper_id={paper_id}, user_id={user_id}, error={str(e)}", exc_info=True)
-        if record:
-            record.status = 'failed'
-            record.error_message = f'生成失败: {str(e)}'
+        result = None if request_flag(data, 'force') else generation_cache.get(paper, gen_type, model)
+        if result is not None:
+            record = GenerateRecord(
+                user_id=user_id,
+                paper_id=paper_id,
+                type=gen_type,
+                content=json.dumps(result, ensure_ascii=False),
+                status='completed',
+                cached=True,
+                description=f'《{paper.title}》的{GENERATION_TYPES[gen_type]["description"]}',
+                duration=(datetime.now() - start_time).total_seconds()
+            )
+            db.session.add(record)
             db.session.commit()
 
-        return jsonify({
-            'code': 500,
-            'message': '服务器错误，请稍后重试',
-            'data': {'recordId': record.id if record else None}
-        }), 500
-
-
-@bp.route('/timeline', methods=['POST'])
-@jwt_required()
-def generate_timeline():
-    """生成时间线"""
-    user_id = get_jwt_identity()
-    data = request.get_json()
-    paper_id = data.get('paperId')
-
-    if not paper_id:
-        return jsonify({'code': 400, 'message': '论文ID不能为空'}), 400
-
-    paper = Paper.query.filter_by(id=paper_id, user_id=user_id).first()
-    if not paper:
-        return jsonify({'code': 404, 'message': '论文不存在'}), 404
-
-    # 检查是否有进行中的相同请求
-    existing = GenerateRecord.query.filter_by(
-        user_id=user_id,
-        paper_id=paper_id,
-        type='timeline',
-        status='generating'
-    ).first()
-
-    if existing:
-        return jsonify({
-            'code': 409,
-            'message': '已有生成任务进行中，请稍后再试',
-            'data': {'recordId': existing.id}
-        }), 409
+            return jsonify({
+                'code': 200,
+                'message': '生成成功',
+                'data': {
+                    'recordId': record.id,
+                    'content': result,
+                    'cached': True
+                }
+            })
 
-    try:
-        start_time = datetime.now()
+        if gen_type in STREAMING_TYPES and request_flag(data, 'stream'):
+            return _stream_response(paper, gen_type, model)
 
         record = GenerateRecord(
             user_id=user_id,
             paper_id=paper_id,
-            type='timeline',
-            status='generating'
+            type=gen_type,
+            status='pending'
         )
         db.session.add(record)
-        db.session.commit()
-
-        generator = AIGenerator()
-        paper_info = {
-            'title': paper.title,
-            'authors': paper.authors,
-            'abstract': paper.abstract,
-            'keywords': paper.keywords,
-            'sections': paper.sections  # 添加章节数据
-        }
-
-        result = generator.generate_timeline(paper_info)
-
-        end_time = datetime.now()
-        duration = (end_time - start_time).total_seconds()
-
-        record.content = json.dumps(result, ensure_ascii=False)
-        record.status = 'completed'
-        record.description = f'《{paper.title}》的研究时间线'
-        record.duration = duration
-
+        enqueue_generation(record, model)
         db.session.commit()
 
         return jsonify({
-            'code': 200,
-            'message': '生成成功',
+            'code': 202,
+            'message': '已加入生成队列',
             'data': {
                 'recordId': record.id,
-                'content': result
+                'status': record.status,
+                'cached': False
             }
-        })
-
-    except TimeoutError as e:
-        logger.error(f"生成时间线超时: paper_id={paper_id}, user_id={user_id}, error={str(e)}")
-        if record:
-            record.status = 'failed'
-            record.error_message = f'请求超时: {str(e)}'
-            db.session.commit()
-
-        return jsonify({
-            'code': 408,
-            'message': '请求超时，请检查网络连接后重试',
-            'data': {'recordId': record.id if record else None}
-        }), 408
-
-    except ValueError as e:
-        logger.error(f"生成时间线参数错误: paper_id={paper_id}, user_id={user_id}, error={str(e)}")
-        if record:
-            record.status = 'failed'
-            record.error_message = f'参数错误: {str(e)}'
-            db.session.commit()
-
-        return jsonify({
-            'code': 400,
-            'message': f'请求参数错误: {str(e)}',
-            'data': {'recordId': record.id if record else None}
-        }), 400
+        }), 202
 
     except Exception as e:
-        logger.error(f"生成时间线失败: paper_id={paper_id}, user_id={user_id}, error={str(e)}", exc_info=True)
-        if record:
-            record.status = 'failed'
-            record.error_message = f'生成失败: {str(e)}'
-            db.session.commit()
-
+        db.session.rollback()
+        logger.error(f"创建{label}任务失败: paper_id={paper_id}, user_id={user_id}, error={str(e)}", exc_info=True)
         return jsonify({
             'code': 500,
-            'message': '服务器错误，请稍后重试',
-            'data': {'recordId': record.id if record else None}
+            'message': '服务器错误，请稍后重试'
         }), 500
 
 
-@bp.route('/graph', methods=['POST'])
-@jwt_required()
-def generate_graph():
-    """生成概念图谱"""
-    user_id = get_jwt_identity()
-    data = request.get_json()
-    paper_id = data.get('paperId')
-
-    if not paper_id:
-        return jsonify({'code': 400, 'message': '论文ID不能为空'}), 400
-
-    paper = Paper.query.filter_by(id=paper_id, user_id=user_id).first()
-    if not paper:
-        return jsonify({'code': 404, 'message': '论文不存在'}), 404
-
-    # 检查是否有进行中的相同请求
-    existing = GenerateRecord.query.filter_by(
-        user_id=user_id,
-        paper_id=paper_id,
-        type='graph',
+def _stream_response(paper: Paper, gen_type: str, model: str) -> Response:
+    """创建 generating 状态的生成记录，返回流式生成的事件流"""
+    record = GenerateRecord(
+        user_id=paper.user_id,
+        paper_id=paper.id,
+        type=gen_type,
         status='generating'
-    ).first()
+    )
+    db.session.add(record)
+    db.session.commit()
+    paper_info = build_paper_info(paper, gen_type)
+    logger.info(f"流式生成{GENERATION_TYPES[gen_type]['label']}: paper_id={paper.id}, record_id={record.id}")
 
-    if existing:
-        return jsonify({
-            'code': 409,
-            'message': '已有生成任务进行中，请稍后再试',
-            'data': {'recordId': existing.id}
-        }), 409
+    return Response(stream_with_context(stream_generation(record.id, paper_info, model)),
+                    mimetype='text/event-stream', headers={
+                        'Cache-Control': 'no-cache',
+                        'X-Accel-Buffering': 'no'
+                    })
 
-    try:
-        start_time = datetime.now()
 
-        record = GenerateRecord(
-            user_id=user_id,
-            paper_id=paper_id,
-            type='graph',
-            status='generating'
-        )
-        db.session.add(record)
-        db.session.commit()
-
-        generator = AIGenerator()
-        paper_info = {
-            'title': paper.title,
-            'authors': paper.authors,
-            'abstract': paper.abstract,
-            'keywords': paper.keywords,
-            'sections': paper.sections  # 添加章节数据
-        }
-
-        result = generator.generate_graph(paper_info)
-
-        end_time = datetime.now()
-        duration = (end_time - start_time).total_seconds()
-
-        record.content = json.dumps(result, ensure_ascii=False)
-        record.status = 'completed'
-        record.description = f'《{paper.title}》的概念图谱'
-        record.duration = duration
-
-        db.session.commit()
-
-        return jsonify({
-            'code': 200,
-            'message': '生成成功',
-            'data': {
-                'recordId': record.id,
-                'content': result
-            }
-        })
-
-    except TimeoutError as e:
-        logger.error(f"生成概念图谱超时: paper_id={paper_id}, user_id={user_id}, error={str(e)}")
-        if record:
-            record.status = 'failed'
-            record.error_message = f'请求超时: {str(e)}'
-            db.session.commit()
+@bp.route('/mindmap', methods=['POST'])
+@jwt_required()
+def generate_mindmap():
+    """生成思维导图"""
+    return _generate('mindmap')
 
-        return jsonify({
-            'code': 408,
-            'message': '请求超时，请检查网络连接后重试',
-            'data': {'recordId': record.id if record else None}
-        }), 408
-
-    except ValueError as e:
-        logger.error(f"生成概念图谱参数错误: paper_id={paper_id}, user_id={user_id}, error={str(e)}")
-        if record:
-            record.status = 'failed'
-            record.error_message = f'参数错误: {str(e)}'
-            db.session.commit()
 
-        return jsonify({
-            'code': 400,
-            'message': f'请求参数错误: {str(e)}',
-            'data': {'recordId': record.id if record else None}
-        }), 400
+@bp.route('/timeline', methods=['POST'])
+@jwt_required()
+def generate_timeline():
+    """生成时间线"""
+    return _generate('timeline')
 
-    except Exception as e:
-        logger.error(f"生成概念图谱失败: paper_id={paper_id}, user_id={user_id}, error={str(e)}", exc_info=True)
-        if record:
-            record.status = 'failed'
-            record.error_message = f'生成失败: {str(e)}'
-            db.session.commit()
 
-        return jsonify({
-            'code': 500,
-            'message': '服务器错误，请稍后重试',
-            'data': {'recordId': record.id if record else None}
-        }), 500
+@bp.route('/graph', methods=['POST'])
+@jwt_required()
+def generate_graph():
+    """生成概念图谱"""
+    return _generate('graph')
 
 
 @bp.route('/review', methods=['POST'])
 @jwt_required()
 def generate_review():
     """生成论文评审报告（基于学术要素完整性评分）"""
-    user_id = get_jwt_identity()
-    data = request.get_json()
-    paper_id = data.get('paperId')
-
-    if not paper_id:
-        return jsonify({'code': 400, 'message': '论文ID不能为空'}), 400
-
-    paper = Paper.query.filter_by(id=paper_id, user_id=user_id).first()
-    if not paper:
-        return jsonify({'code': 404, 'message': '论文不存在'}), 404
-
-    # 检查是否有进行中的相同请求
-    existing = GenerateRecord.query.filter_by(
-        user_id=user_id,
-        paper_id=paper_id,
-        type='review',
-        status='generating'
-    ).first()
-
-    if existing:
-        return jsonify({
-            'code': 409,
-            'message': '已有生成任务进行中，请稍后再试',
-            'data': {'recordId': existing.id}
-        }), 409
-
-    try:
-        start_time = datetime.now()
-
-        record = GenerateRecord(
-            user_id=user_id,
-            paper_id=paper_id,
-            type='review',
-            status='generating'
-        )
-        db.session.add(record)
-        db.session.commit()
-
-        generator = AIGenerator()
-        paper_info = {
-            'title': paper.title,
-            'authors': paper.authors,
-            'abstract': paper.abstract,
-            'keywords': paper.keywords
-        }
-
-        print(f"[DEBUG] 开始为论文 {paper_id} 生成评审报告")
-        result = generator.generate_review(paper_info)
-
-        end_time = datetime.now()
-        duration = (end_time - start_time).total_seconds()
-
-        record.content = json.dumps(result, ensure_ascii=False)
-        record.status = 'completed'
-        record.description = f'《{paper.title}》的评审报告'
-        record.duration = duration
-
-        db.session.commit()
-
-        return jsonify({
-            'code': 200,
-            'message': '生成成功',
-            'data': {
-                'recordId': record.id,
-                'content': result
-            }
-        })
-
-    except TimeoutError as e:
-        logger.error(f"生成评审报告超时: paper_id={paper_id}, user_id={user_id}, error={str(e)}")
-        if record:
-            record.status = 'failed'
-            record.error_message = f'请求超时: {str(e)}'
-            db.session.commit()
-
-        return jsonify({
-            'code': 408,
-            'message': '请求超时，请检查网络连接后重试',
-            'data': {'recordId': record.id if record else None}
-        }), 408
-
-    except ValueError as e:
-        logger.error(f"生成评审报告参数错误: paper_id={paper_id}, user_id={user_id}, error={str(e)}")
-        if record:
-            record.status = 'failed'
-            record.error_message = f'参数错误: {str(e)}'
-            db.session.commit()
-
-        return jsonify({
-            'code': 400,
-            'message': f'请求参数错误: {str(e)}',
-            'data': {'recordId': record.id if record else None}
-        }), 400
-
-    except Exception as e:
-        logger.error(f"生成评审报告失败: paper_id={paper_id}, user_id={user_id}, error={str(e)}", exc_info=True)
-        if record:
-            record.status = 'failed'
-            record.error_message = f'生成失败: {str(e)}'
-            db.session.commit()
-
-        return jsonify({
-            'code': 500,
-            'message': '服务器错误，请稍后重试',
-            'data': {'recordId': record.id if record else None}
-        }), 500
+    return _generate('review')
 
 
 @bp.route('/summary', methods=['POST'])
 @jwt_required()
 def generate_summary():
     """生成核心观点总结"""
+    return _generate('summary')
+
+
+@bp.route('/all', methods=['POST'])
+@jwt_required()
+def generate_all():
+    """
+    一键生成思维导图、时间线、概念图谱、阅读报告和评审报告
+
+    请求体: {paperId, types, force, stream}，types 默认全部类型。
+    每个类型对应一条生成记录：命中缓存的直接完成，已有进行中任务的沿用该记录，
+    其余记录加入同一个 generate_all 任务（论文信息只组织一次，各类型并发生成）。
+    stream 为 true 时返回 Server-Sent Events，每个类型完成时发送 result（含生成结果），全部结束后发送 done；
+    否则返回各类型的 recordId，结果通过 /record/<id> 或 /record/<id>/events 获取。
+    """
     user_id = get_jwt_identity()
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     paper_id = data.get('paperId')
+    gen_types = data.get('types') or list(ALL_TYPES)
 
     if not paper_id:
         return jsonify({'code': 400, 'message': '论文ID不能为空'}), 400
 
+    if not isinstance(gen_types, list) or any(gen_type not in ALL_TYPES for gen_type in gen_types):
+        return jsonify({'code': 400, 'message': f'生成类型只能是: {", ".join(ALL_TYPES)}'}), 400
+
     paper = Paper.query.filter_by(id=paper_id, user_id=user_id).first()
     if not paper:
         return jsonify({'code': 404, 'message': '论文不存在'}), 404
 
-    # 检查是否有进行中的相同请求
-    existing = GenerateRecord.query.filter_by(
-        user_id=user_id,
-        paper_id=paper_id,
-        type='summary',
-        status='generating'
-    ).first()
-
-    if existing:
-        return jsonify({
-            'code': 409,
-            'message': '已有生成任务进行中，请稍后再试',
-            'data': {'recordId': existing.id}
-        }), 409
-
+    model = current_app.config['DEFAULT_AI_MODEL']
+    force = request_flag(data, 'force')
     try:
-        start_time = datetime.now()
-
-        record = GenerateRecord(
-            user_id=user_id,
-            paper_id=paper_id,
-            type='summary',
-            status='generating'
-        )
-        db.session.add(record)
-        db.session.commit()
-
-        generator = AIGenerator()
-        paper_info = {
-            'title': paper.title,
-            'authors': paper.authors,
-            'abstract': paper.abstract,
-            'keywords': paper.keywords,
-            'sections': paper.sections  # 添加章节数据
+        # 已有排队或进行中任务的类型沿用该记录
+        running = {
+            record.type: record
+            for record in GenerateRecord.query.filter(
+                GenerateRecord.user_id == user_id,
+                GenerateRecord.paper_id == paper_id,
+                GenerateRecord.type.in_(gen_types),
+                GenerateRecord.status.in_(['pending', 'generating'])
+            ).all()
         }
 
-        result = generator.generate_summary(paper_info)
-
-        end_time = datetime.now()
-        duration = (end_time - start_time).total_seconds()
-
-        record.content = json.dumps(result, ensure_ascii=False)
-        record.status = 'completed'
-        record.description = f'《{paper.title}》的论文阅读报告'
-        record.duration = duration
-
+        records, queued = [], []
+        for gen_type in dict.fromkeys(gen_types):
+            if gen_type in running:
+                records.append(running[gen_type])
+                continue
+
+            result = None if force else generation_cache.get(paper, gen_type, model)
+            if result is not None:
+                record = GenerateRecord(
+                    user_id=user_id,
+                    paper_id=paper_id,
+                    type=gen_type,
+                    content=json.dumps(result, ensure_ascii=False),
+                    status='completed',
+                    cached=True,
+                    description=f'《{paper.title}》的{GENERATION_TYPES[gen_type]["description"]}',
+                    duration=0
+                )
+            else:
+                record = GenerateRecord(
+                    user_id=user_id,
+                    paper_id=paper_id,
+                    type=gen_type,
+                    status='pending'
+                )
+                queued.append(record)
+            db.session.add(record)
+            records.append(record)
+
+        if queued:
+            enqueue_generate_all(queued, model)
         db.session.commit()
+        logger.info(f"一键生成: paper_id={paper_id}, user_id={user_id}, 排队: {[r.type for r in queued]}, "
+                    f"共 {len(records)} 种")
 
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"创建一键生成任务失败: paper_id={paper_id}, user_id={user_id}, error={str(e)}", exc_info=True)
         return jsonify({
-            'code': 200,
-            'message': '生成成功',
-            'data': {
-                'recordId': record.id,
-                'content': result
-            }
-        })
-
-    except TimeoutError as e:
-        logger.error(f"生成论文阅读报告超时: paper_id={paper_id}, user_id={user_id}, error={str(e)}")
-        if record:
-            record.status = 'failed'
-            record.error_message = f'请求超时: {str(e)}'
-            db.session.commit()
+            'code': 500,
+            'message': '服务器错误，请稍后重试'
+        }), 500
 
-        return jsonify({
-            'code': 408,
-            'message': '请求超时，请检查网络连接后重试',
-            'data': {'recordId': record.id if record else None}
-        }), 408
-
-    except ValueError as e:
-        logger.error(f"生成论文阅读报告参数错误: paper_id={paper_id}, user_id={user_id}, error={str(e)}")
-        if record:
-            record.status = 'failed'
-            record.error_message = f'参数错误: {str(e)}'
-            db.session.commit()
+    record_ids = [record.id for record in records]
+    if request_flag(data, 'stream'):
+        initial = record_snapshot(record_ids)
+        heartbeat = current_app.config.get('EVENT_HEARTBEAT_INTERVAL', 15)
+        timeout = current_app.config.get('EVENT_STREAM_TIMEOUT', 600)
+        db.session.remove()
+
+        events = record_events.stream_many(record_ids, initial, heartbeat, timeout, _record_result)
+        return Response(stream_with_context(events), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
 
-        return jsonify({
-            'code': 400,
-            'message': f'请求参数错误: {str(e)}',
-            'data': {'recordId': record.id if record else None}
-        }), 400
+    return jsonify({
+        'code': 202 if queued else 200,
+        'message': '已加入生成队列' if queued else '生成成功',
+        'data': {
+            'records': [
+                {'type': record.type, 'recordId': record.id, 'status': record.status, 'cached': bool(record.cached)}
+                for record in records
+            ]
+        }
+    }), 202 if queued else 200
 
-    except Exception as e:
-        logger.error(f"生成论文阅读报告失败: paper_id={paper_id}, user_id={user_id}, error={str(e)}", exc_info=True)
-        if record:
-            record.status = 'failed'
-            record.error_message = f'生成失败: {str(e)}'
-            db.session.commit()
 
-        return jsonify({
-            'code': 500,
-            'message': '服务器错误，请稍后重试',
-            'data': {'recordId': record.id if record else None}
-        }), 500
+def _record_result(snapshot: dict) -> dict:
+    """一键生成事件流的 result 数据：记录状态快照加上生成结果（content）和是否来自缓存"""
+    data = dict(snapshot)
+    record = db.session.get(GenerateRecord, snapshot['recordId'])
+    if record and record.status == 'completed':
+        try:
+            data['content'] = json.loads(record.content)
+        except (TypeError, ValueError):
+            data['content'] = record.content
+        data['cached'] = bool(record.cached)
+    db.session.remove()
+    return data
 
 
 @bp.route('/history/<int:paper_id>', methods=['GET'])
@@ -683,6 +397,35 @@ def get_generate_record(record_id):
     })
 
 
+@bp.route('/record/<int:record_id>/events', methods=['GET'])
+def generate_record_events(record_id):
+    """
+    生成状态事件流（Server-Sent Events，可用 ?token= 认证）
+
+    事件类型：
+    - progress: 状态变化，data 为 {recordId, type, status, errorMessage}
+    - done: 生成结束（completed/failed，或记录被删除），随后关闭连接；结果通过 /record/<id> 读取
+    """
+    user_id, error = identity_from_request()
+    if error:
+        return error
+
+    record = GenerateRecord.query.filter_by(id=record_id, user_id=user_id).first()
+    if not record:
+        return jsonify({'code': 404, 'message': '记录不存在'}), 404
+
+    initial = record_snapshot([record_id]).get(record_id)
+    heartbeat = current_app.config.get('EVENT_HEARTBEAT_INTERVAL', 15)
+    timeout = current_app.config.get('EVENT_STREAM_TIMEOUT', 600)
+    # 不在流中持有数据库连接，后续状态由事件总线的中继线程读取
+    db.session.remove()
+
+    return Response(record_events.stream(record_id, initial, heartbeat, timeout), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
 @bp.route('/record/<int:record_id>', methods=['DELETE'])
 @jwt_required()
 def delete_generate_record(record_id):
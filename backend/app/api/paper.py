@@ -1,10 +1,13 @@
 import os
 import json
 from datetime import datetime
-from flask import Blueprint, request, jsonify, current_app, send_file
+from flask import Blueprint, Response, request, jsonify, current_app, send_file
 from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request, get_jwt
 from werkzeug.utils import secure_filename
-from app.models import db, Paper
+from app.models import db, Paper, UploadBatch, UploadSession
+from app.services import blob_store, chunked_upload, generation_cache, job_queue, section_store
+from app.services.event_bus import event_bus, paper_snapshot
+from app.services.paper_tasks import apply_parse_result, get_cached_result, request_sections, resolve_stages
 from app.services.pdf_parser import PDFParser
 
 bp = Blueprint('paper', __name__)
@@ -16,6 +19,60 @@ def allowed_file(filename):
            filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
 
 
+def _ingest_upload(file, user_id, batch_id=None):
+    """
+    保存上传文件并创建论文记录（不提交）
+
+    文件边读边写入内容寻址存储；相同内容已解析过时直接复用解析结果，
+    否则加入解析队列，由后台 worker 并行解析（并行度由 worker 进程数限定）。
+
+    Args:
+        file: 上传的文件（FileStorage）
+        user_id: 用户ID
+        batch_id: 批量上传的批次ID
+
+    Returns:
+        Paper: 新建的论文记录
+    """
+    content_hash, filepath, filesize = blob_store.save_stream(
+        file.stream,
+        current_app.config['UPLOAD_FOLDER'],
+        max_size=current_app.config['MAX_CONTENT_LENGTH']
+    )
+    return _create_paper(user_id, file.filename, content_hash, filepath, filesize, batch_id=batch_id)
+
+
+def _create_paper(user_id, original_filename, content_hash, filepath, filesize, batch_id=None):
+    """为已存入内容寻址存储的文件创建论文记录，复用解析结果或加入解析队列（不提交）"""
+    filename = secure_filename(original_filename)
+    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+    filename = f"{timestamp}_{filename}"
+
+    # 创建论文记录，解析交给后台 worker（见 worker.py）
+    paper = Paper(
+        user_id=user_id,
+        filename=filename,
+        filepath=filepath,
+        filesize=filesize,
+        content_hash=content_hash,
+        batch_id=batch_id,
+        status='pending'
+    )
+
+    db.session.add(paper)
+    db.session.flush()
+
+    # 相同内容已解析过：直接复用解析结果，跳过PDF解析和AI提取
+    cached = get_cached_result(content_hash)
+    if cached:
+        apply_parse_result(paper, cached.to_result())
+        request_sections(paper)
+    else:
+        job_queue.enqueue('parse', paper_id=paper.id)
+
+    return paper
+
+
 @bp.route('/upload', methods=['POST'])
 @jwt_required()
 def upload_paper():
@@ -35,60 +92,273 @@ def upload_paper():
         return jsonify({'code': 400, 'message': '只支持PDF格式文件'}), 400
 
     try:
-        # 保存文件
-        filename = secure_filename(file.filename)
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        filename = f"{timestamp}_{filename}"
-        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-
-        # 创建论文记录
-        paper = Paper(
-            user_id=user_id,
-            filename=filename,
-            filepath=filepath,
-            filesize=os.path.getsize(filepath),
-            status='parsing'
-        )
+        paper = _ingest_upload(file, user_id)
+        db.session.commit()
 
-        db.session.add(paper)
+        return jsonify({
+            'code': 200,
+            'message': '上传成功',
+            'data': {
+                'paperId': paper.id,
+                'status': paper.status
+            }
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'code': 500, 'message': f'上传失败: {str(e)}'}), 500
+
+
+@bp.route('/upload/batch', methods=['POST'])
+@jwt_required()
+def upload_paper_batch():
+    """
+    批量上传论文
+
+    一次 multipart 请求携带多个 files 字段，逐个写入存储并加入解析队列后立即返回，
+    不等待解析；单个文件失败不影响其他文件。
+    """
+    user_id = get_jwt_identity()
+
+    # 批量请求允许更大的请求体，单个文件仍受 MAX_CONTENT_LENGTH 限制
+    request.max_content_length = current_app.config['UPLOAD_BATCH_MAX_SIZE']
+
+    files = [file for file in request.files.getlist('files') if file.filename]
+    if not files:
+        return jsonify({'code': 400, 'message': '没有上传文件'}), 400
+
+    max_files = current_app.config['UPLOAD_BATCH_MAX_FILES']
+    if len(files) > max_files:
+        return jsonify({'code': 400, 'message': f'单次最多上传 {max_files} 个文件'}), 400
+
+    try:
+        batch = UploadBatch(user_id=user_id)
+        db.session.add(batch)
+        db.session.flush()
+
+        results = []
+        for file in files:
+            if not allowed_file(file.filename):
+                results.append({'filename': file.filename, 'error': '只支持PDF格式文件'})
+                continue
+            try:
+                paper = _ingest_upload(file, user_id, batch_id=batch.id)
+                results.append({'filename': file.filename, 'paperId': paper.id, 'status': paper.status})
+            except blob_store.FileTooLargeError as e:
+                results.append({'filename': file.filename, 'error': str(e)})
+
+        batch.total = sum(1 for result in results if 'paperId' in result)
         db.session.commit()
 
-        # 异步解析PDF（这里同步处理，实际可以使用Celery等异步任务）
-        try:
-            parser = PDFParser(filepath)
-            result = parser.parse()
+        return jsonify({
+            'code': 200,
+            'message': f'已接收 {batch.total}/{len(files)} 个文件',
+            'data': {
+                'batchId': batch.id,
+                'files': results
+            }
+        })
 
-            paper.title = result.get('title', '')
-            paper.authors = result.get('authors', '')
-            paper.abstract = result.get('abstract', '')
-            paper.keywords = result.get('keywords', '')
-            paper.publish_date = result.get('publish_date', '')
-            paper.category = result.get('category', '未分类')
-            paper.sections = result.get('sections', '')
-            paper.status = 'parsed'
-            paper.parse_time = datetime.utcnow()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'code': 500, 'message': f'上传失败: {str(e)}'}), 500
 
-            db.session.commit()
 
-        except Exception as e:
-            paper.status = 'failed'
-            paper.error_message = str(e)
-            db.session.commit()
+@bp.route('/upload/batch/<int:batch_id>', methods=['GET'])
+@jwt_required()
+def get_batch_status(batch_id):
+    """批量上传的汇总状态"""
+    user_id = get_jwt_identity()
+
+    batch = UploadBatch.query.filter_by(id=batch_id, user_id=user_id).first()
+
+    if not batch:
+        return jsonify({'code': 404, 'message': '批次不存在'}), 404
+
+    rows = db.session.query(
+        Paper.id, Paper.filename, Paper.title, Paper.status, Paper.sections_ready
+    ).filter(Paper.batch_id == batch.id).order_by(Paper.id).all()
+
+    counts = {'pending': 0, 'parsing': 0, 'parsed': 0, 'failed': 0}
+    papers = []
+    for paper_id, filename, title, status, sections_ready in rows:
+        counts[status] = counts.get(status, 0) + 1
+        papers.append({
+            'id': paper_id,
+            'filename': filename,
+            'title': title,
+            'status': status,
+            'sectionsReady': bool(sections_ready)
+        })
+
+    return jsonify({
+        'code': 200,
+        'message': '获取成功',
+        'data': {
+            **batch.to_dict(),
+            'counts': counts,
+            'finished': counts['pending'] == 0 and counts['parsing'] == 0,
+            'papers': papers
+        }
+    })
+
+
+@bp.route('/upload/chunked', methods=['POST'])
+@jwt_required()
+def init_chunked_upload():
+    """
+    创建分块上传会话
+
+    请求体: {filename, size}
+    之后按顺序 PUT /upload/chunked/<uploadId>?offset=N 发送原始字节（Content-Type: application/octet-stream），
+    全部发送后 POST /upload/chunked/<uploadId>/finalize。
+    中断后 GET /upload/chunked/<uploadId> 获取已接收字节数，从该位置续传。
+    """
+    user_id = get_jwt_identity()
+    data = request.get_json() or {}
+    filename = data.get('filename', '')
+    size = data.get('size')
+
+    if not filename or not allowed_file(filename):
+        return jsonify({'code': 400, 'message': '只支持PDF格式文件'}), 400
+
+    if not isinstance(size, int) or size <= 0:
+        return jsonify({'code': 400, 'message': '文件大小无效'}), 400
+
+    if size > current_app.config['MAX_CONTENT_LENGTH']:
+        return jsonify({'code': 400, 'message': '文件大小超过限制'}), 400
+
+    try:
+        upload_folder = current_app.config['UPLOAD_FOLDER']
+        chunked_upload.cleanup_stale(upload_folder, current_app.config['UPLOAD_SESSION_TTL'])
+        session = chunked_upload.create_session(user_id, filename, size, upload_folder)
+        db.session.commit()
+
+        return jsonify({
+            'code': 200,
+            'message': '创建成功',
+            'data': {
+                **session.to_dict(),
+                'chunkSize': current_app.config['UPLOAD_CHUNK_SIZE']
+            }
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'code': 500, 'message': f'创建上传失败: {str(e)}'}), 500
+
+
+@bp.route('/upload/chunked/<upload_id>', methods=['GET'])
+@jwt_required()
+def get_chunked_upload(upload_id):
+    """查询分块上传进度（续传时使用）"""
+    user_id = get_jwt_identity()
+
+    session = UploadSession.query.filter_by(id=upload_id, user_id=user_id).first()
+
+    if not session:
+        return jsonify({'code': 404, 'message': '上传不存在或已过期'}), 404
+
+    return jsonify({
+        'code': 200,
+        'message': '获取成功',
+        'data': session.to_dict()
+    })
+
+
+@bp.route('/upload/chunked/<upload_id>', methods=['PUT'])
+@jwt_required()
+def append_chunked_upload(upload_id):
+    """追加一个分块：请求体是原始字节，直接写入部分文件"""
+    user_id = get_jwt_identity()
+
+    session = UploadSession.query.filter_by(id=upload_id, user_id=user_id).first()
+
+    if not session:
+        return jsonify({'code': 404, 'message': '上传不存在或已过期'}), 404
+
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        return jsonify({'code': 400, 'message': '缺少 offset 参数'}), 400
+
+    if request.content_length and request.content_length > current_app.config['UPLOAD_CHUNK_SIZE']:
+        return jsonify({'code': 400, 'message': '分块大小超过限制'}), 400
+
+    try:
+        chunked_upload.append_chunk(session, request.stream, offset, current_app.config['UPLOAD_FOLDER'])
+        db.session.commit()
+
+        return jsonify({
+            'code': 200,
+            'message': '上传成功',
+            'data': session.to_dict()
+        })
+
+    except chunked_upload.OffsetMismatchError as e:
+        db.session.rollback()
+        return jsonify({'code': 409, 'message': str(e), 'data': {'received': e.received}}), 409
+
+    except blob_store.FileTooLargeError as e:
+        db.session.rollback()
+        return jsonify({'code': 400, 'message': str(e)}), 400
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'code': 500, 'message': f'上传失败: {str(e)}'}), 500
+
+
+@bp.route('/upload/chunked/<upload_id>/finalize', methods=['POST'])
+@jwt_required()
+def finalize_chunked_upload(upload_id):
+    """完成分块上传：创建论文记录并加入解析队列"""
+    user_id = get_jwt_identity()
+
+    session = UploadSession.query.filter_by(id=upload_id, user_id=user_id).first()
+
+    if not session:
+        return jsonify({'code': 404, 'message': '上传不存在或已过期'}), 404
+
+    try:
+        filename = session.filename
+        content_hash, filepath, filesize = chunked_upload.finalize(session, current_app.config['UPLOAD_FOLDER'])
+        paper = _create_paper(user_id, filename, content_hash, filepath, filesize)
+        db.session.commit()
 
         return jsonify({
             'code': 200,
             'message': '上传成功',
             'data': {
-                'paperId': paper.id
+                'paperId': paper.id,
+                'status': paper.status
             }
         })
 
+    except chunked_upload.OffsetMismatchError as e:
+        db.session.rollback()
+        return jsonify({'code': 409, 'message': '文件尚未上传完整', 'data': {'received': e.received}}), 409
+
     except Exception as e:
         db.session.rollback()
         return jsonify({'code': 500, 'message': f'上传失败: {str(e)}'}), 500
 
 
+@bp.route('/upload/chunked/<upload_id>', methods=['DELETE'])
+@jwt_required()
+def cancel_chunked_upload(upload_id):
+    """取消分块上传"""
+    user_id = get_jwt_identity()
+
+    session = UploadSession.query.filter_by(id=upload_id, user_id=user_id).first()
+
+    if not session:
+        return jsonify({'code': 404, 'message': '上传不存在或已过期'}), 404
+
+    chunked_upload.discard(session, current_app.config['UPLOAD_FOLDER'])
+    db.session.commit()
+
+    return jsonify({'code': 200, 'message': '已取消'})
+
+
 @bp.route('/list', methods=['GET'])
 @jwt_required()
 def get_paper_list():
@@ -100,8 +370,8 @@ def get_paper_list():
     page_size = min(request.args.get('pageSize', 10, type=int), 50)
     keyword = request.args.get('keyword', '').strip()
 
-    # 构建查询
-    query = Paper.query.filter_by(user_id=user_id)
+    # 构建查询（列表不返回章节，不读取旧版章节JSON列）
+    query = Paper.query.filter_by(user_id=user_id).options(db.defer(Paper.legacy_sections))
 
     if keyword:
         query = query.filter(
@@ -155,11 +425,8 @@ def get_paper_detail(paper_id):
         except:
             paper_data['keywords'] = []
 
-    if paper.sections:
-        try:
-            paper_data['sections'] = json.loads(paper.sections)
-        except:
-            paper_data['sections'] = []
+    # 章节只返回大纲和内容预览，完整内容通过 /<id>/sections/<ordinal> 按需读取
+    paper_data['sections'] = section_store.load_outline(paper)
 
     return jsonify({
         'code': 200,
@@ -168,6 +435,28 @@ def get_paper_detail(paper_id):
     })
 
 
+@bp.route('/<int:paper_id>/sections/<int:ordinal>', methods=['GET'])
+@jwt_required()
+def get_paper_section(paper_id, ordinal):
+    """获取单个章节的完整内容"""
+    user_id = get_jwt_identity()
+
+    paper = Paper.query.filter_by(id=paper_id, user_id=user_id).first()
+
+    if not paper:
+        return jsonify({'code': 404, 'message': '论文不存在'}), 404
+
+    section = section_store.load_section(paper, ordinal)
+    if not section:
+        return jsonify({'code': 404, 'message': '章节不存在'}), 404
+
+    return jsonify({
+        'code': 200,
+        'message': '获取成功',
+        'data': section
+    })
+
+
 @bp.route('/<int:paper_id>', methods=['DELETE'])
 @jwt_required()
 def delete_paper(paper_id):
@@ -180,14 +469,15 @@ def delete_paper(paper_id):
         return jsonify({'code': 404, 'message': '论文不存在'}), 404
 
     try:
-        # 删除文件
-        if os.path.exists(paper.filepath):
-            os.remove(paper.filepath)
+        filepath, content_hash = paper.filepath, paper.content_hash
 
         # 删除数据库记录
         db.session.delete(paper)
         db.session.commit()
 
+        # 删除文件（其他论文仍引用相同内容时保留）
+        blob_store.release(filepath, content_hash)
+
         return jsonify({
             'code': 200,
             'message': '删除成功'
@@ -201,7 +491,13 @@ def delete_paper(paper_id):
 @bp.route('/<int:paper_id>/parse', methods=['POST'])
 @jwt_required()
 def parse_paper(paper_id):
-    """重新解析论文"""
+    """
+    重新解析论文
+
+    查询参数 stages 指定要重算的阶段（逗号分隔，或 all 表示全部）；
+    已解析的论文只重算指定阶段、版本过期的阶段和依赖它们的阶段，都不过期时不加入队列。
+    未解析成功的论文总是完整解析。
+    """
     user_id = get_jwt_identity()
 
     paper = Paper.query.filter_by(id=paper_id, user_id=user_id).first()
@@ -209,32 +505,49 @@ def parse_paper(paper_id):
     if not paper:
         return jsonify({'code': 404, 'message': '论文不存在'}), 404
 
-    try:
-        parser = PDFParser(paper.filepath)
-        result = parser.parse()
-
-        paper.title = result.get('title', '')
-        paper.authors = result.get('authors', '')
-        paper.abstract = result.get('abstract', '')
-        paper.keywords = result.get('keywords', '')
-        paper.publish_date = result.get('publish_date', '')
-        paper.category = result.get('category', '未分类')
-        paper.sections = result.get('sections', '')
-        paper.status = 'parsed'
-        paper.parse_time = datetime.utcnow()
+    requested = [s.strip() for s in request.args.get('stages', '').split(',') if s.strip()]
+    if requested == ['all']:
+        requested = list(PDFParser.PARSE_STAGES)
+    unknown = [s for s in requested if s not in PDFParser.PARSE_STAGES]
+    if unknown:
+        return jsonify({
+            'code': 400,
+            'message': f"未知的解析阶段: {', '.join(unknown)}（可选: {', '.join(PDFParser.PARSE_STAGES)}, all）"
+        }), 400
 
+    try:
+        # 已在队列中的解析任务直接复用
+        job = job_queue.find_active('parse', paper.id)
+        stages = None
+        if not job:
+            if paper.status == 'parsed':
+                stages = resolve_stages(paper, requested)
+                if not stages:
+                    return jsonify({
+                        'code': 200,
+                        'message': '所有解析阶段均为最新版本',
+                        'data': {**paper.to_dict(), 'stages': []}
+                    })
+                job = job_queue.enqueue('parse', paper_id=paper.id, payload={'stages': stages})
+            else:
+                job = job_queue.enqueue('parse', paper_id=paper.id, payload={'force': True})
+                paper.status = 'pending'
+                paper.error_message = ''
+            # 重新解析后内容可能变化，已缓存的生成结果作废（解析完成时 worker 会再清除一次）
+            generation_cache.invalidate(paper.content_hash)
         db.session.commit()
 
+        data = paper.to_dict()
+        if stages is not None:
+            data['stages'] = stages
         return jsonify({
             'code': 200,
-            'message': '解析成功',
-            'data': paper.to_dict()
+            'message': '已加入解析队列',
+            'data': data
         })
 
     except Exception as e:
-        paper.status = 'failed'
-        paper.error_message = str(e)
-        db.session.commit()
+        db.session.rollback()
         return jsonify({'code': 500, 'message': f'解析失败: {str(e)}'}), 500
 
 
@@ -259,26 +572,37 @@ def download_paper(paper_id):
     )
 
 
-@bp.route('/<int:paper_id>/view', methods=['GET'])
-def view_paper(paper_id):
-    """在线查看论文PDF"""
-    # 支持从查询参数获取token（用于iframe）
+def identity_from_request():
+    """
+    获取当前用户ID，支持从查询参数获取token（iframe、EventSource 无法设置请求头）
+
+    Returns:
+        Tuple: (user_id, 错误响应)，验证失败时 user_id 为 None
+    """
     token = request.args.get('token', '')
     if token:
         try:
             # 手动验证token
             from flask_jwt_extended import decode_token
             decoded = decode_token(token)
-            user_id = decoded['sub']
+            return decoded['sub'], None
         except Exception as e:
-            return jsonify({'code': 401, 'message': 'Token无效'}), 401
-    else:
-        # 从Authorization header获取token
-        try:
-            verify_jwt_in_request()
-            user_id = get_jwt_identity()
-        except Exception as e:
-            return jsonify({'code': 401, 'message': '未授权'}), 401
+            return None, (jsonify({'code': 401, 'message': 'Token无效'}), 401)
+
+    # 从Authorization header获取token
+    try:
+        verify_jwt_in_request()
+        return get_jwt_identity(), None
+    except Exception as e:
+        return None, (jsonify({'code': 401, 'message': '未授权'}), 401)
+
+
+@bp.route('/<int:paper_id>/view', methods=['GET'])
+def view_paper(paper_id):
+    """在线查看论文PDF"""
+    user_id, error = identity_from_request()
+    if error:
+        return error
 
     paper = Paper.query.filter_by(id=paper_id, user_id=user_id).first()
 
@@ -294,3 +618,35 @@ def view_paper(paper_id):
         mimetype='application/pdf',
         as_attachment=False
     )
+
+
+@bp.route('/<int:paper_id>/events', methods=['GET'])
+def paper_events(paper_id):
+    """
+    解析进度事件流（Server-Sent Events）
+
+    事件类型：
+    - progress: 状态或进度变化，data 为 {paperId, status, sectionsReady, errorMessage, job}
+    - done: 解析流程结束（失败、论文被删除，或已解析且没有进行中的任务），随后关闭连接；
+      此时 sectionsReady 为 false 表示章节提取失败，可重新解析章节阶段
+
+    连接超过 EVENT_STREAM_TIMEOUT 秒自动关闭，EventSource 会自动重连。
+    """
+    user_id, error = identity_from_request()
+    if error:
+        return error
+
+    paper = Paper.query.filter_by(id=paper_id, user_id=user_id).first()
+    if not paper:
+        return jsonify({'code': 404, 'message': '论文不存在'}), 404
+
+    initial = paper_snapshot([paper_id]).get(paper_id)
+    heartbeat = current_app.config.get('EVENT_HEARTBEAT_INTERVAL', 15)
+    timeout = current_app.config.get('EVENT_STREAM_TIMEOUT', 600)
+    # 不在流中持有数据库连接，后续状态由事件总线的中继线程读取
+    db.session.remove()
+
+    return Response(event_bus.stream(paper_id, initial, heartbeat, timeout), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
@@ -0,0 +1,43 @@
+import os
+import click
+from flask.cli import AppGroup
+from app.models import db, User
+
+papers_cli = AppGroup('papers', help='论文库管理')
+
+
+@papers_cli.command('ingest')
+@click.argument('source', type=click.Path(exists=True))
+@click.option('--user', 'user_ref', required=True, help='导入到的用户（用户名或用户ID）')
+@click.option('--workers', type=int, default=lambda: int(os.getenv('JOB_WORKERS', os.cpu_count() or 2)),
+              show_default='JOB_WORKERS 或CPU核数', help='解析进程数')
+@click.option('--batch-size', type=int, default=50, show_default=True, help='每批插入的论文数')
+@click.option('--checkpoint', type=click.Path(dir_okay=False), default=None,
+              help='检查点文件（默认在 instance 目录，按来源和用户区分）')
+@click.option('--restart', is_flag=True, help='忽略已有检查点，从头处理（已导入的文件仍按内容哈希跳过）')
+@click.option('--verbose', is_flag=True, help='输出解析进程的调试日志')
+def ingest_command(source, user_ref, workers, batch_size, checkpoint, restart, verbose):
+    """
+    从目录或 tar 包批量导入PDF到用户的论文库
+
+    SOURCE 为PDF目录（递归查找）或 tar 包；中断后重新执行同一命令会从检查点继续。
+    """
+    from app.services.bulk_ingest import BulkIngest
+
+    user = User.query.filter_by(username=user_ref).first()
+    if not user and user_ref.isdigit():
+        user = db.session.get(User, int(user_ref))
+    if not user:
+        raise click.ClickException(f'用户不存在: {user_ref}')
+
+    job = BulkIngest(source, user.id, workers=workers, batch_size=batch_size,
+                     checkpoint_path=checkpoint, report=click.echo, quiet=not verbose)
+    if restart and os.path.exists(job.checkpoint_path):
+        os.remove(job.checkpoint_path)
+
+    click.echo(f'导入 {source} -> 用户 {user.username}（{workers} 个解析进程）')
+    stats = job.run()
+    if stats['failed']:
+        click.echo(f"{stats['failed']} 个文件导入失败，失败的论文可在详情页重新解析", err=True)
+    if stats['retry']:
+        click.echo(f"{stats['retry']} 个文件未能写入存储，未记入检查点，重新执行同一命令时重试", err=True)
@@ -5,6 +5,44 @@ from flask_sqlalchemy import SQLAlchemy
 db = SQLAlchemy()
 
 
+def upgrade_schema():
+    """
+    为已存在的表补充模型中新增的列和索引
+
+    项目未使用迁移工具，db.create_all() 只创建缺失的表，不会修改已有表；
+    新增列在旧数据上为 NULL，读取时按空值处理。
+    """
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                db.session.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+        db.session.commit()
+
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+
+def _load_stage_versions(value):
+    """解析阶段版本 JSON -> 字典（旧数据为空）"""
+    import json
+    try:
+        versions = json.loads(value) if value else {}
+    except ValueError:
+        return {}
+    return versions if isinstance(versions, dict) else {}
+
+
+def _dump_stage_versions(versions):
+    import json
+    return json.dumps(versions or {}, sort_keys=True)
+
+
 class User(db.Model):
     """用户模型"""
     __tablename__ = 'users'
@@ -52,6 +90,8 @@ class Paper(db.Model):
     filename = db.Column(db.String(255), nullable=False)
     filepath = db.Column(db.String(500), nullable=False)
     filesize = db.Column(db.Integer)
+    content_hash = db.Column(db.String(64), index=True)  # 文件内容SHA-256，相同内容的上传共享文件和解析结果
+    batch_id = db.Column(db.Integer, db.ForeignKey('upload_batches.id'), index=True)  # 批量上传时所属批次
 
     # 解析后的论文信息
     title = db.Column(db.String(500), default='')
@@ -60,7 +100,10 @@ class Paper(db.Model):
     keywords = db.Column(db.Text, default='')  # 存储为JSON字符串
     publish_date = db.Column(db.String(50), default='')
     category = db.Column('source', db.String(50), default='')  # 论文分类：计算机、物理、人文等
-    sections = db.Column(db.Text, default='')  # 存储为JSON字符串
+    # 旧版整篇章节JSON，首次读取时迁移到 paper_sections 表后清空（见 section_store）
+    legacy_sections = db.Column('sections', db.Text, default='')
+    sections_ready = db.Column(db.Boolean, default=False)  # 章节由后台 sections 任务在元数据之后提取
+    stage_versions = db.Column(db.Text, default='')  # 各解析阶段的版本，JSON：{"metadata": "1", ...}
 
     # 状态
     status = db.Column(db.String(20), default='pending', index=True)  # pending, parsing, parsed, failed
@@ -72,6 +115,8 @@ class Paper(db.Model):
 
     # 关系
     generate_records = db.relationship('GenerateRecord', backref='paper', lazy='dynamic', cascade='all, delete-orphan')
+    jobs = db.relationship('Job', backref='paper', lazy='dynamic', cascade='all, delete-orphan')
+    section_rows = db.relationship('PaperSection', backref='paper', lazy='dynamic', cascade='all, delete-orphan')
 
     # 复合索引
     __table_args__ = (
@@ -87,13 +132,144 @@ class Paper(db.Model):
             'authors': self.authors,
             'abstract': self.abstract,
             'keywords': self.keywords,
-            'sections': self.sections,
+            'sectionsReady': bool(self.sections_ready),
             'publishDate': self.publish_date,
             'category': self.category,
             'status': self.status,
             'uploadTime': self.upload_time.isoformat() if self.upload_time else None
         }
 
+    def get_stage_versions(self):
+        return _load_stage_versions(self.stage_versions)
+
+    def set_stage_versions(self, versions):
+        self.stage_versions = _dump_stage_versions(versions)
+
+
+class UploadBatch(db.Model):
+    """批量上传批次（一次请求上传的多篇论文）"""
+    __tablename__ = 'upload_batches'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    total = db.Column(db.Integer, default=0)  # 成功接收的文件数
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # 关系（删除批次不删除论文）
+    papers = db.relationship('Paper', backref='batch', lazy='dynamic')
+
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'id': self.id,
+            'total': self.total,
+            'createdAt': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class UploadSession(db.Model):
+    """分块上传会话（init → 逐块追加 → finalize，中断后可从已接收位置续传）"""
+    __tablename__ = 'upload_sessions'
+
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex，同时用作临时文件名
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    filename = db.Column(db.String(255), nullable=False)
+    total_size = db.Column(db.Integer, nullable=False)  # 客户端声明的文件大小
+    received = db.Column(db.Integer, default=0)  # 已完整写入的字节数
+    writer = db.Column(db.String(32))  # 正在写入分块的请求标识（抢占写入权，见 chunked_upload.append_chunk）
+    write_started_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'uploadId': self.id,
+            'filename': self.filename,
+            'totalSize': self.total_size,
+            'received': self.received
+        }
+
+
+class ParseResult(db.Model):
+    """解析结果缓存（按文件内容哈希和解析器版本共享，重复上传直接复用）"""
+    __tablename__ = 'parse_results'
+
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False)
+    parser_version = db.Column(db.String(20), nullable=False)
+
+    title = db.Column(db.String(500), default='')
+    authors = db.Column(db.Text, default='')  # 存储为JSON字符串
+    abstract = db.Column(db.Text, default='')
+    keywords = db.Column(db.Text, default='')  # 存储为JSON字符串
+    publish_date = db.Column(db.String(50), default='')
+    category = db.Column(db.String(50), default='')
+    sections = db.Column(db.Text, default='')  # 存储为JSON字符串
+    sections_ready = db.Column(db.Boolean, default=False)
+    stage_versions = db.Column(db.Text, default='')  # 各解析阶段的版本，JSON
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('content_hash', 'parser_version', name='uq_parse_result_hash_version'),
+    )
+
+    def to_result(self):
+        """转换为与 PDFParser.parse() 返回值相同结构的字典"""
+        return {
+            'title': self.title,
+            'authors': self.authors,
+            'abstract': self.abstract,
+            'keywords': self.keywords,
+            'publish_date': self.publish_date,
+            'category': self.category,
+            'sections': self.sections,
+            'sections_ready': bool(self.sections_ready),
+            'stage_versions': self.get_stage_versions()
+        }
+
+    def get_stage_versions(self):
+        return _load_stage_versions(self.stage_versions)
+
+    def set_stage_versions(self, versions):
+        self.stage_versions = _dump_stage_versions(versions)
+
+
+class PageText(db.Model):
+    """逐页文本（解析时写入一次，按文件内容哈希和解析器版本共享）"""
+    __tablename__ = 'page_texts'
+
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False)
+    parser_version = db.Column(db.String(20), nullable=False)
+    page_number = db.Column(db.Integer, nullable=False)  # 从1开始
+    text = db.Column(db.Text, default='')  # pdfplumber 提取的原始文本（保留换行）
+
+    __table_args__ = (
+        db.UniqueConstraint('content_hash', 'parser_version', 'page_number', name='uq_page_text_hash_version_page'),
+    )
+
+
+class PaperSection(db.Model):
+    """论文章节（每个章节一行，生成内容时只读取需要的章节和列）"""
+    __tablename__ = 'paper_sections'
+
+    id = db.Column(db.Integer, primary_key=True)
+    paper_id = db.Column(db.Integer, db.ForeignKey('papers.id'), nullable=False)
+    ordinal = db.Column(db.Integer, nullable=False)  # 在论文中的顺序，从0开始
+    number = db.Column(db.String(50), default='')  # 章节序号，如 2.1、三
+    level = db.Column(db.Integer, default=1)
+    parent = db.Column(db.String(50))  # 父章节的序号
+    title = db.Column(db.String(500), default='')
+    content = db.Column(db.Text, default='')
+    char_count = db.Column(db.Integer, default=0)  # 内容长度
+    token_count = db.Column(db.Integer)  # 内容的估算token数（chunker.estimate_tokens），按预算分配时不读取内容
+
+    __table_args__ = (
+        db.Index('idx_paper_section_ordinal', 'paper_id', 'ordinal'),
+    )
+
 
 class KnowledgeBase(db.Model):
     """知识库模型"""
@@ -152,10 +328,15 @@ class GenerateRecord(db.Model):
     # 状态
     status = db.Column(db.String(20), default='pending')  # pending, generating, completed, failed
     error_message = db.Column(db.Text, default='')
+    cached = db.Column(db.Boolean, default=False)  # 内容是否来自生成结果缓存
 
     # 时间
     create_time = db.Column(db.DateTime, default=datetime.utcnow)
     duration = db.Column(db.Float, default=0)  # 生成耗时（秒）
+    first_token_time = db.Column(db.Float)  # 流式生成时首个token的耗时（秒），非流式生成为空
+
+    # 翻译记录的分段（按完成顺序逐段写入）
+    segments = db.relationship('TranslationSegment', backref='record', lazy='dynamic', cascade='all, delete-orphan')
 
     # 复合索引 - 提升查询性能
     __table_args__ = (
@@ -173,6 +354,123 @@ class GenerateRecord(db.Model):
             'content': self.content,
             'description': self.description,
             'status': self.status,
+            'errorMessage': self.error_message or '',
             'createTime': self.create_time.isoformat() if self.create_time else None,
-            'duration': self.duration
+            'duration': self.duration,
+            'firstTokenTime': self.first_token_time,
+            'cached': bool(self.cached)
+        }
+
+
+class TranslationSegment(db.Model):
+    """翻译分段：论文按页（或章节）拆分后各自翻译，每段完成后立即写入（见 services/translation.py）"""
+    __tablename__ = 'translation_segments'
+
+    id = db.Column(db.Integer, primary_key=True)
+    record_id = db.Column(db.Integer, db.ForeignKey('generate_records.id'), nullable=False)
+    ordinal = db.Column(db.Integer, nullable=False)  # 在译文中的顺序，从0开始
+    title = db.Column(db.String(500), default='')  # 论文标题、摘要、第N页、第N页（2/3）等
+    source = db.Column(db.Text, default='')  # 原文
+    translated = db.Column(db.Text, default='')  # 译文
+
+    status = db.Column(db.String(20), default='pending')  # pending, completed, failed
+    error_message = db.Column(db.Text, default='')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('record_id', 'ordinal', name='uq_translation_segment_ordinal'),
+        db.Index('idx_translation_segment_updated', 'record_id', 'updated_at'),
+    )
+
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'ordinal': self.ordinal,
+            'title': self.title,
+            'original': self.source,
+            'translated': self.translated or '',
+            'status': self.status,
+            'errorMessage': self.error_message or ''
+        }
+
+
+class GenerationCache(db.Model):
+    """生成结果缓存（按论文内容哈希、生成类型、模型和提示词版本共享，见 services/generation_cache.py）"""
+    __tablename__ = 'generation_cache'
+
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False)
+    type = db.Column(db.String(50), nullable=False)  # mindmap, timeline, graph, summary, review
+    model = db.Column(db.String(50), nullable=False)
+    prompt_version = db.Column(db.String(20), nullable=False)  # AIGenerator.PROMPT_VERSIONS
+    content = db.Column(db.Text, default='')  # 存储为JSON字符串
+
+    hits = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow)  # 按最近使用时间淘汰
+
+    __table_args__ = (
+        db.UniqueConstraint('content_hash', 'type', 'model', 'prompt_version', name='uq_generation_cache_key'),
+        db.Index('idx_generation_cache_last_used', 'last_used_at'),
+    )
+
+
+class Job(db.Model):
+    """后台任务模型（基于数据库表的任务队列，由独立的 worker 进程消费）"""
+    __tablename__ = 'jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(30), nullable=False)  # parse
+    paper_id = db.Column(db.Integer, db.ForeignKey('papers.id'), index=True)
+    payload = db.Column(db.Text, default='{}')  # 存储为JSON字符串
+
+    # 状态
+    status = db.Column(db.String(20), default='pending')  # pending, running, done, failed
+    attempts = db.Column(db.Integer, default=0)
+    max_attempts = db.Column(db.Integer, default=3)
+    worker = db.Column(db.String(64), default='')  # 领取任务的 worker 标识
+    error_message = db.Column(db.Text, default='')
+
+    # 进度（worker 执行时写入，web 进程的事件中继读取后推送给订阅的客户端）
+    stage = db.Column(db.String(50), default='')  # extracting, metadata, ai_title_authors ...
+    progress_current = db.Column(db.Integer, default=0)
+    progress_total = db.Column(db.Integer, default=0)
+
+    # 时间
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)  # 执行期间随进度写入，回收超时任务以此为准
+    finished_at = db.Column(db.DateTime)
+
+    # 复合索引 - worker 按状态和创建时间领取任务
+    __table_args__ = (
+        db.Index('idx_job_status_kind_created', 'status', 'kind', 'created_at'),
+    )
+
+    def get_payload(self):
+        import json
+        try:
+            return json.loads(self.payload) if self.payload else {}
+        except:
+            return {}
+
+    def set_payload(self, payload):
+        import json
+        self.payload = json.dumps(payload or {}, ensure_ascii=False)
+
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'paperId': self.paper_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'errorMessage': self.error_message,
+            'stage': self.stage,
+            'current': self.progress_current,
+            'total': self.progress_total,
+            'createdAt': self.created_at.isoformat() if self.created_at else None,
+            'startedAt': self.started_at.isoformat() if self.started_at else None,
+            'finishedAt': self.finished_at.isoformat() if self.finished_at else None
         }
@@ -1,21 +1,32 @@
 import json
-import os
 import time
-from typing import Dict, List, Optional, Any
-from zhipuai import ZhipuAI
+from typing import Dict, Iterator, List, Optional, Any
+from app.services.chunker import input_budget, pack_sections, pack_texts, truncate_to_tokens
+from app.services.llm_client import get_client
 
 
 class AIGenerator:
     """AI内容生成器 - 使用智谱AI"""
 
+    # 各生成类型的提示词版本，修改提示词或内容组织方式后递增，使生成结果缓存失效
+    PROMPT_VERSIONS = {
+        'mindmap': '1',
+        'timeline': '1',
+        'graph': '1',
+        'summary': '1',
+        'review': '1'
+    }
+
     def __init__(self):
-        self.api_key = os.environ.get('ZHIPUAI_API_KEY', '')
-        print(f"[DEBUG] 智谱AI API Key: {'已设置' if self.api_key else '未设置'}")
-        if self.api_key:
-            self.client = ZhipuAI(api_key=self.api_key)
-            print(f"[DEBUG] 智谱AI客户端已初始化")
-        else:
-            self.client = None
+        # 客户端由 llm_client 按进程共享，这里只取引用
+        self.client = get_client()
+        # 是否返回过模拟数据（未配置API Key或调用失败），模拟数据不写入生成结果缓存
+        self.used_mock = False
+        # 模型输出无法解析、返回了默认结构，同样不写入生成结果缓存
+        self.degraded = False
+        # 最近一次流式调用从发出请求到收到首个token的耗时（秒）
+        self.first_token_time = None
+        if not self.client:
             print("警告: 未设置ZHIPUAI_API_KEY环境变量，将使用mock数据")
 
     def _call_api_with_retry(
@@ -86,6 +97,96 @@ class AIGenerator:
             print(f"[DEBUG] API调用失败，返回mock数据: {str(last_error)}")
             return self._get_mock_response(messages)
 
+    def _stream_api_with_retry(
+        self,
+        messages: List[Dict],
+        model: str = "glm-4-flash",
+        max_retries: int = 3,
+        timeout: int = 30,
+        max_tokens: int = 2000
+    ) -> Iterator[str]:
+        """
+        流式调用智谱AI API（stream=True），逐段返回模型输出的增量文本
+
+        收到首个token前出错时按 _call_api_with_retry 的规则重试；已经返回内容后出错直接抛出，
+        避免重试后输出重复的内容。未初始化客户端或重试失败（非超时）时分段返回模拟数据。
+        首个token的耗时记录在 first_token_time。
+
+        Args:
+            messages: 消息列表
+            model: 模型名称
+            max_retries: 最大重试次数（默认3次）
+            timeout: 超时时间（秒，默认30秒）
+            max_tokens: 最大token数（默认2000）
+
+        Yields:
+            str: 增量文本
+
+        Raises:
+            TimeoutError: 超时且重试失败
+        """
+        start_time = time.time()
+        self.first_token_time = None
+
+        if not self.client:
+            print("[DEBUG] 使用mock数据（client未初始化）")
+            yield from self._stream_mock_response(messages, start_time)
+            return
+
+        print(f"[DEBUG] 流式调用智谱AI API，模型: {model}, max_tokens: {max_tokens}")
+        last_error = None
+        for attempt in range(max_retries):
+            stream = None
+            try:
+                stream = self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=0.7,
+                    max_tokens=max_tokens,
+                    timeout=timeout,
+                    stream=True
+                )
+
+                for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if not delta:
+                        continue
+                    if self.first_token_time is None:
+                        self.first_token_time = time.time() - start_time
+                        print(f"[DEBUG] 首个token耗时: {self.first_token_time:.2f}秒")
+                    yield delta
+
+                print(f"[DEBUG] 流式调用完成，总耗时: {time.time() - start_time:.2f}秒")
+                return
+
+            except Exception as e:
+                if self.first_token_time is not None:
+                    raise
+                last_error = e
+                print(f"[DEBUG] 流式调用错误 (尝试 {attempt + 1}/{max_retries}): {str(e)}")
+                if attempt < max_retries - 1:
+                    time.sleep(1)  # 等待1秒后重试
+
+            finally:
+                # 提前结束（客户端断开）时关闭连接，不再接收剩余输出
+                http_response = getattr(stream, 'response', None)
+                if http_response is not None:
+                    http_response.close()
+
+        if isinstance(last_error, TimeoutError):
+            raise TimeoutError(f"API调用超时，已重试{max_retries}次")
+        print(f"[DEBUG] 流式调用失败，返回mock数据: {str(last_error)}")
+        yield from self._stream_mock_response(messages, start_time)
+
+    def _stream_mock_response(self, messages: List[Dict], start_time: float, piece_chars: int = 20) -> Iterator[str]:
+        """把模拟响应按固定长度分段返回（用于测试）"""
+        response = self._get_mock_response(messages)
+        self.first_token_time = time.time() - start_time
+        for i in range(0, len(response), piece_chars):
+            yield response[i:i + piece_chars]
+
     def _call_api(self, messages: List[Dict], model: str = "glm-4-flash") -> str:
         """调用智谱AI API"""
         if not self.client:
@@ -104,10 +205,20 @@ class AIGenerator:
             print(f"AI API调用错误: {str(e)}")
             return self._get_mock_response(messages)
 
+    @property
+    def cacheable(self) -> bool:
+        """本次生成的结果是否可以写入生成结果缓存（模拟数据和默认结构不缓存）"""
+        return not (self.used_mock or self.degraded)
+
     def _get_mock_response(self, messages: List[Dict]) -> str:
         """获取模拟响应（用于测试）"""
+        self.used_mock = True
         user_message = messages[-1].get('content', '')
 
+        if user_message.startswith('请将以下论文内容'):
+            # translate_segment 的提示词（原文中可能包含下面的关键词）
+            return "（模拟译文）"
+
         if '思维导图' in user_message or 'mindmap' in user_message.lower():
             return json.dumps({
                 "name": "论文中心",
@@ -314,6 +425,7 @@ class AIGenerator:
             Dict: 验证后的思维导图数据
         """
         if not isinstance(data, dict) or "name" not in data:
+            self.degraded = True
             return {"name": "论文", "children": []}
 
         # 确保有children字段
@@ -384,6 +496,33 @@ class AIGenerator:
 
         return data
 
+    def _body_excerpt_prompt(self, paper_info: Dict, max_tokens: int) -> str:
+        """
+        论文没有章节数据时，用逐页文本的正文开头补充上下文
+
+        Args:
+            paper_info: 论文信息，body 字段为逐页文本存储中读取的正文开头
+            max_tokens: 最多使用的 token 数（估算，见 chunker.estimate_tokens）
+
+        Returns:
+            str: 追加到prompt的正文节选，没有正文时返回空字符串
+        """
+        body = truncate_to_tokens(paper_info.get('body'), max_tokens)
+        if not body:
+            return ""
+        return f"\n正文节选：\n{body}\n"
+
+    def _has_sections(self, paper_info: Dict) -> bool:
+        """论文信息中是否包含有效的章节数据"""
+        sections = paper_info.get('sections', '')
+        if not sections:
+            return False
+        try:
+            sections_list = json.loads(sections) if isinstance(sections, str) else sections
+            return bool(sections_list)
+        except:
+            return False
+
     def generate_mindmap(self, paper_info: Dict, model: str = "glm-4-flash") -> Dict:
         """
         生成思维导图 - 基于章节结构
@@ -412,12 +551,11 @@ class AIGenerator:
                 if sections_list:
                     prompt += "\n论文章节结构（请直接使用这些章节作为主要节点）：\n"
 
-                    # 按层级组织章节
-                    for section in sections_list:
+                    # 按层级组织章节，只用标题，章节过多时按预算舍去末尾的章节
+                    for section in pack_sections(sections_list, input_budget('mindmap', model), with_content=False):
                         section_title = section.get('title', '')
                         section_number = section.get('number', '')
                         section_level = section.get('level', 1)
-                        section_content = section.get('content', '')[:150]
 
                         # 根据层级添加缩进
                         indent = "  " * (section_level - 1)
@@ -428,6 +566,9 @@ class AIGenerator:
             except:
                 pass
 
+        if not self._has_sections(paper_info):
+            prompt += self._body_excerpt_prompt(paper_info, input_budget('mindmap', model))
+
         prompt += """
 要求：
 1. 返回标准JSON格式
@@ -442,7 +583,7 @@ class AIGenerator:
 思维导图数据："""
 
         messages = [{"role": "user", "content": prompt}]
-        response = self._call_api_with_retry(messages)
+        response = self._call_api_with_retry(messages, model=model)
 
         try:
             result = self._parse_json_response(response)
@@ -456,7 +597,8 @@ class AIGenerator:
             return self._build_default_mindmap(paper_info)
 
     def _build_default_mindmap(self, paper_info: Dict) -> Dict:
-        """基于论文章节构建默认思维导图结构"""
+        """基于论文章节构建默认思维导图结构（模型输出无法解析时使用）"""
+        self.degraded = True
         root_name = paper_info.get('title', '论文')
         if len(root_name) > 30:
             root_name = root_name[:30] + '...'
@@ -521,10 +663,11 @@ class AIGenerator:
                 sections_list = json.loads(sections) if isinstance(sections, str) else sections
                 if sections_list:
                     prompt += "\n论文章节结构：\n"
-                    for section in sections_list:
+                    # 按 token 预算分配各章节内容的长度
+                    for section in pack_sections(sections_list, input_budget('timeline', model)):
                         section_title = section.get('title', '')
                         section_number = section.get('number', '')
-                        section_content = section.get('content', '')[:200]  # 限制长度
+                        section_content = section.get('content', '')
                         if section_number:
                             prompt += f"- {section_number} {section_title}: {section_content}\n"
                         else:
@@ -532,6 +675,9 @@ class AIGenerator:
             except:
                 pass
 
+        if not self._has_sections(paper_info):
+            prompt += self._body_excerpt_prompt(paper_info, input_budget('timeline', model))
+
         prompt += """
 要求：
 1. 返回标准JSON数组格式
@@ -544,16 +690,20 @@ class AIGenerator:
 时间线数据："""
 
         messages = [{"role": "user", "content": prompt}]
-        response = self._call_api_with_retry(messages)
+        response = self._call_api_with_retry(messages, model=model)
 
         try:
             result = self._parse_json_response(response)
             if isinstance(result, list):
-                # 验证时间线格式
+                # 验证时间线格式，没有有效节点时按解析失败处理
                 validated = self._validate_timeline_response(result)
+                if not validated:
+                    self.degraded = True
                 return validated
+            self.degraded = True
             return []
         except:
+            self.degraded = True
             return []
 
     def generate_graph(self, paper_info: Dict, model: str = "glm-4-flash") -> Dict:
@@ -583,13 +733,16 @@ class AIGenerator:
                 sections_list = json.loads(sections) if isinstance(sections, str) else sections
                 if sections_list:
                     prompt += "\n主要章节内容：\n"
-                    for section in sections_list[:8]:  # 限制数量
+                    for section in pack_sections(sections_list, input_budget('graph', model)):
                         section_title = section.get('title', '')
-                        section_content = section.get('content', '')[:300]
+                        section_content = section.get('content', '')
                         prompt += f"- {section_title}: {section_content}\n"
             except:
                 pass
 
+        if not self._has_sections(paper_info):
+            prompt += self._body_excerpt_prompt(paper_info, input_budget('graph', model))
+
         prompt += """
 要求：
 1. 返回标准JSON格式
@@ -612,7 +765,7 @@ class AIGenerator:
 请生成概念图谱JSON："""
 
         messages = [{"role": "user", "content": prompt}]
-        response = self._call_api_with_retry(messages)
+        response = self._call_api_with_retry(messages, model=model)
 
         try:
             result = self._parse_json_response(response)
@@ -626,7 +779,8 @@ class AIGenerator:
             return self._build_default_graph(paper_info)
 
     def _build_default_graph(self, paper_info: Dict) -> Dict:
-        """基于论文信息构建默认概念图谱结构"""
+        """基于论文信息构建默认概念图谱结构（模型输出无法解析时使用）"""
+        self.degraded = True
         title = paper_info.get('title', '核心概念')
         if len(title) > 20:
             title = title[:20]
@@ -671,6 +825,13 @@ class AIGenerator:
 
     def generate_summary(self, paper_info: Dict, model: str = "glm-4-flash") -> Dict:
         """生成论文阅读报告（八元组）"""
+        response = self._call_api_with_retry(self._summary_messages(paper_info, model), model=model)
+
+        print(f"[DEBUG] generate_summary API响应: {response[:500] if response else 'None'}")
+        return self._parse_summary(response, paper_info)
+
+    def _summary_messages(self, paper_info: Dict, model: str) -> List[Dict]:
+        """阅读报告的提示词"""
         # 构建包含章节内容的详细prompt
         sections_text = ""
         sections = paper_info.get('sections', '')
@@ -679,15 +840,18 @@ class AIGenerator:
                 sections_list = json.loads(sections) if isinstance(sections, str) else sections
                 if sections_list:
                     sections_text = "\n主要章节内容：\n"
-                    for section in sections_list[:8]:
+                    for section in pack_sections(sections_list, input_budget('summary', model)):
                         section_title = section.get('title', '')
                         section_number = section.get('number', '')
-                        section_content = section.get('content', '')[:500]
+                        section_content = section.get('content', '')
                         header = f"{section_number} {section_title}" if section_number else section_title
                         sections_text += f"- {header}: {section_content}\n"
             except:
                 pass
 
+        if not sections_text:
+            sections_text = self._body_excerpt_prompt(paper_info, input_budget('summary', model))
+
         prompt = f"""请基于以下论文信息，生成一个结构化的论文阅读报告，必须返回标准JSON格式，包含以下八个字段：
 
 论文标题: {paper_info.get('title', '')}
@@ -709,11 +873,10 @@ class AIGenerator:
 
 请生成论文阅读报告JSON："""
 
-        messages = [{"role": "user", "content": prompt}]
-        response = self._call_api_with_retry(messages)
-
-        print(f"[DEBUG] generate_summary API响应: {response[:500] if response else 'None'}")
+        return [{"role": "user", "content": prompt}]
 
+    def _parse_summary(self, response: str, paper_info: Dict) -> Dict:
+        """解析阅读报告的模型输出，缺少的字段补为空，解析失败时返回默认结构"""
         try:
             # 尝试解析JSON
             if "```json" in response:
@@ -732,6 +895,7 @@ class AIGenerator:
             print(f"[DEBUG] generate_summary JSON解析失败: {e}")
             print(f"[DEBUG] 原始响应内容: {response[:300] if response else 'empty'}")
             # 如果解析失败，返回默认结构
+            self.degraded = True
             return {
                 "abstract": paper_info.get('abstract', '')[:200] + "...",
                 "keywords": "",
@@ -754,6 +918,12 @@ class AIGenerator:
         Returns:
             Dict: 评审报告，包含各要素的评分和评语
         """
+        print("[DEBUG] 开始生成评审报告...")
+        response = self._call_api_with_retry(self._review_messages(paper_info, model), model=model, timeout=30)
+        return self._parse_review(response)
+
+    def _review_messages(self, paper_info: Dict, model: str) -> List[Dict]:
+        """评审报告的提示词"""
         prompt = f"""请对以下论文进行学术评审，对各个学术要素进行完整性评分（满分10分）。
 
 【论文信息】
@@ -761,7 +931,7 @@ class AIGenerator:
 作者：{paper_info.get('authors', '')}
 摘要：{paper_info.get('abstract', '')}
 关键词：{paper_info.get('keywords', '')}
-
+{self._body_excerpt_prompt(paper_info, input_budget('review', model))}
 【评审要求】
 请对以下8个学术要素进行评分和评语（每项0-10分）：
 1. title_quality: 标题质量（准确性、简洁性、吸引力）
@@ -790,11 +960,10 @@ class AIGenerator:
 
 请生成评审报告JSON："""
 
-        messages = [{"role": "user", "content": prompt}]
-
-        print("[DEBUG] 开始生成评审报告...")
-        response = self._call_api_with_retry(messages, timeout=30)
+        return [{"role": "user", "content": prompt}]
 
+    def _parse_review(self, response: str) -> Dict:
+        """解析评审报告的模型输出，补全缺少的评分字段，解析失败时返回默认评分"""
         try:
             result = self._parse_json_response(response)
 
@@ -829,6 +998,7 @@ class AIGenerator:
                 return result
 
             # 返回默认格式
+            self.degraded = True
             return {
                 'title_quality': {'score': 5, 'comment': '未能评估'},
                 'abstract_quality': {'score': 5, 'comment': '未能评估'},
@@ -846,6 +1016,7 @@ class AIGenerator:
         except Exception as e:
             print(f"[DEBUG] 解析评审报告失败: {str(e)}")
             # 返回默认格式
+            self.degraded = True
             return {
                 'title_quality': {'score': 5, 'comment': '评估失败'},
                 'abstract_quality': {'score': 5, 'comment': '评估失败'},
@@ -860,239 +1031,54 @@ class AIGenerator:
                 'suggestions': []
             }
 
-    def translate_paper(self, paper_info: Dict, target_lang: str = 'zh', model: str = "glm-4-flash") -> Dict:
+    def stream_report(self, gen_type: str, paper_info: Dict, model: str = "glm-4-flash") -> Iterator[str]:
         """
-        翻译论文完整内容 - 返回对照翻译格式
+        流式生成阅读报告（summary）或评审报告（review），逐段返回模型输出
+
+        完整输出拼接后用 parse_report 解析，结果与 generate_summary / generate_review 相同。
+        """
+        if gen_type == 'summary':
+            return self._stream_api_with_retry(self._summary_messages(paper_info, model), model=model)
+        if gen_type == 'review':
+            return self._stream_api_with_retry(self._review_messages(paper_info, model), model=model, timeout=30)
+        raise ValueError(f"不支持流式生成的类型: {gen_type}")
+
+    def parse_report(self, gen_type: str, response: str, paper_info: Dict) -> Dict:
+        """解析 stream_report 的完整输出"""
+        if gen_type == 'summary':
+            return self._parse_summary(response, paper_info)
+        return self._parse_review(response)
+
+    def translate_segment(self, title: str, content: str, target_lang: str = 'zh', model: str = "glm-4-flash",
+                          max_tokens: int = 4000) -> str:
+        """
+        翻译论文的一个分段（一页、一个章节或其中一部分，见 services/translation.py）
 
         Args:
-            paper_info: 包含title, abstract, sections等字段的论文信息
+            title: 分段标题（如 摘要、第3页），帮助模型判断内容类型
+            content: 原文
             target_lang: 目标语言，'zh'为中文，'en'为英文
             model: AI模型名称
+            max_tokens: 译文的最大token数
 
         Returns:
-            Dict: 包含originalSections（原文分页）和translatedContent（翻译内容）的字典
+            str: 译文（不含标题）
         """
         lang_name = '中文' if target_lang == 'zh' else '英文'
 
-        # 构建分段翻译prompt - 每段单独翻译并保持格式
-        sections_to_translate = []
-
-        # 添加标题
-        if paper_info.get('title'):
-            sections_to_translate.append({
-                'title': '论文标题',
-                'content': paper_info.get('title', '')
-            })
-
-        # 添加摘要
-        if paper_info.get('abstract'):
-            sections_to_translate.append({
-                'title': '摘要',
-                'content': paper_info.get('abstract', '')
-            })
-
-        # 添加关键词
-        if paper_info.get('keywords'):
-            keywords_str = paper_info.get('keywords', '')
-            if isinstance(keywords_str, list):
-                keywords_str = ', '.join(keywords_str)
-            if keywords_str:
-                sections_to_translate.append({
-                    'title': '关键词',
-                    'content': keywords_str
-                })
-
-        # 添加章节内容和PDF完整内容
-        sections = paper_info.get('sections', '')
-
-        # 从PDF文件中提取完整文本内容
-        filepath = paper_info.get('filepath', '')
-        has_pdf_content = False
-        pdf_total_pages = 0
-
-        print(f"[DEBUG] 翻译开始 - filepath={filepath}")
+        prompt = f"""请将以下论文内容（{title}）准确翻译成{lang_name}。
 
-        if filepath and os.path.exists(filepath):
-            print(f"[DEBUG] PDF文件存在，开始提取文本")
-
-            # 方法1: 使用pdfplumber（更可靠）
-            try:
-                import pdfplumber
-                import re
-                print(f"[DEBUG] 使用pdfplumber提取PDF文本")
-                with pdfplumber.open(filepath) as pdf:
-                    pdf_total_pages = len(pdf.pages)
-                    print(f"[DEBUG] PDF总页数: {pdf_total_pages}")
-
-                    # 提取所有页面的文本
-                    for page_num in range(min(pdf_total_pages, 50)):  # 最多50页
-                        page = pdf.pages[page_num]
-                        try:
-                            text = page.extract_text()
-                            if text and text.strip():
-                                # 改进的文本清理
-                                lines = text.split('\n')
-                                cleaned_lines = []
-
-                                for line in lines:
-                                    line = line.strip()
-                                    # 跳过空行和太短的行
-                                    if not line or len(line) <= 1:
-                                        continue
-
-                                    # 过滤明显的乱码行
-                                    # 1. 检查是否包含过多特殊字符
-                                    special_char_ratio = sum(1 for c in line if ord(c) < 32 or ord(c) == 65533) / len(line)
-                                    if special_char_ratio > 0.3:  # 超过30%是控制字符或替换字符，跳过
-                                        continue
-
-                                    # 2. 检查是否包含足够的可读字符（字母、数字、中文）
-                                    readable_chars = sum(1 for c in line if c.isalnum() or '\u4e00' <= c <= '\u9fff')
-                                    if readable_chars < len(line) * 0.3:  # 可读字符少于30%，跳过
-                                        continue
-
-                                    # 3. 过滤纯符号或数字的行
-                                    if re.match(r'^[\d\s\-\+\=\.\/\|\\\(\)\[\]\{\}<>]+$', line):
-                                        continue
-
-                                    # 4. 替换常见的PDF伪影
-                                    line = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f\ufffd]', '', line)
-
-                                    cleaned_lines.append(line)
-
-                                # 将页面内容作为一个段落
-                                if cleaned_lines:
-                                    page_content = '\n'.join(cleaned_lines)
-                                    # 只要有足够的内容就添加
-                                    if len(page_content) > 30:
-                                        sections_to_translate.append({
-                                            'title': f'第{page_num + 1}页',
-                                            'content': page_content[:2500]  # 每页最多2500字符，留空间给翻译
-                                        })
-                                        has_pdf_content = True
-                                        print(f"[DEBUG] 第{page_num + 1}页提取成功，清理后内容长度: {len(page_content)}")
-                        except Exception as e:
-                            print(f"[DEBUG] 提取第{page_num + 1}页失败: {str(e)}")
-                            continue
-
-                print(f"[DEBUG] pdfplumber提取完成，共提取{len([s for s in sections_to_translate if '页' in s['title']])}页内容")
-
-            except Exception as e:
-                print(f"[DEBUG] pdfplumber提取失败: {str(e)}，尝试PyPDF2")
-                import traceback
-                traceback.print_exc()
-
-                # 方法2: 使用PyPDF2作为备用
-                try:
-                    import PyPDF2
-                    with open(filepath, 'rb') as pdf_file:
-                        pdf_reader = PyPDF2.PdfReader(pdf_file)
-                        pdf_total_pages = len(pdf_reader.pages)
-                        print(f"[DEBUG] 使用PyPDF2，PDF总页数: {pdf_total_pages}")
-
-                        for page_num in range(min(pdf_total_pages, 50)):
-                            page = pdf_reader.pages[page_num]
-                            try:
-                                text = page.extract_text()
-                                if text and text.strip():
-                                    lines = text.split('\n')
-                                    cleaned_lines = []
-                                    for line in lines:
-                                        line = line.strip()
-                                        if line and len(line) > 1:
-                                            cleaned_lines.append(line)
-
-                                    if cleaned_lines:
-                                        page_content = '\n'.join(cleaned_lines)
-                                        if len(page_content) > 50:
-                                            sections_to_translate.append({
-                                                'title': f'第{page_num + 1}页',
-                                                'content': page_content[:3000]
-                                            })
-                                            has_pdf_content = True
-                                            print(f"[DEBUG] PyPDF2第{page_num + 1}页提取成功")
-                            except Exception as e:
-                                print(f"[DEBUG] PyPDF2提取第{page_num + 1}页失败: {str(e)}")
-                                continue
-
-                except Exception as e2:
-                    print(f"[DEBUG] PyPDF2也失败了: {str(e2)}")
-                    import traceback
-                    traceback.print_exc()
-
-        else:
-            print(f"[DEBUG] PDF文件不存在或路径为空: filepath={filepath}, exists={os.path.exists(filepath) if filepath else False}")
-
-        if not has_pdf_content:
-            print(f"[WARNING] 未能从PDF提取任何内容，请检查PDF是否为扫描版图片")
-
-        # 如果没有从PDF提取到内容，使用数据库中的sections
-        if not has_pdf_content and sections:
-            try:
-                sections_list = json.loads(sections) if isinstance(sections, str) else sections
-                for section in sections_list[:15]:  # 限制章节数量
-                    section_title = section.get('title', '')
-                    section_number = section.get('number', '')
-                    section_content = section.get('content', '')
-
-                    if section_title or section_content:
-                        header = f"{section_number} {section_title}" if section_number else section_title
-                        sections_to_translate.append({
-                            'title': header,
-                            'content': section_content or ''
-                        })
-            except:
-                pass
-
-        # 构建翻译prompt - 要求分段返回带标记的翻译结果
-        sections_text = ""
-        for idx, section in enumerate(sections_to_translate):
-            sections_text += f"\n【{section['title']}】\n{section['content']}\n"
-
-        print(f"[DEBUG] 待翻译内容总长度: {len(sections_text)} 字符，共 {len(sections_to_translate)} 个部分")
-
-        # 限制翻译内容量，确保能完整输出
-        # 最多翻译前10个section，每个section最多2000字符
-        max_sections = 10
-        if len(sections_to_translate) > max_sections:
-            print(f"[DEBUG] 内容过多，只翻译前{max_sections}个部分")
-            sections_to_translate = sections_to_translate[:max_sections]
-            sections_text = ""
-            for idx, section in enumerate(sections_to_translate):
-                sections_text += f"\n【{section['title']}】\n{section['content']}\n"
-
-        prompt = f"""请将以下论文内容准确翻译成{lang_name}。
-
-{sections_text}
+{content}
 
 翻译要求：
-1. 保持原有的结构，每个【标题】对应一个翻译段落
-2. 翻译后的内容必须使用【标题】格式标记，例如：【摘要】
-3. 对于PDF正文内容，请逐页完整翻译，保持原文的意思和结构
-4. 保持学术风格和专业术语的准确性
-5. 专业术语使用标准译法
-6. 直接输出翻译后的完整内容，每个翻译段用【】标记标题
-7. 不要添加任何说明或注释
-8. 必须翻译所有【标题】标记的内容，不要遗漏
+1. 完整翻译全部内容，保持原文的意思、段落和结构
+2. 保持学术风格和专业术语的准确性，专业术语使用标准译法
+3. 只输出译文，不要添加标题、说明或注释
 
 请开始翻译："""
 
         messages = [{"role": "user", "content": prompt}]
-        # 增加max_tokens确保能输出完整翻译
-        response = self._call_api_with_retry(messages, timeout=180, max_tokens=16000)
-
-        # 构建原文分段（用于前端对照显示）
-        original_sections = []
-        for section in sections_to_translate:
-            original_sections.append({
-                'title': section['title'],
-                'content': section['content']
-            })
-
-        return {
-            'originalSections': original_sections,
-            'translatedContent': response
-        }
+        return self._call_api_with_retry(messages, model=model, timeout=60, max_tokens=max_tokens)
 
     def chat_with_papers(self, question: str, papers_info: List[Dict], conversation_history: List[Dict] = None, model: str = "glm-4-flash") -> str:
         """
@@ -1100,20 +1086,36 @@ class AIGenerator:
 
         Args:
             question: 用户问题
-            papers_info: 论文列表，每个论文包含title, abstract, keywords等字段
+            papers_info: 论文列表，每个论文包含title, abstract, keywords, body（正文节选）等字段
             conversation_history: 对话历史
             model: AI模型名称
 
         Returns:
             str: AI回答
         """
+        messages = self._chat_messages(question, papers_info, conversation_history, model)
+        response = self._call_api_with_retry(messages, model=model, timeout=60)
+        return response
+
+    def stream_chat_with_papers(self, question: str, papers_info: List[Dict], conversation_history: List[Dict] = None, model: str = "glm-4-flash") -> Iterator[str]:
+        """与论文知识库对话（流式），参数同 chat_with_papers，逐段返回回答"""
+        messages = self._chat_messages(question, papers_info, conversation_history, model)
+        return self._stream_api_with_retry(messages, model=model, timeout=60)
+
+    def _chat_messages(self, question: str, papers_info: List[Dict], conversation_history: Optional[List[Dict]], model: str) -> List[Dict]:
+        """对话的消息列表：论文上下文、最近10轮对话历史和当前问题"""
         # 构建知识库上下文
         context_parts = ["以下是我上传的论文列表：\n"]
 
-        for idx, paper in enumerate(papers_info[:10], 1):  # 限制最多10篇论文
+        papers_info = papers_info[:10]  # 限制最多10篇论文
+        # 各篇论文的正文节选共用一个 token 预算，短的完整保留
+        bodies = pack_texts([(paper.get('title') or '', paper.get('body') or '') for paper in papers_info],
+                            input_budget('chat', model))
+        for idx, paper in enumerate(papers_info, 1):
             title = paper.get('title', '未知标题')
             abstract = paper.get('abstract', '')[:300]  # 限制摘要长度
             keywords = paper.get('keywords', '')
+            body = bodies[idx - 1][1] if idx <= len(bodies) else ''
 
             context_parts.append(f"""
 论文{idx}：
@@ -1121,13 +1123,15 @@ class AIGenerator:
 摘要：{abstract}
 关键词：{keywords}
 """)
+            if body:
+                context_parts.append(f"正文节选：{body}\n")
 
         context = ''.join(context_parts)
 
         # 构建对话历史
         history_text = ""
         if conversation_history:
-            for msg in conversation_history[-10]:  # 只保留最近10轮对话
+            for msg in conversation_history[-10:]:  # 只保留最近10轮对话
                 role = msg.get('role', 'user')
                 content = msg.get('content', '')
                 role_name = '用户' if role == 'user' else '助手'
@@ -1150,7 +1154,7 @@ class AIGenerator:
                 "content": "你是一个专业的学术论文助手，基于用户上传的论文内容回答问题。请基于论文内容给出准确、详细的回答。如果论文中没有相关信息，请如实告知。"
             })
             # 添加历史对话
-            for msg in conversation_history[-10]:
+            for msg in conversation_history[-10:]:
                 messages.append({
                     "role": msg.get('role', 'user'),
                     "content": msg.get('content', '')
@@ -1172,5 +1176,4 @@ class AIGenerator:
                 }
             ]
 
-        response = self._call_api_with_retry(messages, model=model, timeout=60)
-        return response
+        return messages
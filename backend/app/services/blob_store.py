@@ -0,0 +1,84 @@
+import hashlib
+import os
+import uuid
+from typing import BinaryIO, Optional, Tuple
+
+# 每次读写的块大小
+CHUNK_SIZE = 1024 * 1024  # 1MB
+
+
+def blob_path(upload_folder: str, content_hash: str) -> str:
+    """按内容哈希计算文件存储路径：uploads/blobs/ab/abcdef....pdf"""
+    return os.path.join(upload_folder, 'blobs', content_hash[:2], f'{content_hash}.pdf')
+
+
+class FileTooLargeError(ValueError):
+    """上传文件超过大小限制"""
+
+
+def save_stream(stream: BinaryIO, upload_folder: str, max_size: Optional[int] = None) -> Tuple[str, str, int]:
+    """
+    将上传流写入内容寻址存储，写入的同时计算SHA-256
+
+    先写入同目录下的临时文件，得到哈希后原子重命名到最终位置；
+    相同内容的文件已存在时丢弃临时文件，直接复用已有文件。
+
+    Args:
+        stream: 可读的二进制流（如 FileStorage.stream）
+        upload_folder: 上传根目录
+        max_size: 单个文件大小上限（字节），超过时抛出 FileTooLargeError
+
+    Returns:
+        Tuple[str, str, int]: (内容哈希, 文件路径, 文件大小)
+    """
+    tmp_dir = os.path.join(upload_folder, 'blobs', 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+    tmp_path = os.path.join(tmp_dir, f'{uuid.uuid4().hex}.part')
+
+    sha256 = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, 'wb') as f:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_size and size > max_size:
+                    raise FileTooLargeError(f'文件大小超过 {max_size // (1024 * 1024)}MB')
+                sha256.update(chunk)
+                f.write(chunk)
+
+        content_hash = sha256.hexdigest()
+        return content_hash, commit_file(tmp_path, upload_folder, content_hash), size
+
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def commit_file(tmp_path: str, upload_folder: str, content_hash: str) -> str:
+    """把已写完的临时文件移动到内容哈希对应的位置，返回最终路径"""
+    path = blob_path(upload_folder, content_hash)
+    if os.path.exists(path):
+        os.remove(tmp_path)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+    return path
+
+
+def release(path: str, content_hash: str) -> None:
+    """
+    论文删除后释放文件：仍有其他论文引用同一内容时保留文件
+
+    需要在删除论文记录并提交之后调用。
+    """
+    from app.models import Paper
+
+    if content_hash and Paper.query.filter_by(content_hash=content_hash).first():
+        return
+
+    if os.path.exists(path):
+        os.remove(path)
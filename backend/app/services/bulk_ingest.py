@@ -0,0 +1,263 @@
+"""
+离线批量导入：把本地目录或 tar 包中的PDF导入某个用户的论文库（flask papers ingest）
+
+不经过 HTTP 上传和 jobs 队列：
+- 文件写入内容寻址存储；用户库中已有相同内容（按SHA-256）的文件直接跳过
+- 相同内容已有解析结果缓存时直接复用，否则交给进程池用 PDFParser 完整解析（含章节）
+- 解析结果攒够一批后一次插入论文记录和逐页文本，再把这批来源追加到检查点文件，
+  中断后重新执行同一命令会跳过检查点中已处理的来源；写入存储失败的来源不记入检查点，下次执行时重试
+"""
+import hashlib
+import multiprocessing
+import os
+import sys
+import tarfile
+import time
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Set, Tuple
+from flask import current_app
+from werkzeug.utils import secure_filename
+from app.models import db, Paper
+from app.services import blob_store
+from app.services.page_store import PageTextWriter, compute_file_hash
+from app.services.paper_tasks import apply_parse_result, get_cached_result, parser_options, store_parse_result
+from app.services.pdf_parser import PDFParser
+
+# (来源标识, 原始文件名, 打开文件的函数)
+Source = Tuple[str, str, Callable[[], BinaryIO]]
+
+
+def iter_sources(source: str) -> Iterator[Source]:
+    """
+    列出目录（递归）或 tar 包中的PDF，按路径排序保证每次执行的顺序相同
+
+    tar 包按成员顺序流式读取，打开函数只能在产出后、读取下一个成员前调用。
+    """
+    if os.path.isdir(source):
+        paths = []
+        for dirpath, _, filenames in os.walk(source):
+            paths.extend(os.path.join(dirpath, name) for name in filenames if name.lower().endswith('.pdf'))
+        for path in sorted(paths):
+            yield os.path.relpath(path, source), os.path.basename(path), lambda path=path: open(path, 'rb')
+        return
+
+    with tarfile.open(source, 'r:*') as tar:
+        for member in tar:
+            if member.isfile() and member.name.lower().endswith('.pdf'):
+                yield member.name, os.path.basename(member.name), lambda member=member: tar.extractfile(member)
+
+
+def default_checkpoint_path(source: str, user_id: int) -> str:
+    """检查点文件默认保存在 instance 目录，按来源绝对路径和用户区分"""
+    key = hashlib.sha1(f'{os.path.abspath(source)}:{user_id}'.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(current_app.instance_path, f'ingest-{key}.checkpoint')
+
+
+def load_checkpoint(path: str) -> Set[str]:
+    """读取已处理的来源标识（每行一个）"""
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding='utf-8') as f:
+        return {line.rstrip('\n') for line in f if line.strip()}
+
+
+def _init_worker(quiet: bool) -> None:
+    """进程池初始化：解析器的调试输出很多，默认丢弃"""
+    if quiet:
+        sys.stdout = open(os.devnull, 'w')
+
+
+def _parse_file(filepath: str, file_size: int, options: Dict) -> Tuple[Dict, List[Tuple[int, str]]]:
+    """
+    在子进程中完整解析一个PDF，章节也一并提取（不再经过 sections 任务）
+
+    Returns:
+        Tuple[Dict, List[Tuple[int, str]]]: (解析结果, 逐页原始文本)
+    """
+    parser = PDFParser(filepath, file_size=file_size, **options)
+    pages = []
+    result = parser.parse(page_sink=lambda page_number, text: pages.append((page_number, text)))
+    if not result.get('error'):
+        result['sections'] = parser.extract_sections_from_pages(pages, max_sections=None)
+        result['sections_ready'] = True
+        result['stage_versions'] = dict(PDFParser.STAGE_VERSIONS)
+    return result, pages
+
+
+class BulkIngest:
+    """
+    一次批量导入
+
+    Args:
+        source: PDF目录或 tar 包（.tar/.tar.gz/.tgz 等）
+        user_id: 导入到的用户
+        workers: 解析进程数
+        batch_size: 每批插入的论文数，每批提交后写一次检查点
+        checkpoint_path: 检查点文件
+        report: 进度输出函数
+        quiet: 是否丢弃解析进程的调试输出
+    """
+
+    def __init__(self, source: str, user_id: int, workers: int = 2, batch_size: int = 50,
+                 checkpoint_path: Optional[str] = None, report: Callable[[str], None] = print,
+                 quiet: bool = True):
+        self.source = source
+        self.user_id = user_id
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.checkpoint_path = checkpoint_path or default_checkpoint_path(source, user_id)
+        self.report = report
+        self.quiet = quiet
+
+        self.upload_folder = current_app.config['UPLOAD_FOLDER']
+        self.max_size = current_app.config['MAX_CONTENT_LENGTH']
+        # 进程池已经按文件并行，单个文件内不再开线程
+        self.options = {**parser_options(), 'workers': 1}
+
+        self.stats = {'imported': 0, 'reused': 0, 'skipped': 0, 'resumed': 0, 'failed': 0, 'retry': 0, 'pages': 0}
+        self._batch = []  # 待插入：(原始文件名, 内容哈希, 路径, 大小, 解析结果, 逐页文本)
+        self._batch_keys = []  # 随下一批提交写入检查点的来源
+        self._started = 0.0
+
+    def run(self) -> Dict:
+        """
+        执行导入，返回统计（imported 含复用解析结果的 reused；resumed 为检查点跳过的数量；
+        retry 为写入存储失败、下次执行时重试的数量）
+        """
+        done = load_checkpoint(self.checkpoint_path)
+        if done:
+            self.report(f'从检查点恢复：已处理 {len(done)} 个文件（{self.checkpoint_path}）')
+
+        # 用户库中已有的内容，导入过程中新增的哈希也加入，来源内的重复文件只导入一次
+        known = {content_hash for (content_hash,) in db.session.query(Paper.content_hash).filter(
+            Paper.user_id == self.user_id, Paper.content_hash.isnot(None)
+        )}
+
+        self._started = time.perf_counter()
+        pending = {}
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(),
+                                 initializer=_init_worker, initargs=(self.quiet,)) as pool:
+            for key, name, opener in iter_sources(self.source):
+                if key in done:
+                    self.stats['resumed'] += 1
+                    continue
+
+                try:
+                    stored = self._store(key, opener, known)
+                except Exception as e:
+                    # 文件过大、读写出错等：不写入检查点，修复后重新执行同一命令时重试
+                    self.stats['retry'] += 1
+                    self.report(f'  跳过 {key}（下次执行时重试）: {e}')
+                    continue
+                if not stored:
+                    self.stats['skipped'] += 1
+                    self._batch_keys.append(key)
+                    continue
+
+                content_hash, filepath, filesize = stored
+                known.add(content_hash)
+                cached = get_cached_result(content_hash)
+                if cached:
+                    self.stats['reused'] += 1
+                    self._add(key, name, content_hash, filepath, filesize, cached.to_result(), None)
+                    continue
+
+                future = pool.submit(_parse_file, filepath, filesize, self.options)
+                pending[future] = (key, name, content_hash, filepath, filesize)
+                # 限制在途任务数，结果按完成顺序入库
+                if len(pending) >= self.workers * 2:
+                    self._collect(pending, FIRST_COMPLETED)
+
+            self._collect(pending, None)
+
+        self._flush()
+        self._report_progress('完成')
+        return self.stats
+
+    def _store(self, key: str, opener: Callable[[], BinaryIO], known: Set[str]) -> Optional[Tuple[str, str, int]]:
+        """写入内容寻址存储，返回 (内容哈希, 路径, 大小)；用户库中已有相同内容时返回 None"""
+        if os.path.isdir(self.source):
+            # 目录中的文件先计算哈希，已导入的文件不必复制
+            path = os.path.join(self.source, key)
+            if compute_file_hash(path) in known:
+                return None
+
+        with opener() as stream:
+            content_hash, filepath, filesize = blob_store.save_stream(stream, self.upload_folder, self.max_size)
+        if content_hash in known:
+            return None
+        return content_hash, filepath, filesize
+
+    def _collect(self, pending: Dict, return_when: Optional[str]) -> None:
+        """等待在途任务（return_when 为 None 时等待全部），把结果加入当前批次"""
+        if not pending:
+            return
+        finished, _ = wait(list(pending), return_when=return_when or ALL_COMPLETED)
+        for future in finished:
+            key, name, content_hash, filepath, filesize = pending.pop(future)
+            try:
+                result, pages = future.result()
+            except Exception as e:
+                result, pages = {'error': str(e)}, None
+            self._add(key, name, content_hash, filepath, filesize, result, pages)
+
+    def _add(self, key, name, content_hash, filepath, filesize, result, pages) -> None:
+        self._batch.append((name, content_hash, filepath, filesize, result, pages))
+        self._batch_keys.append(key)
+        if len(self._batch) >= self.batch_size:
+            self._flush()
+            self._report_progress('进度')
+
+    def _flush(self) -> None:
+        """插入当前批次的论文和逐页文本并提交，然后把这批来源追加到检查点"""
+        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+        papers = []
+        for name, content_hash, filepath, filesize, result, pages in self._batch:
+            paper = Paper(
+                user_id=self.user_id,
+                filename=f'{timestamp}_{secure_filename(name)}',
+                filepath=filepath,
+                filesize=filesize,
+                content_hash=content_hash,
+                status='pending'
+            )
+            if result.get('error'):
+                # 失败的论文保留在库中，可在详情页重新解析
+                paper.status = 'failed'
+                paper.error_message = result['error']
+                self.stats['failed'] += 1
+            else:
+                apply_parse_result(paper, result)
+                if pages is not None:
+                    page_writer = PageTextWriter(content_hash, batch_size=max(len(pages), 1))
+                    for page_number, text in pages:
+                        page_writer(page_number, text)
+                    page_writer.flush()
+                    store_parse_result(content_hash, result)
+                    self.stats['pages'] += len(pages)
+                self.stats['imported'] += 1
+            papers.append(paper)
+
+        if papers:
+            db.session.add_all(papers)
+        db.session.commit()
+
+        if self._batch_keys:
+            os.makedirs(os.path.dirname(os.path.abspath(self.checkpoint_path)), exist_ok=True)
+            with open(self.checkpoint_path, 'a', encoding='utf-8') as f:
+                f.writelines(f'{key}\n' for key in self._batch_keys)
+                f.flush()
+                os.fsync(f.fileno())
+
+        self._batch = []
+        self._batch_keys = []
+
+    def _report_progress(self, label: str) -> None:
+        elapsed = max(time.perf_counter() - self._started, 1e-6)
+        stats = self.stats
+        self.report(
+            f"{label}: 导入 {stats['imported']} 篇（复用解析结果 {stats['reused']}），"
+            f"已存在跳过 {stats['skipped']}，失败 {stats['failed']}，待重试 {stats['retry']}，检查点跳过 {stats['resumed']}；"
+            f"{elapsed:.1f}s，{stats['imported'] / elapsed:.2f} 篇/秒，{stats['pages'] / elapsed:.1f} 页/秒"
+        )
@@ -0,0 +1,196 @@
+import hashlib
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import BinaryIO, Dict, Tuple
+from app.models import db, UploadSession
+from app.services.blob_store import CHUNK_SIZE, FileTooLargeError, commit_file
+
+# 写入权的有效期（秒）：持有写入权的请求异常退出后，超过该时长其他请求可以重新抢占
+WRITE_LOCK_TIMEOUT = 300
+
+# 进程内的增量哈希：会话ID -> (已计算到的位置, sha256 对象)
+# 同一会话的分块落到其他进程或进程重启时，从已写入的部分文件补算一次后继续增量计算
+_hashers: Dict[str, Tuple[int, object]] = {}
+_hashers_lock = threading.Lock()
+
+
+class OffsetMismatchError(ValueError):
+    """分块的起始位置与服务端已接收的字节数不一致，客户端应从 received 处续传"""
+
+    def __init__(self, received: int):
+        super().__init__(f'分块起始位置不正确，已接收 {received} 字节')
+        self.received = received
+
+
+class ChunkInProgressError(OffsetMismatchError):
+    """同一位置的分块仍在由另一个请求写入（客户端超时后重试），稍后从 received 处续传"""
+
+    def __init__(self, received: int):
+        ValueError.__init__(self, f'位置 {received} 的分块仍在写入，请稍后重试')
+        self.received = received
+
+
+def part_path(upload_folder: str, session_id: str) -> str:
+    """分块写入的部分文件，与最终文件在同一文件系统上，完成后原子重命名"""
+    return os.path.join(upload_folder, 'blobs', 'tmp', f'{session_id}.part')
+
+
+def create_session(user_id: int, filename: str, total_size: int, upload_folder: str) -> UploadSession:
+    """创建上传会话并预先建立空的部分文件（不提交）"""
+    session = UploadSession(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        filename=filename,
+        total_size=total_size,
+        received=0
+    )
+    path = part_path(upload_folder, session.id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'wb').close()
+
+    with _hashers_lock:
+        _hashers[session.id] = (0, hashlib.sha256())
+
+    db.session.add(session)
+    return session
+
+
+def append_chunk(session: UploadSession, stream: BinaryIO, offset: int, upload_folder: str) -> int:
+    """
+    把一个分块从请求流直接写入部分文件，同时更新增量哈希
+
+    写入前用条件 UPDATE 抢占写入权：只有 received 仍等于 offset 且没有其他请求在写入时才能写入，
+    客户端超时重试的分块不会与仍在进行的上一次请求同时截断、写入部分文件。
+    抢占和写入结果都立即提交，其他线程和进程随即可见。
+    写入前把文件截断到 offset，上一次中断时写了一半的分块不会残留。
+
+    Args:
+        session: 上传会话
+        stream: 请求体流（不经过表单解析和内存缓冲）
+        offset: 分块在文件中的起始位置，必须等于 session.received
+        upload_folder: 上传根目录
+
+    Returns:
+        int: 写入后已接收的字节数
+    """
+    session_id, total_size = session.id, session.total_size
+    token = uuid.uuid4().hex
+    now = datetime.utcnow()
+    claimed = UploadSession.query.filter(
+        UploadSession.id == session_id,
+        UploadSession.received == offset,
+        db.or_(
+            UploadSession.writer.is_(None),
+            UploadSession.write_started_at < now - timedelta(seconds=WRITE_LOCK_TIMEOUT)
+        )
+    ).update({'writer': token, 'write_started_at': now}, synchronize_session=False)
+    db.session.commit()
+    if not claimed:
+        db.session.refresh(session)
+        if session.received == offset:
+            raise ChunkInProgressError(offset)
+        raise OffsetMismatchError(session.received)
+
+    try:
+        path = part_path(upload_folder, session_id)
+        hasher = _hasher_at(session_id, path, offset)
+
+        size = offset
+        with open(path, 'r+b') as f:
+            f.truncate(offset)
+            f.seek(offset)
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > total_size:
+                    raise FileTooLargeError(f'数据超过声明的文件大小 {total_size} 字节')
+                hasher.update(chunk)
+                f.write(chunk)
+    except Exception:
+        # 释放写入权，received 保持不变
+        db.session.rollback()
+        UploadSession.query.filter_by(id=session_id, writer=token).update(
+            {'writer': None, 'write_started_at': None}, synchronize_session=False
+        )
+        db.session.commit()
+        raise
+
+    # 写入权超时被其他请求抢占时，本次写入作废
+    updated = UploadSession.query.filter_by(id=session_id, writer=token).update({
+        'received': size,
+        'writer': None,
+        'write_started_at': None,
+        'updated_at': datetime.utcnow()
+    }, synchronize_session=False)
+    db.session.commit()
+    db.session.refresh(session)
+    if not updated:
+        raise OffsetMismatchError(session.received)
+
+    with _hashers_lock:
+        _hashers[session_id] = (size, hasher)
+    return size
+
+
+def finalize(session: UploadSession, upload_folder: str) -> Tuple[str, str, int]:
+    """
+    完成上传：取出增量哈希，把部分文件移动到内容哈希对应的位置（不提交）
+
+    Returns:
+        Tuple[str, str, int]: (内容哈希, 文件路径, 文件大小)
+    """
+    if session.received != session.total_size:
+        raise OffsetMismatchError(session.received)
+
+    path = part_path(upload_folder, session.id)
+    content_hash = _hasher_at(session.id, path, session.received).hexdigest()
+    filepath = commit_file(path, upload_folder, content_hash)
+
+    with _hashers_lock:
+        _hashers.pop(session.id, None)
+
+    db.session.delete(session)
+    return content_hash, filepath, session.total_size
+
+
+def discard(session: UploadSession, upload_folder: str) -> None:
+    """放弃上传会话，删除部分文件（不提交）"""
+    path = part_path(upload_folder, session.id)
+    if os.path.exists(path):
+        os.remove(path)
+    with _hashers_lock:
+        _hashers.pop(session.id, None)
+    db.session.delete(session)
+
+
+def cleanup_stale(upload_folder: str, ttl: int) -> int:
+    """删除超过 ttl 秒未更新的会话及其部分文件（不提交），返回删除的会话数"""
+    deadline = datetime.utcnow() - timedelta(seconds=ttl)
+    stale_sessions = UploadSession.query.filter(UploadSession.updated_at < deadline).all()
+    for session in stale_sessions:
+        discard(session, upload_folder)
+    return len(stale_sessions)
+
+
+def _hasher_at(session_id: str, path: str, offset: int):
+    """取出计算到 offset 位置的哈希对象；本进程没有时从部分文件补算前 offset 个字节"""
+    with _hashers_lock:
+        cached = _hashers.get(session_id)
+    if cached and cached[0] == offset:
+        # 返回副本：分块写入失败时缓存中的哈希仍停留在 offset
+        return cached[1].copy()
+
+    hasher = hashlib.sha256()
+    remaining = offset
+    with open(path, 'rb') as f:
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                raise OffsetMismatchError(offset - remaining)
+            hasher.update(chunk)
+            remaining -= len(chunk)
+    return hasher
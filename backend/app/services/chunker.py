@@ -0,0 +1,200 @@
+"""
+按 token 预算组织提示词中的论文内容
+
+各生成任务的论文内容预算见 Config.AI_INPUT_TOKEN_BUDGETS，且不超过模型上下文
+（Config.AI_MODELS 的 max_tokens）减去输出长度和提示词余量。
+token 数用本地估算，不调用分词器：汉字按每字 0.7 个 token，其余字符按每字 0.3 个 token，
+取值略高于常见分词器的实际比例，宁可高估，保证不超出上下文。
+章节的 token 数在写入 paper_sections 时计算并保存（token_count），按预算分配时不需要读取章节内容。
+"""
+import math
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+from flask import current_app, has_app_context
+
+CJK_TOKENS_PER_CHAR = 0.7
+OTHER_TOKENS_PER_CHAR = 0.3
+
+# 提示词中固定部分（说明、格式要求、标题摘要等）的余量
+PROMPT_OVERHEAD_TOKENS = 1500
+
+_CJK_CHARS = re.compile(r'[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]+')
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """估算文本的 token 数"""
+    if not text:
+        return 0
+    other = len(_CJK_CHARS.sub('', text))
+    cjk = len(text) - other
+    return math.ceil(cjk * CJK_TOKENS_PER_CHAR + other * OTHER_TOKENS_PER_CHAR)
+
+
+def chars_within(text_chars: int, text_tokens: int, budget: int) -> int:
+    """按文本的平均 token 密度，把 token 预算换算为字符数（不超过文本长度）"""
+    if budget <= 0 or text_chars <= 0:
+        return 0
+    if text_tokens <= budget:
+        return text_chars
+    return int(text_chars * budget / text_tokens)
+
+
+def max_chars(budget: int) -> int:
+    """token 预算最多对应的字符数（按非汉字的密度），从存储中读取足够长的原文后再用 truncate_to_tokens 截取"""
+    return int(max(0, budget) / OTHER_TOKENS_PER_CHAR)
+
+
+def truncate_to_tokens(text: Optional[str], budget: int) -> str:
+    """截取文本开头，估算 token 数不超过 budget"""
+    if not text or budget <= 0:
+        return ''
+    tokens = estimate_tokens(text)
+    if tokens <= budget:
+        return text
+
+    # 先按平均密度截取，局部密度更高（如中文段落集中在开头）时逐步缩短
+    length = chars_within(len(text), tokens, budget)
+    while length > 0 and estimate_tokens(text[:length]) > budget:
+        length = int(length * 0.9)
+    return text[:length]
+
+
+def split_to_tokens(text: Optional[str], budget: int) -> List[str]:
+    """
+    按行把文本拆成多段，每段估算 token 数不超过 budget，不丢弃内容
+
+    单行超出预算时按 truncate_to_tokens 从行内切分。
+    """
+    if not text:
+        return []
+    if budget <= 0 or estimate_tokens(text) <= budget:
+        return [text]
+
+    parts, current, used = [], [], 0
+    for line in text.split('\n'):
+        tokens = estimate_tokens(line) + 1  # 含换行
+        if tokens > budget:
+            if current:
+                parts.append('\n'.join(current))
+                current, used = [], 0
+            while line:
+                piece = truncate_to_tokens(line, budget) or line[:1]
+                parts.append(piece)
+                line = line[len(piece):]
+            continue
+
+        if current and used + tokens > budget:
+            parts.append('\n'.join(current))
+            current, used = [], 0
+        current.append(line)
+        used += tokens
+
+    if current:
+        parts.append('\n'.join(current))
+    return parts
+
+
+def context_window(model: Optional[str] = None) -> int:
+    """模型的上下文长度（Config.AI_MODELS 的 max_tokens），未知模型按默认模型处理"""
+    if has_app_context():
+        models = current_app.config.get('AI_MODELS', {})
+        default_model = current_app.config.get('DEFAULT_AI_MODEL')
+    else:
+        from config import Config
+        models, default_model = Config.AI_MODELS, Config.DEFAULT_AI_MODEL
+
+    info = models.get(model) or models.get(default_model) or {}
+    return int(info.get('max_tokens', 8000))
+
+
+def input_budget(task: str, model: Optional[str] = None, output_tokens: int = 2000) -> int:
+    """
+    生成任务中论文内容部分的 token 预算
+
+    Args:
+        task: 任务名，对应 Config.AI_INPUT_TOKEN_BUDGETS 的键
+        model: 模型名称，None 表示默认模型
+        output_tokens: 调用时的 max_tokens
+
+    Returns:
+        int: min(任务预算, 上下文 - 输出 - 提示词余量)
+    """
+    if has_app_context():
+        budgets = current_app.config.get('AI_INPUT_TOKEN_BUDGETS', {})
+    else:
+        from config import Config
+        budgets = Config.AI_INPUT_TOKEN_BUDGETS
+
+    available = context_window(model) - output_tokens - PROMPT_OVERHEAD_TOKENS
+    return max(0, min(int(budgets.get(task, 4000)), available))
+
+
+def allocate(sizes: Sequence[int], budget: int) -> List[int]:
+    """
+    把预算分给多段内容：短的内容完整保留，剩余预算由较长的内容平分
+
+    Args:
+        sizes: 每段内容的 token 数
+        budget: 总预算
+
+    Returns:
+        List[int]: 每段分到的 token 数（不超过自身大小），与 sizes 顺序一致
+    """
+    allotted = [0] * len(sizes)
+    remaining = max(0, budget)
+    order = sorted(range(len(sizes)), key=lambda i: sizes[i])
+    for position, index in enumerate(order):
+        share = remaining // (len(order) - position)
+        allotted[index] = min(sizes[index], share)
+        remaining -= allotted[index]
+    return allotted
+
+
+def plan_sections(headers: Sequence[int], contents: Sequence[int], budget: int) -> List[int]:
+    """
+    按预算规划章节：先按顺序放入章节标题，放不下的章节整体舍去，剩余预算按 allocate 分给内容
+
+    Args:
+        headers: 每个章节标题行的 token 数
+        contents: 每个章节内容的 token 数
+        budget: 总预算
+
+    Returns:
+        List[int]: 保留的章节（前若干个）各自内容分到的 token 数
+    """
+    used = 0
+    count = 0
+    for header in headers:
+        if used + header > budget:
+            break
+        used += header
+        count += 1
+    return allocate(contents[:count], budget - used)
+
+
+def section_header_tokens(number: Optional[str], title: Optional[str]) -> int:
+    """章节标题行（"- 序号 标题: "）的 token 数"""
+    return estimate_tokens(f"- {number or ''} {title or ''}: ") + 1
+
+
+def pack_sections(sections: List[Dict], budget: int, with_content: bool = True) -> List[Dict]:
+    """
+    把章节列表压缩到 token 预算内（按 plan_sections 规划，内容按 truncate_to_tokens 截取）
+
+    Returns:
+        List[Dict]: 新的章节列表；with_content=False 时 content 为空
+    """
+    headers = [section_header_tokens(s.get('number'), s.get('title')) for s in sections]
+    contents = [estimate_tokens(s.get('content')) if with_content else 0 for s in sections]
+    allotted = plan_sections(headers, contents, budget)
+    return [
+        {**section, 'content': truncate_to_tokens(section.get('content'), share)}
+        for section, share in zip(sections, allotted)
+    ]
+
+
+def pack_texts(items: List[Tuple[str, str]], budget: int) -> List[Tuple[str, str]]:
+    """按预算压缩 (标题, 内容) 列表，规则同 pack_sections（翻译逐页文本使用）"""
+    headers = [estimate_tokens(f'【{title}】') + 2 for title, _ in items]
+    allotted = plan_sections(headers, [estimate_tokens(content) for _, content in items], budget)
+    return [(title, truncate_to_tokens(content, share)) for (title, content), share in zip(items, allotted)]
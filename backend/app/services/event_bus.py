@@ -0,0 +1,306 @@
+import json
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from app.models import db, Paper, Job, GenerateRecord
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 论文解析流程的任务类型（论文事件流只报告这些任务的进度）
+PARSE_JOB_KINDS = ('parse', 'pages', 'sections')
+
+
+def paper_snapshot(paper_ids: Iterable[int]) -> Dict[int, Dict]:
+    """
+    查询论文当前的解析状态和进行中任务的进度
+
+    Args:
+        paper_ids: 论文ID列表
+
+    Returns:
+        Dict[int, Dict]: 论文ID -> 状态快照（论文不存在时不包含该ID）
+    """
+    paper_ids = list(paper_ids)
+    if not paper_ids:
+        return {}
+
+    snapshots = {}
+    papers = db.session.query(Paper.id, Paper.status, Paper.sections_ready, Paper.error_message).filter(
+        Paper.id.in_(paper_ids)
+    ).all()
+    for paper_id, status, sections_ready, error_message in papers:
+        snapshots[paper_id] = {
+            'paperId': paper_id,
+            'status': status,
+            'sectionsReady': bool(sections_ready),
+            'errorMessage': error_message or '',
+            'job': None
+        }
+
+    # 生成任务也关联论文ID，这里只看解析流程的任务
+    jobs = db.session.query(
+        Job.paper_id, Job.kind, Job.status, Job.stage, Job.progress_current, Job.progress_total
+    ).filter(
+        Job.paper_id.in_(paper_ids),
+        Job.kind.in_(PARSE_JOB_KINDS),
+        Job.status.in_(['pending', 'running'])
+    ).order_by(Job.created_at, Job.id).all()
+    for paper_id, kind, status, stage, current, total in jobs:
+        snapshot = snapshots.get(paper_id)
+        if snapshot and snapshot['job'] is None:
+            snapshot['job'] = {
+                'kind': kind,
+                'status': status,
+                'stage': stage or '',
+                'current': current or 0,
+                'total': total or 0
+            }
+
+    return snapshots
+
+
+def is_finished(snapshot: Dict) -> bool:
+    """
+    解析流程是否已结束：失败或已解析，且没有进行中的解析任务
+
+    已解析但 sectionsReady 为 False 且没有任务时，章节提取已最终失败（或是旧论文），
+    同样结束事件流，客户端据此提示重新解析章节。
+    """
+    return snapshot['status'] in ('failed', 'parsed') and snapshot['job'] is None
+
+
+def record_snapshot(record_ids: Iterable[int]) -> Dict[int, Dict]:
+    """
+    查询生成记录的当前状态
+
+    Returns:
+        Dict[int, Dict]: 记录ID -> {recordId, type, status, errorMessage}（记录不存在时不包含该ID）
+    """
+    record_ids = list(record_ids)
+    if not record_ids:
+        return {}
+
+    records = db.session.query(
+        GenerateRecord.id, GenerateRecord.type, GenerateRecord.status, GenerateRecord.error_message
+    ).filter(GenerateRecord.id.in_(record_ids)).all()
+    return {
+        record_id: {
+            'recordId': record_id,
+            'type': gen_type,
+            'status': status,
+            'errorMessage': error_message or ''
+        }
+        for record_id, gen_type, status, error_message in records
+    }
+
+
+def is_record_finished(snapshot: Dict) -> bool:
+    """生成是否已结束（完成或失败）"""
+    return snapshot['status'] in ('completed', 'failed')
+
+
+def sse(event_type: str, data: Dict) -> str:
+    """格式化一条 Server-Sent Events 消息"""
+    return f"event: {event_type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class EventBus:
+    """
+    进程内事件总线：按ID分发状态变化事件（论文解析进度、生成记录状态）
+
+    解析和生成在独立的 worker 进程中执行，状态写在数据库中；
+    web 进程内每个总线只有一个中继线程，按固定间隔用一次查询读取所有被订阅对象的状态，
+    状态变化时推送给订阅者，代替每个客户端各自轮询接口。
+    没有订阅者时中继线程退出。
+
+    Args:
+        snapshot: 批量查询状态的函数（ID列表 -> {ID: 快照}）
+        finished: 判断快照是否为最终状态的函数
+        key_field: 快照中ID字段的名称（对象被删除时的快照使用）
+    """
+
+    def __init__(self, snapshot: Callable[[Iterable[int]], Dict[int, Dict]] = paper_snapshot,
+                 finished: Callable[[Dict], bool] = is_finished, key_field: str = 'paperId'):
+        self._snapshot = snapshot
+        self._finished = finished
+        self._key_field = key_field
+        self._app = None
+        self._poll_interval = 0.5
+        self._lock = threading.Lock()
+        self._subscribers: Dict[int, List[queue.Queue]] = {}
+        self._last: Dict[int, Dict] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def init_app(self, app) -> None:
+        self._app = app
+        self._poll_interval = app.config.get('EVENT_POLL_INTERVAL', 0.5)
+
+    def subscribe(self, key: int, subscriber: Optional[queue.Queue] = None) -> queue.Queue:
+        """订阅事件，返回接收事件的队列（传入已有队列时多个ID的事件进入同一队列）"""
+        if subscriber is None:
+            subscriber = queue.Queue(maxsize=100)
+        with self._lock:
+            self._subscribers.setdefault(key, []).append(subscriber)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._relay, name='event-bus-relay', daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def unsubscribe(self, key: int, subscriber: queue.Queue) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(key, [])
+            if subscriber in subscribers:
+                subscribers.remove(subscriber)
+            if not subscribers:
+                self._subscribers.pop(key, None)
+                self._last.pop(key, None)
+
+    def publish(self, key: int, event_type: str, data: Dict) -> None:
+        """向所有订阅者推送事件；订阅者处理不过来时丢弃该订阅者的事件"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(key, []))
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait({'type': event_type, 'data': data})
+            except queue.Full:
+                pass
+
+    def _relay(self) -> None:
+        """中继线程：批量查询被订阅对象的状态，状态变化时发布事件"""
+        while True:
+            with self._lock:
+                keys = list(self._subscribers.keys())
+                if not keys:
+                    self._thread = None
+                    return
+
+            try:
+                with self._app.app_context():
+                    snapshots = self._snapshot(keys)
+                    db.session.remove()
+            except Exception as e:
+                logger.error(f"读取状态失败: {str(e)}")
+                snapshots = {}
+
+            for key in keys:
+                snapshot = snapshots.get(key)
+                if snapshot is None:
+                    # 订阅期间对象被删除
+                    snapshot = {self._key_field: key, 'status': 'deleted', 'job': None}
+                    if self._last.get(key) != snapshot:
+                        self._last[key] = snapshot
+                        self.publish(key, 'done', snapshot)
+                    continue
+                if snapshot != self._last.get(key):
+                    self._last[key] = snapshot
+                    self.publish(key, 'progress', snapshot)
+                    if self._finished(snapshot):
+                        self.publish(key, 'done', snapshot)
+
+            time.sleep(self._poll_interval)
+
+    def stream(self, key: int, initial: Dict, heartbeat: float, timeout: float) -> Iterator[str]:
+        """
+        Server-Sent Events 流：先发送初始快照，之后转发状态变化，最终状态（done）后结束
+
+        调用方应在返回 Response 之前释放数据库会话，流中不持有数据库连接。
+
+        Args:
+            key: 订阅的ID
+            initial: 初始快照
+            heartbeat: 心跳间隔（秒）
+            timeout: 连接最长保持时间（秒），客户端会自动重连
+        """
+        yield sse('progress', initial)
+        if self._finished(initial):
+            yield sse('done', initial)
+            return
+
+        subscriber = self.subscribe(key)
+        deadline = time.time() + timeout
+        last = initial
+        try:
+            while time.time() < deadline:
+                try:
+                    event = subscriber.get(timeout=heartbeat)
+                except queue.Empty:
+                    # 注释行作为心跳，防止代理断开空闲连接
+                    yield ': keep-alive\n\n'
+                    continue
+
+                if event['type'] == 'progress' and event['data'] == last:
+                    continue
+                last = event['data']
+
+                yield sse(event['type'], event['data'])
+                if event['type'] == 'done':
+                    return
+        finally:
+            self.unsubscribe(key, subscriber)
+
+    def stream_many(self, keys: List[int], initial: Dict[int, Dict], heartbeat: float, timeout: float,
+                    result: Callable[[Dict], Dict] = dict) -> Iterator[str]:
+        """
+        同时订阅多个ID的 Server-Sent Events 流：转发各自的状态变化，按完成顺序发送结果，全部结束后结束
+
+        事件类型：
+        - progress: 某个对象的状态变化
+        - result: 某个对象到达最终状态（或被删除），data 为 result(快照)
+        - done: 全部结束，data 为 {count}
+
+        Args:
+            keys: 订阅的ID列表
+            initial: 初始快照（ID -> 快照，缺少的ID视为已删除）
+            heartbeat: 心跳间隔（秒）
+            timeout: 连接最长保持时间（秒）
+            result: 最终快照 -> result 事件的数据（如补充生成结果），在流中调用
+        """
+        pending = []
+        for key in keys:
+            snapshot = initial.get(key) or {self._key_field: key, 'status': 'deleted'}
+            yield sse('progress', snapshot)
+            if snapshot['status'] == 'deleted' or self._finished(snapshot):
+                yield sse('result', result(snapshot))
+            else:
+                pending.append(key)
+
+        if pending:
+            subscriber = queue.Queue(maxsize=100)
+            for key in pending:
+                self.subscribe(key, subscriber)
+            remaining = set(pending)
+            deadline = time.time() + timeout
+            last = {key: initial.get(key) for key in pending}
+            try:
+                while remaining and time.time() < deadline:
+                    try:
+                        event = subscriber.get(timeout=heartbeat)
+                    except queue.Empty:
+                        yield ': keep-alive\n\n'
+                        continue
+
+                    key = event['data'].get(self._key_field)
+                    if key not in remaining:
+                        continue
+                    if event['type'] == 'done':
+                        remaining.discard(key)
+                        yield sse('result', result(event['data']))
+                    elif event['data'] != last.get(key):
+                        last[key] = event['data']
+                        yield sse('progress', event['data'])
+            finally:
+                for key in pending:
+                    self.unsubscribe(key, subscriber)
+            if remaining:
+                # 超时，客户端可按记录ID继续查询
+                return
+
+        yield sse('done', {'count': len(keys)})
+
+
+event_bus = EventBus()
+# 生成记录状态（/api/generate/record/<id>/events）
+record_events = EventBus(record_snapshot, is_record_finished, 'recordId')
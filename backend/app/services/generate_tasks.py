@@ -0,0 +1,351 @@
+"""
+生成任务：在 worker 中调用模型生成思维导图、时间线、概念图谱、阅读报告、评审报告和翻译
+
+接口只创建生成记录（pending）并加入 generate 任务，立即返回 recordId；
+worker 执行时记录变为 generating，完成后写入内容（completed）或错误信息（failed）。
+客户端通过 /api/generate/record/<id> 轮询，或订阅 /api/generate/record/<id>/events。
+生成任务是 io_bound 的，在 worker 进程的线程中执行，不占用解析进程。
+
+阅读报告和评审报告也可以在请求中流式生成（stream_generation），模型输出的增量直接转发给客户端。
+一键生成（generate_all 任务）只组织一次论文信息，在线程池中并发调用各类型的生成，每完成一个写入对应的记录。
+"""
+import json
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from flask import current_app
+from app.models import db, Paper, Job, GenerateRecord
+from app.services import generation_cache, page_store, section_store, translation
+from app.services.ai_generator import AIGenerator
+from app.services.chunker import input_budget, max_chars
+from app.services.event_bus import sse
+from app.services.job_queue import ProgressReporter, enqueue, register_failure_handler, register_handler
+
+# 各生成类型：日志和错误信息中的名称、记录描述、AIGenerator 的方法
+GENERATION_TYPES = {
+    'mindmap': {'label': '思维导图', 'description': '思维导图', 'method': 'generate_mindmap'},
+    'timeline': {'label': '时间线', 'description': '研究时间线', 'method': 'generate_timeline'},
+    'graph': {'label': '概念图谱', 'description': '概念图谱', 'method': 'generate_graph'},
+    'review': {'label': '评审报告', 'description': '评审报告', 'method': 'generate_review'},
+    'summary': {'label': '论文阅读报告', 'description': '论文阅读报告', 'method': 'generate_summary'},
+    'translate': {'label': '翻译', 'description': '翻译', 'method': 'translate_segment'}
+}
+
+# 支持流式生成的类型（AIGenerator.stream_report）
+STREAMING_TYPES = ('summary', 'review')
+
+# 一键生成的类型（/api/generate/all）
+ALL_TYPES = ('mindmap', 'timeline', 'graph', 'summary', 'review')
+
+
+def build_paper_info(paper: Paper, gen_type: str) -> Dict:
+    """按生成类型组织论文信息，章节和正文节选都按该类型的 token 预算读取"""
+    paper_info = {
+        'title': paper.title,
+        'authors': paper.authors,
+        'abstract': paper.abstract,
+        'keywords': paper.keywords
+    }
+
+    budget = input_budget(gen_type)
+    paper_info['body'] = page_store.load_excerpt(paper, max_chars(budget))  # 正文开头（逐页文本存储）
+    if gen_type == 'mindmap':
+        # 思维导图只用章节标题
+        paper_info['sections'] = section_store.load_sections(paper, content_chars=0, token_budget=budget)
+    elif gen_type != 'review':
+        paper_info['sections'] = section_store.load_sections(paper, token_budget=budget)
+    return paper_info
+
+
+def build_shared_paper_info(paper: Paper, gen_types: Sequence[str]) -> Dict:
+    """
+    多个生成类型共用的论文信息：章节和正文节选按其中最大的 token 预算读取一次
+
+    各生成方法组织提示词时再按自身类型的预算截取（chunker.pack_sections / truncate_to_tokens），
+    结果与分别调用 build_paper_info 相同。
+    """
+    budget = max(input_budget(gen_type) for gen_type in gen_types)
+    paper_info = {
+        'title': paper.title,
+        'authors': paper.authors,
+        'abstract': paper.abstract,
+        'keywords': paper.keywords,
+        'body': page_store.load_excerpt(paper, max_chars(budget))
+    }
+    if any(gen_type != 'review' for gen_type in gen_types):
+        paper_info['sections'] = section_store.load_sections(paper, token_budget=budget)
+    return paper_info
+
+
+def enqueue_generation(record: GenerateRecord, model: str, options: Optional[Dict] = None) -> Job:
+    """
+    为生成记录加入 generate 任务（不提交，由调用方与记录一起提交）
+
+    模型调用本身已有重试，任务只执行一次，失败时记录标记为 failed；
+    翻译按 JOB_MAX_ATTEMPTS 重试（任务失败或 worker 退出后），重试时只翻译未完成的分段。
+
+    Args:
+        record: 状态为 pending 的生成记录
+        model: 模型名称
+        options: 生成参数，如翻译的 targetLang
+    """
+    if record.id is None:
+        db.session.flush()
+    payload = {'recordId': record.id, 'model': model, **(options or {})}
+    max_attempts = None if record.type == 'translate' else 1
+    return enqueue('generate', paper_id=record.paper_id, payload=payload, max_attempts=max_attempts)
+
+
+def enqueue_generate_all(records: List[GenerateRecord], model: str) -> Job:
+    """为一键生成的多条 pending 记录加入一个 generate_all 任务（不提交）"""
+    db.session.flush()
+    payload = {'recordIds': [record.id for record in records], 'model': model}
+    return enqueue('generate_all', paper_id=records[0].paper_id, payload=payload, max_attempts=1)
+
+
+def run_generation(paper: Paper, gen_type: str, model: str) -> Any:
+    """
+    调用模型生成一种内容（翻译见 translation.translate_record），结果写入生成结果缓存（模拟数据除外）
+
+    Returns:
+        Any: 生成结果
+    """
+    spec = GENERATION_TYPES[gen_type]
+    generator = AIGenerator()
+    paper_info = build_paper_info(paper, gen_type)
+    print(f"[DEBUG] 生成{spec['label']} - paper_id={paper.id}, 章节数据: {'有' if paper_info.get('sections') else '无'}")
+
+    result = getattr(generator, spec['method'])(paper_info, model=model)
+    # 模拟数据（未配置API Key或调用失败）和解析失败时的默认结构不缓存
+    if generator.cacheable:
+        generation_cache.put(paper, gen_type, model, result)
+    return result
+
+
+@register_handler('generate', io_bound=True)
+def handle_generate(job: Job) -> None:
+    """生成任务：pending -> generating -> completed/failed"""
+    payload = job.get_payload()
+    record = db.session.get(GenerateRecord, payload.get('recordId'))
+    if not record or record.status not in ('pending', 'generating'):
+        print(f"[DEBUG] 生成记录已删除或已结束，跳过: record_id={payload.get('recordId')}")
+        return
+
+    label = GENERATION_TYPES.get(record.type, {}).get('label', record.type)
+    paper = db.session.get(Paper, record.paper_id)
+    if not paper:
+        record.status = 'failed'
+        record.error_message = '论文不存在'
+        db.session.commit()
+        return
+
+    record.status = 'generating'
+    db.session.commit()
+    record_id = record.id
+    start_time = time.time()
+
+    try:
+        if record.type == 'translate':
+            # 分段并发翻译，每段完成后写入 translation_segments，任务进度为已完成的分段数
+            progress = ProgressReporter(job.id)
+            progress.set_stage('translating')
+            result = translation.translate_record(record_id, paper, payload.get('model'),
+                                                  payload.get('targetLang', 'zh'), progress)
+        else:
+            result = run_generation(paper, record.type, payload.get('model'))
+
+        record.content = json.dumps(result, ensure_ascii=False)
+        record.status = 'completed'
+        record.description = f'《{paper.title}》的{GENERATION_TYPES[record.type]["description"]}'
+        record.duration = time.time() - start_time
+        db.session.commit()
+
+    except Exception as e:
+        db.session.rollback()
+        message = _failure_message(e, label)
+        record = db.session.get(GenerateRecord, record_id)
+        if record and record.type == 'translate' and job.attempts < job.max_attempts:
+            # 翻译任务还会重试，已完成的分段保留，记录回到 pending
+            record.status = 'pending'
+            record.error_message = message
+            db.session.commit()
+        else:
+            _mark_failed(record_id, message, start_time)
+        raise
+
+
+@register_handler('generate_all', io_bound=True)
+def handle_generate_all(job: Job) -> None:
+    """
+    一键生成：论文信息只组织一次，各类型在最多 GENERATE_ALL_CONCURRENCY 个线程中并发生成，
+    每完成一个就写入对应的记录并提交（pending -> generating -> completed/failed），单个类型失败不影响其他类型
+    """
+    payload = job.get_payload()
+    model = payload.get('model')
+    records = GenerateRecord.query.filter(
+        GenerateRecord.id.in_(payload.get('recordIds') or []),
+        GenerateRecord.status.in_(['pending', 'generating'])
+    ).all()
+    if not records:
+        print(f"[DEBUG] 一键生成的记录已删除或已结束，跳过: job_id={job.id}")
+        return
+
+    paper = db.session.get(Paper, job.paper_id)
+    if not paper:
+        for record in records:
+            record.status = 'failed'
+            record.error_message = '论文不存在'
+        db.session.commit()
+        return
+
+    types = {record.id: record.type for record in records}
+    for record in records:
+        record.status = 'generating'
+    db.session.commit()
+
+    start_time = time.time()
+    paper_info = build_shared_paper_info(paper, list(types.values()))
+    concurrency = max(1, int(current_app.config.get('GENERATE_ALL_CONCURRENCY', 3)))
+    print(f"[DEBUG] 一键生成 - paper_id={paper.id}, 类型: {list(types.values())}, 并发数: {concurrency}")
+
+    app = current_app._get_current_object()
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(types)), thread_name_prefix='generate-all') as executor:
+        futures = {
+            executor.submit(_call_generator, app, gen_type, paper_info, model): record_id
+            for record_id, gen_type in types.items()
+        }
+        for future in as_completed(futures):
+            record_id = futures[future]
+            gen_type = types[record_id]
+            try:
+                result, cacheable = future.result()
+                if cacheable:
+                    generation_cache.put(paper, gen_type, model, result)
+                record = db.session.get(GenerateRecord, record_id)
+                if record:
+                    record.content = json.dumps(result, ensure_ascii=False)
+                    record.status = 'completed'
+                    record.description = f'《{paper.title}》的{GENERATION_TYPES[gen_type]["description"]}'
+                    record.duration = time.time() - start_time
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"[DEBUG] 一键生成{GENERATION_TYPES[gen_type]['label']}失败: {str(e)}")
+                _mark_failed(record_id, _failure_message(e, GENERATION_TYPES[gen_type]['label']), start_time)
+
+    print(f"[DEBUG] 一键生成完成 - paper_id={paper.id}, 耗时: {time.time() - start_time:.2f}秒")
+
+
+@register_failure_handler('generate')
+@register_failure_handler('generate_all')
+def fail_generation_records(job: Job) -> None:
+    """
+    任务最终失败（包括 worker 退出后被 requeue_stale 回收）时，把关联的未结束记录标记为 failed，
+    否则记录一直停在 pending/generating，相同类型的生成请求都会返回 409
+    """
+    payload = job.get_payload()
+    record_ids = payload.get('recordIds') or [payload.get('recordId')]
+    records = db.session.query(GenerateRecord.id, GenerateRecord.type).filter(
+        GenerateRecord.id.in_(record_ids),
+        GenerateRecord.status.in_(['pending', 'generating'])
+    ).all()
+
+    elapsed = (datetime.utcnow() - job.started_at).total_seconds() if job.started_at else 0
+    for record_id, gen_type in records:
+        label = GENERATION_TYPES.get(gen_type, {}).get('label', gen_type)
+        _mark_failed(record_id, f'{label}失败: {job.error_message or "任务执行中断"}', time.time() - elapsed)
+
+
+def _call_generator(app, gen_type: str, paper_info: Dict, model: str) -> Tuple[Any, bool]:
+    """在线程池中调用一种生成（不访问数据库），返回 (结果, 是否可以写入生成结果缓存)"""
+    with app.app_context():
+        generator = AIGenerator()
+        result = getattr(generator, GENERATION_TYPES[gen_type]['method'])(paper_info, model=model)
+        return result, generator.cacheable
+
+
+def stream_generation(record_id: int, paper_info: Dict, model: str) -> Iterator[str]:
+    """
+    在请求中流式生成阅读报告或评审报告，返回 Server-Sent Events 消息
+
+    事件类型：
+    - delta: 模型输出的增量文本，data 为 {text}
+    - done: 生成完成，data 为 {recordId, content, cached, firstTokenTime}
+    - error: 生成失败，data 为 {recordId, message}
+
+    生成记录由调用方创建（状态为 generating）；结束后写入结果和生成结果缓存，与 handle_generate 相同。
+    客户端中途断开时记录标记为 failed。需要在应用上下文中迭代（flask.stream_with_context）。
+
+    Args:
+        record_id: 生成记录ID（类型为 STREAMING_TYPES 之一）
+        paper_info: build_paper_info 组织的论文信息
+        model: 模型名称
+    """
+    record = db.session.get(GenerateRecord, record_id)
+    gen_type, paper_id = record.type, record.paper_id
+    label = GENERATION_TYPES[gen_type]['label']
+    generator = AIGenerator()
+    start_time = time.time()
+    finished = False
+
+    try:
+        parts = []
+        for delta in generator.stream_report(gen_type, paper_info, model):
+            parts.append(delta)
+            yield sse('delta', {'text': delta})
+
+        result = generator.parse_report(gen_type, ''.join(parts), paper_info)
+        paper = db.session.get(Paper, paper_id)
+        record = db.session.get(GenerateRecord, record_id)
+        if paper and generator.cacheable:
+            generation_cache.put(paper, gen_type, model, result)
+        if record:
+            record.content = json.dumps(result, ensure_ascii=False)
+            record.status = 'completed'
+            record.description = f'《{paper.title if paper else ""}》的{GENERATION_TYPES[gen_type]["description"]}'
+            record.duration = time.time() - start_time
+            record.first_token_time = generator.first_token_time
+        db.session.commit()
+        finished = True
+        print(f"[DEBUG] 流式生成{label}完成 - record_id={record_id}, 首个token: {generator.first_token_time}秒, "
+              f"总耗时: {time.time() - start_time:.2f}秒")
+
+        yield sse('done', {
+            'recordId': record_id,
+            'content': result,
+            'cached': False,
+            'firstTokenTime': generator.first_token_time
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        message = _failure_message(e, label)
+        _mark_failed(record_id, message, start_time)
+        finished = True
+        yield sse('error', {'recordId': record_id, 'message': message})
+
+    finally:
+        if not finished:
+            # 客户端断开，生成器被关闭
+            db.session.rollback()
+            _mark_failed(record_id, '客户端已断开，生成已取消', start_time)
+
+
+def _failure_message(error: Exception, label: str) -> str:
+    """生成失败时记录的错误信息"""
+    if isinstance(error, TimeoutError):
+        return f'请求超时: {str(error)}'
+    if isinstance(error, ValueError):
+        return f'参数错误: {str(error)}'
+    return f'{label}失败: {str(error)}'
+
+
+def _mark_failed(record_id: int, message: str, start_time: float) -> None:
+    """把生成记录标记为 failed 并提交（记录已删除时忽略）"""
+    record = db.session.get(GenerateRecord, record_id)
+    if record:
+        record.status = 'failed'
+        record.error_message = message
+        record.duration = time.time() - start_time
+        db.session.commit()
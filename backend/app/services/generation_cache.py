@@ -0,0 +1,115 @@
+"""
+生成结果缓存：按 (论文内容哈希, 生成类型, 模型, 提示词版本) 保存 /api/generate/* 的结果
+
+相同内容的论文（包括其他用户上传的同一文件）再次生成时直接返回缓存，不调用模型。
+条目超过 GENERATION_CACHE_TTL 秒未使用即过期；条目数超过 GENERATION_CACHE_MAX_ENTRIES 时
+淘汰最久未使用的条目。论文重新解析后内容可能变化，按内容哈希整体清除（invalidate）。
+"""
+import json
+from datetime import datetime, timedelta
+from typing import Any, Optional
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from app.models import db, Paper, GenerationCache
+from app.services.ai_generator import AIGenerator
+
+
+def _ttl() -> int:
+    return int(current_app.config.get('GENERATION_CACHE_TTL', 7 * 86400))
+
+
+def is_cacheable(paper: Paper) -> bool:
+    """只缓存章节已提取完成的论文：章节就绪前生成用的是正文节选，结果会随章节入库而变化"""
+    return bool(paper.content_hash and paper.status == 'parsed' and paper.sections_ready and _ttl() > 0)
+
+
+def _find(paper: Paper, gen_type: str, model: str) -> Optional[GenerationCache]:
+    return GenerationCache.query.filter_by(
+        content_hash=paper.content_hash,
+        type=gen_type,
+        model=model,
+        prompt_version=AIGenerator.PROMPT_VERSIONS.get(gen_type, '1')
+    ).first()
+
+
+def get(paper: Paper, gen_type: str, model: str) -> Optional[Any]:
+    """
+    查找缓存的生成结果并更新最近使用时间（不提交）
+
+    Returns:
+        Optional[Any]: 缓存的结果（已解析的JSON），未命中或已过期时返回 None
+    """
+    if not is_cacheable(paper):
+        return None
+
+    entry = _find(paper, gen_type, model)
+    if not entry:
+        return None
+
+    now = datetime.utcnow()
+    if entry.last_used_at and entry.last_used_at < now - timedelta(seconds=_ttl()):
+        db.session.delete(entry)
+        return None
+
+    try:
+        content = json.loads(entry.content)
+    except ValueError:
+        db.session.delete(entry)
+        return None
+
+    entry.hits = (entry.hits or 0) + 1
+    entry.last_used_at = now
+    return content
+
+
+def put(paper: Paper, gen_type: str, model: str, content: Any) -> None:
+    """保存生成结果（不提交），并按 TTL 和条目上限淘汰旧条目"""
+    if not is_cacheable(paper):
+        return
+
+    now = datetime.utcnow()
+    entry = _find(paper, gen_type, model)
+    if not entry:
+        entry = GenerationCache(
+            content_hash=paper.content_hash,
+            type=gen_type,
+            model=model,
+            prompt_version=AIGenerator.PROMPT_VERSIONS.get(gen_type, '1'),
+            created_at=now
+        )
+        try:
+            # 并发生成同一条目时，后写入的一方改为更新已有条目
+            with db.session.begin_nested():
+                db.session.add(entry)
+        except IntegrityError:
+            entry = _find(paper, gen_type, model)
+            if not entry:
+                return
+
+    entry.content = json.dumps(content, ensure_ascii=False)
+    entry.last_used_at = now
+    evict()
+
+
+def invalidate(content_hash: Optional[str]) -> int:
+    """清除某个内容哈希的全部缓存条目（不提交），返回删除的条目数"""
+    if not content_hash:
+        return 0
+    return GenerationCache.query.filter_by(content_hash=content_hash).delete(synchronize_session=False)
+
+
+def evict() -> int:
+    """删除过期条目和超出上限的最久未使用条目（不提交），返回删除的条目数"""
+    cutoff = datetime.utcnow() - timedelta(seconds=_ttl())
+    removed = GenerationCache.query.filter(GenerationCache.last_used_at < cutoff).delete(synchronize_session=False)
+
+    max_entries = int(current_app.config.get('GENERATION_CACHE_MAX_ENTRIES', 5000))
+    overflow = GenerationCache.query.count() - max_entries
+    if overflow > 0:
+        oldest = db.session.query(GenerationCache.id).order_by(
+            GenerationCache.last_used_at, GenerationCache.id
+        ).limit(overflow).subquery()
+        removed += GenerationCache.query.filter(
+            GenerationCache.id.in_(db.select(oldest.c.id))
+        ).delete(synchronize_session=False)
+    return removed
@@ -0,0 +1,358 @@
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Optional
+from app.models import db, Job
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 任务类型 -> 处理函数
+_handlers: Dict[str, Callable[[Job], None]] = {}
+# 主要等待网络（调用模型）的任务类型，由 worker 进程内的线程执行
+_io_bound_kinds = set()
+# 任务类型 -> 最终失败时的处理函数
+_failure_handlers: Dict[str, Callable[[Job], None]] = {}
+
+
+def register_handler(kind: str, io_bound: bool = False):
+    """
+    注册任务处理函数（装饰器）
+
+    Args:
+        kind: 任务类型
+        io_bound: 是否主要等待网络；这类任务在每个 worker 进程的 JOB_IO_THREADS 个线程中执行，
+            不占用解析任务的进程
+    """
+    def decorator(func: Callable[[Job], None]):
+        _handlers[kind] = func
+        if io_bound:
+            _io_bound_kinds.add(kind)
+        return func
+    return decorator
+
+
+def register_failure_handler(kind: str):
+    """
+    注册任务最终失败（不再重试）时的处理函数（装饰器）
+
+    处理函数把任务关联的业务数据（论文、生成记录）标记为失败；worker 被强杀时处理函数本身的
+    except 分支不会执行，由 requeue_stale 回收任务时调用。处理函数需要可重复执行，并自行提交。
+    """
+    def decorator(func: Callable[[Job], None]):
+        _failure_handlers[kind] = func
+        return func
+    return decorator
+
+
+def _on_final_failure(job: Job) -> None:
+    """调用任务类型的失败处理函数，处理函数出错只记录日志"""
+    handler = _failure_handlers.get(job.kind)
+    if handler is None:
+        return
+    try:
+        handler(job)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"任务失败处理出错: job_id={job.id}, kind={job.kind}, error={str(e)}", exc_info=True)
+
+
+def enqueue(kind: str, paper_id: Optional[int] = None, payload: Optional[Dict] = None,
+            max_attempts: Optional[int] = None) -> Job:
+    """
+    向任务队列添加任务
+
+    只加入 session 而不提交，由调用方与业务数据一起提交，
+    保证"论文记录已创建"和"解析任务已入队"同时生效。
+
+    Args:
+        kind: 任务类型，如 parse
+        paper_id: 关联的论文ID
+        payload: 任务参数
+        max_attempts: 最大尝试次数，默认读取 JOB_MAX_ATTEMPTS
+
+    Returns:
+        Job: 新建的任务
+    """
+    from flask import current_app
+
+    job = Job(
+        kind=kind,
+        paper_id=paper_id,
+        status='pending',
+        max_attempts=max_attempts or current_app.config.get('JOB_MAX_ATTEMPTS', 3)
+    )
+    job.set_payload(payload)
+    db.session.add(job)
+    return job
+
+
+def find_active(kind: str, paper_id: int) -> Optional[Job]:
+    """查找论文尚未完成的同类任务（pending/running）"""
+    return Job.query.filter(
+        Job.kind == kind,
+        Job.paper_id == paper_id,
+        Job.status.in_(['pending', 'running'])
+    ).first()
+
+
+def claim_next(worker_id: str, kinds: Optional[Iterable[str]] = None) -> Optional[Job]:
+    """
+    领取一个待执行的任务
+
+    先查出候选任务ID，再用带 status='pending' 条件的 UPDATE 抢占；
+    多个 worker 进程同时抢同一任务时只有一个 UPDATE 会命中。
+
+    Args:
+        worker_id: worker 标识
+        kinds: 只领取这些类型的任务，默认全部已注册类型
+
+    Returns:
+        Optional[Job]: 领取到的任务，没有待执行任务时返回 None
+    """
+    kinds = list(kinds or _handlers.keys())
+    if not kinds:
+        return None
+
+    candidates = db.session.query(Job.id).filter(
+        Job.status == 'pending',
+        Job.kind.in_(kinds)
+    ).order_by(Job.created_at, Job.id).limit(5).all()
+
+    for (job_id,) in candidates:
+        now = datetime.utcnow()
+        claimed = Job.query.filter_by(id=job_id, status='pending').update({
+            'status': 'running',
+            'worker': worker_id,
+            'started_at': now,
+            'heartbeat_at': now,
+            'attempts': Job.attempts + 1
+        }, synchronize_session=False)
+        db.session.commit()
+
+        if claimed:
+            return db.session.get(Job, job_id)
+
+    return None
+
+
+def requeue_stale(timeout: int) -> int:
+    """
+    回收超时的任务（worker 崩溃或被强杀后遗留的 running 任务）
+
+    执行中的任务通过 ProgressReporter 写入心跳（heartbeat_at），仍在推进的长任务不会被回收；
+    没有心跳的旧任务按 started_at 判断。不再重试的任务调用其类型的失败处理函数。
+
+    Args:
+        timeout: running 状态超过该秒数没有心跳视为失联
+
+    Returns:
+        int: 回收的任务数
+    """
+    deadline = datetime.utcnow() - timedelta(seconds=timeout)
+    stale_jobs = Job.query.filter(
+        Job.status == 'running',
+        db.func.coalesce(Job.heartbeat_at, Job.started_at) < deadline
+    ).all()
+
+    for job in stale_jobs:
+        job.error_message = f'worker {job.worker} 超时未完成'
+        job.status = 'pending' if job.attempts < job.max_attempts else 'failed'
+        if job.status == 'failed':
+            job.finished_at = datetime.utcnow()
+
+    if stale_jobs:
+        db.session.commit()
+        logger.warning(f"回收超时任务 {len(stale_jobs)} 个")
+        for job in stale_jobs:
+            if job.status == 'failed':
+                _on_final_failure(job)
+
+    return len(stale_jobs)
+
+
+class ProgressReporter:
+    """
+    把任务进度写入 jobs 表，供 web 进程的事件中继读取（见 event_bus.py）
+
+    页数进度按 min_interval 节流，阶段变化时立即写入；每次写入同时更新心跳（heartbeat_at），
+    见 requeue_stale。使用独立的 UPDATE 语句，不影响处理函数 session 中的对象。
+    """
+
+    def __init__(self, job_id: int, min_interval: float = 0.5):
+        self.job_id = job_id
+        self.min_interval = min_interval
+        self.stage = ''
+        self._last_write = 0.0
+
+    def set_stage(self, stage: str) -> None:
+        """进入新阶段（如 extracting, metadata, ai_title_authors）"""
+        if stage == self.stage:
+            return
+        self.stage = stage
+        self._write({'stage': stage})
+
+    def __call__(self, current: int, total: int) -> None:
+        """页数进度回调，签名与 PDFParser.parse 的 progress_callback 相同"""
+        if current < total and time.time() - self._last_write < self.min_interval:
+            return
+        self._write({'progress_current': current, 'progress_total': total})
+
+    def _write(self, values: Dict) -> None:
+        try:
+            Job.query.filter_by(id=self.job_id).update({**values, 'heartbeat_at': datetime.utcnow()},
+                                                       synchronize_session=False)
+            db.session.commit()
+            self._last_write = time.time()
+        except Exception as e:
+            # 进度只用于展示，写入失败不影响任务本身
+            db.session.rollback()
+            logger.warning(f"写入任务进度失败: job_id={self.job_id}, error={str(e)}")
+
+
+def run_job(job: Job) -> None:
+    """执行单个任务并记录结果，失败时按 max_attempts 重新入队"""
+    handler = _handlers.get(job.kind)
+    job_id = job.id
+    start_time = time.time()
+
+    try:
+        if handler is None:
+            raise ValueError(f'未注册的任务类型: {job.kind}')
+
+        handler(job)
+
+        job = db.session.get(Job, job_id)
+        job.status = 'done'
+        job.error_message = ''
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        logger.info(f"任务完成: job_id={job_id}, kind={job.kind}, 耗时={time.time() - start_time:.1f}秒")
+
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(Job, job_id)
+        job.error_message = str(e)
+        if job.attempts < job.max_attempts:
+            job.status = 'pending'
+        else:
+            job.status = 'failed'
+            job.finished_at = datetime.utcnow()
+        db.session.commit()
+        if job.status == 'failed':
+            _on_final_failure(job)
+        logger.error(f"任务失败: job_id={job_id}, kind={job.kind}, attempts={job.attempts}, error={str(e)}", exc_info=True)
+
+
+def work_loop(worker_id: str, stop_event: threading.Event, kinds: Optional[Iterable[str]] = None) -> None:
+    """
+    worker 主循环：领取任务 -> 执行 -> 空闲时休眠
+
+    需要在应用上下文中调用。
+    """
+    from flask import current_app
+
+    poll_interval = current_app.config.get('JOB_POLL_INTERVAL', 1.0)
+    stale_timeout = current_app.config.get('JOB_STALE_TIMEOUT', 900)
+    last_stale_check = 0.0
+
+    logger.info(f"worker 已启动: {worker_id}")
+
+    while not stop_event.is_set():
+        try:
+            if time.time() - last_stale_check > 60:
+                requeue_stale(stale_timeout)
+                last_stale_check = time.time()
+
+            job = claim_next(worker_id, kinds)
+            if job is None:
+                stop_event.wait(poll_interval)
+                continue
+
+            run_job(job)
+
+        except Exception as e:
+            # 数据库被锁等临时错误，稍后重试
+            db.session.rollback()
+            logger.error(f"worker 循环异常: {str(e)}", exc_info=True)
+            stop_event.wait(poll_interval)
+
+        finally:
+            db.session.remove()
+
+    logger.info(f"worker 已退出: {worker_id}")
+
+
+def _thread_main(app, worker_id: str, stop_event: threading.Event, kinds: Iterable[str]) -> None:
+    """worker 进程内的任务线程：每个线程有自己的应用上下文和数据库会话"""
+    with app.app_context():
+        work_loop(worker_id, stop_event, kinds)
+
+
+def _worker_main(config_name: str) -> None:
+    """
+    worker 子进程入口：每个进程创建自己的应用和数据库连接
+
+    主线程执行解析等CPU密集的任务；io_bound 的任务类型（生成）由 JOB_IO_THREADS 个线程并发执行，
+    一个进程可以同时等待多个模型调用。
+    """
+    from app import create_app
+    from app.services import generate_tasks, paper_tasks  # noqa: F401 注册任务处理函数
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+
+    app = create_app(config_name)
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+    io_threads = int(app.config.get('JOB_IO_THREADS', 4))
+    io_kinds = sorted(_io_bound_kinds)
+    main_kinds = None
+    threads = []
+    if io_kinds and io_threads > 0:
+        main_kinds = [kind for kind in _handlers if kind not in _io_bound_kinds]
+        for i in range(io_threads):
+            thread = threading.Thread(target=_thread_main, args=(app, f'{worker_id}:io{i}', stop_event, io_kinds),
+                                      name=f'job-io-{i}', daemon=True)
+            thread.start()
+            threads.append(thread)
+
+    with app.app_context():
+        work_loop(worker_id, stop_event, main_kinds)
+
+    for thread in threads:
+        thread.join()
+
+
+def run_worker_pool(config_name: str, num_workers: int) -> None:
+    """
+    启动 worker 进程池并等待其退出
+
+    Args:
+        config_name: Flask 配置名（development/production）
+        num_workers: worker 进程数
+    """
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(processName)s] %(levelname)s %(message)s')
+
+    processes = []
+    for i in range(max(1, num_workers)):
+        process = multiprocessing.Process(target=_worker_main, args=(config_name,), name=f'job-worker-{i}')
+        process.start()
+        processes.append(process)
+
+    def _shutdown(*_):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, _shutdown)
+    signal.signal(signal.SIGINT, _shutdown)
+
+    for process in processes:
+        process.join()
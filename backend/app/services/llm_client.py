@@ -0,0 +1,56 @@
+import os
+import threading
+from typing import Optional
+import httpx
+from zhipuai import ZhipuAI
+
+# 进程内共享的客户端：(pid, api_key, client)
+_client_state = None
+_client_lock = threading.Lock()
+
+
+def _pool_size() -> int:
+    """连接池大小：优先读取应用配置，没有应用上下文时读取环境变量"""
+    from flask import current_app, has_app_context
+
+    if has_app_context():
+        return int(current_app.config.get('LLM_HTTP_POOL_SIZE', 10))
+    return int(os.environ.get('LLM_HTTP_POOL_SIZE', 10))
+
+
+def get_client() -> Optional[ZhipuAI]:
+    """
+    获取当前进程共享的智谱AI客户端
+
+    底层 httpx.Client 保持长连接并复用连接池，避免每次请求重新建立 TCP/TLS 连接；
+    httpx.Client 可在多个线程间共享，并发解析和生成可以直接使用同一个客户端。
+    fork 出的 worker 子进程不能复用父进程的连接，按进程号重新创建。
+
+    Returns:
+        Optional[ZhipuAI]: 未设置 ZHIPUAI_API_KEY 时返回 None
+    """
+    global _client_state
+
+    api_key = os.environ.get('ZHIPUAI_API_KEY', '')
+    if not api_key:
+        return None
+
+    pid = os.getpid()
+    state = _client_state
+    if state and state[0] == pid and state[1] == api_key:
+        return state[2]
+
+    with _client_lock:
+        state = _client_state
+        if state and state[0] == pid and state[1] == api_key:
+            return state[2]
+
+        pool_size = _pool_size()
+        http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            timeout=httpx.Timeout(300.0, connect=8.0)
+        )
+        client = ZhipuAI(api_key=api_key, http_client=http_client)
+        _client_state = (pid, api_key, client)
+        print(f"[DEBUG] 智谱AI客户端已初始化（pid={pid}, 连接池={pool_size}）")
+        return client
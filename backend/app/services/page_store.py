@@ -0,0 +1,146 @@
+import hashlib
+from typing import Iterator, List, Optional, Tuple
+from app.models import db, Paper, PageText
+from app.services.pdf_parser import PDFParser
+
+
+class PageTextWriter:
+    """
+    解析时逐页写入文本，每攒够一批提交一次
+
+    每批先删除同页码的旧记录再插入，重新解析或两个 worker 同时解析相同内容时不会冲突。
+    """
+
+    def __init__(self, content_hash: str, batch_size: int = 20):
+        self.content_hash = content_hash
+        self.batch_size = batch_size
+        self._rows = []
+
+    def __call__(self, page_number: int, text: str) -> None:
+        self._rows.append({
+            'content_hash': self.content_hash,
+            'parser_version': PDFParser.VERSION,
+            'page_number': page_number,
+            'text': text
+        })
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._rows:
+            return
+
+        page_numbers = [row['page_number'] for row in self._rows]
+        PageText.query.filter(
+            PageText.content_hash == self.content_hash,
+            PageText.parser_version == PDFParser.VERSION,
+            PageText.page_number.in_(page_numbers)
+        ).delete(synchronize_session=False)
+        db.session.execute(db.insert(PageText), self._rows)
+        db.session.commit()
+        self._rows = []
+
+
+def has_pages(paper: Paper) -> bool:
+    """论文在当前解析器版本下是否已有逐页文本"""
+    if not paper.content_hash:
+        return False
+    return db.session.query(PageText.id).filter_by(
+        content_hash=paper.content_hash,
+        parser_version=PDFParser.VERSION
+    ).first() is not None
+
+
+def load_pages(paper: Paper, limit: Optional[int] = None) -> List[Tuple[int, str]]:
+    """
+    读取论文的逐页原始文本
+
+    Args:
+        paper: 论文
+        limit: 最多读取的页数
+
+    Returns:
+        List[Tuple[int, str]]: (页码, 原始文本) 列表，按页码排序；没有存储时返回空列表
+    """
+    if not paper.content_hash:
+        _request_backfill(paper)
+        return []
+
+    query = db.session.query(PageText.page_number, PageText.text).filter_by(
+        content_hash=paper.content_hash,
+        parser_version=PDFParser.VERSION
+    ).order_by(PageText.page_number)
+    if limit:
+        query = query.limit(limit)
+
+    pages = [(page_number, text or '') for page_number, text in query.all()]
+    if not pages:
+        _request_backfill(paper)
+    return pages
+
+
+def iter_pages(paper: Paper, batch_size: int = 20) -> Iterator[Tuple[int, str]]:
+    """按页码顺序分批读取逐页原始文本，不把整篇论文一次读入内存（调用方先用 has_pages 确认已存储）"""
+    query = db.session.query(PageText.page_number, PageText.text).filter_by(
+        content_hash=paper.content_hash,
+        parser_version=PDFParser.VERSION
+    ).order_by(PageText.page_number)
+
+    for page_number, text in query.yield_per(batch_size):
+        yield page_number, text or ''
+
+
+def load_excerpt(paper: Paper, max_chars: int) -> str:
+    """
+    按页序读取正文开头，空白压缩后最多 max_chars 个字符
+
+    逐页查询，够长即停，不会把整篇论文读入内存。
+    """
+    if max_chars <= 0:
+        return ''
+    if not paper.content_hash:
+        _request_backfill(paper)
+        return ''
+
+    parts = []
+    length = 0
+    query = db.session.query(PageText.text).filter_by(
+        content_hash=paper.content_hash,
+        parser_version=PDFParser.VERSION
+    ).order_by(PageText.page_number)
+
+    for (text,) in query.yield_per(5):
+        text = ' '.join((text or '').split())
+        if not text:
+            continue
+        parts.append(text)
+        length += len(text) + 1
+        if length >= max_chars:
+            break
+
+    if not parts and not has_pages(paper):
+        _request_backfill(paper)
+    return ' '.join(parts)[:max_chars]
+
+
+def _request_backfill(paper: Paper) -> None:
+    """
+    旧论文（逐页文本功能上线前解析，或解析器版本已升级）没有逐页文本时，
+    交给后台 worker 补齐，请求路径本身不重新打开PDF
+    """
+    from app.services import job_queue
+
+    if paper.status != 'parsed' or job_queue.find_active('pages', paper.id):
+        return
+
+    job_queue.enqueue('pages', paper_id=paper.id)
+    db.session.commit()
+
+
+def compute_file_hash(filepath: str) -> str:
+    """计算文件内容的SHA-256（用于补齐旧论文的内容哈希）"""
+    sha256 = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
@@ -0,0 +1,355 @@
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from flask import current_app
+from app.models import db, Paper, Job, ParseResult
+from app.services import generation_cache
+from app.services.job_queue import ProgressReporter, enqueue, find_active, register_failure_handler, register_handler
+from app.services.page_store import PageTextWriter, compute_file_hash, has_pages, iter_pages
+from app.services.pdf_parser import PDFParser
+from app.services.section_store import dump_sections, parse_sections, replace_sections
+
+
+def apply_parse_result(paper: Paper, result: Dict) -> None:
+    """将解析结果写入论文记录（不提交）"""
+    paper.title = result.get('title', '')
+    paper.authors = result.get('authors', '')
+    paper.abstract = result.get('abstract', '')
+    paper.keywords = result.get('keywords', '')
+    paper.publish_date = result.get('publish_date', '')
+    paper.category = result.get('category', '未分类')
+    replace_sections(paper, result.get('sections'))
+    paper.sections_ready = bool(result.get('sections_ready'))
+    paper.set_stage_versions(result.get('stage_versions'))
+    paper.status = 'parsed'
+    paper.error_message = ''
+    paper.parse_time = datetime.utcnow()
+
+
+def parser_options() -> Dict:
+    """按应用配置生成 PDFParser 的参数（文件路径和大小除外）"""
+    return {
+        'workers': current_app.config.get('PDF_PARSE_WORKERS', 1),
+        'chunk_size': current_app.config.get('PDF_PARSE_CHUNK_SIZE', 10),
+        'ai_single_call': current_app.config.get('PDF_AI_SINGLE_CALL', False),
+        'ai_deadline': current_app.config.get('PDF_AI_CALL_DEADLINE', 20),
+        'memory_budget': current_app.config.get('PDF_MEMORY_BUDGET', 256 * 1024 * 1024),
+        'memory_sample_every': current_app.config.get('PDF_MEMORY_SAMPLE_EVERY', 25),
+        'spill_threshold': current_app.config.get('PDF_SPILL_THRESHOLD', 4 * 1024 * 1024)
+    }
+
+
+def _create_parser(paper: Paper) -> PDFParser:
+    """按配置创建解析器"""
+    return PDFParser(paper.filepath, file_size=paper.filesize, **parser_options())
+
+
+def _extract_and_store_pages(parser: PDFParser, content_hash: str, progress: ProgressReporter) -> Iterator[Tuple[int, str]]:
+    """重新提取逐页原始文本，边产出边写入 PageText"""
+    page_writer = PageTextWriter(content_hash)
+    for page_number, raw_text in parser.iter_raw_pages(progress_callback=progress):
+        page_writer(page_number, raw_text)
+        yield page_number, raw_text
+    page_writer.flush()
+
+
+def request_sections(paper: Paper) -> None:
+    """元数据入库后，章节尚未提取时加入后台 sections 任务（不提交）"""
+    if paper.sections_ready or find_active('sections', paper.id):
+        return
+    enqueue('sections', paper_id=paper.id)
+
+
+def _find_parse_result(content_hash: str) -> Optional[ParseResult]:
+    return ParseResult.query.filter_by(content_hash=content_hash, parser_version=PDFParser.VERSION).first()
+
+
+def get_cached_result(content_hash: Optional[str]) -> Optional[ParseResult]:
+    """
+    查找当前解析器版本下相同内容文件的解析结果
+
+    标题为空或为占位标题的条目是早先解析失败、AI提取失败时存下的结果，不复用，交给解析任务重新解析。
+    """
+    if not content_hash:
+        return None
+    cached = _find_parse_result(content_hash)
+    if not cached or not cached.title or cached.title == PDFParser.DEFAULT_TITLE:
+        return None
+    return cached
+
+
+def store_parse_result(content_hash: Optional[str], result: Dict) -> None:
+    """
+    保存解析结果供相同内容的上传复用（不提交）
+
+    失败、空的结果和AI提取不完整（degraded，元数据含默认值）的结果不保存，相同内容再次上传时重新解析。
+    """
+    if not content_hash or result.get('error') or result.get('degraded') or not result.get('title'):
+        return
+
+    cached = _find_parse_result(content_hash)
+    if not cached:
+        cached = ParseResult(content_hash=content_hash, parser_version=PDFParser.VERSION)
+        db.session.add(cached)
+
+    cached.title = result.get('title', '')
+    cached.authors = result.get('authors', '')
+    cached.abstract = result.get('abstract', '')
+    cached.keywords = result.get('keywords', '')
+    cached.publish_date = result.get('publish_date', '')
+    cached.category = result.get('category', '未分类')
+    cached.sections = result.get('sections', '')
+    cached.sections_ready = bool(result.get('sections_ready'))
+    cached.set_stage_versions(result.get('stage_versions'))
+
+
+def paper_result(paper: Paper) -> Dict:
+    """论文当前的解析结果（与 PDFParser.parse() 返回值结构相同）"""
+    return {
+        'title': paper.title,
+        'authors': paper.authors,
+        'abstract': paper.abstract,
+        'keywords': paper.keywords,
+        'publish_date': paper.publish_date,
+        'category': paper.category,
+        'sections': dump_sections(paper),
+        'sections_ready': bool(paper.sections_ready),
+        'stage_versions': paper.get_stage_versions()
+    }
+
+
+def is_stage_stale(paper: Paper, stage: str) -> bool:
+    """
+    解析阶段是否过期
+
+    逐页文本按解析器版本存储，缺失即过期；其余阶段比较记录的版本，
+    没有记录（阶段版本上线前解析的论文）视为版本 '1'。
+    """
+    if stage == 'extraction':
+        return not has_pages(paper)
+    if stage == 'sections' and not paper.sections_ready:
+        # 尚未提取章节，由 sections 任务负责
+        return False
+    return paper.get_stage_versions().get(stage, '1') != PDFParser.STAGE_VERSIONS[stage]
+
+
+def resolve_stages(paper: Paper, requested: Iterable[str]) -> List[str]:
+    """
+    重新解析需要执行的阶段：请求的阶段、过期的阶段，以及依赖它们输出的阶段
+
+    Returns:
+        List[str]: 按 PDFParser.PARSE_STAGES 的执行顺序排列
+    """
+    selected = set(requested)
+    selected.update(stage for stage in PDFParser.PARSE_STAGES if is_stage_stale(paper, stage))
+    for stage in PDFParser.PARSE_STAGES:
+        if stage in selected:
+            selected.update(PDFParser.STAGE_DEPENDENTS.get(stage, ()))
+    return [stage for stage in PDFParser.PARSE_STAGES if stage in selected]
+
+
+@register_handler('parse')
+def handle_parse(job: Job) -> None:
+    """
+    解析任务：pending -> parsing -> parsed/failed
+
+    解析失败时抛出异常交给队列重试；最后一次尝试失败才把论文标记为 failed，
+    中间失败的论文回到 pending 等待下一次领取。
+    """
+    paper = db.session.get(Paper, job.paper_id)
+    if not paper:
+        print(f"[DEBUG] 论文已删除，跳过解析任务: paper_id={job.paper_id}")
+        return
+
+    # 旧论文没有内容哈希时先补齐，逐页文本和解析结果都按哈希存储
+    if not paper.content_hash:
+        paper.content_hash = compute_file_hash(paper.filepath)
+        db.session.commit()
+
+    # 已解析的论文按阶段增量重新解析
+    stages = job.get_payload().get('stages')
+    if stages is not None and paper.status == 'parsed':
+        _reparse_stages(job, paper, stages)
+        return
+
+    # 排队期间相同内容的文件可能已被其他 worker 解析完成（重新解析时 force=True 跳过缓存）
+    cached = None if job.get_payload().get('force') else get_cached_result(paper.content_hash)
+    if cached:
+        apply_parse_result(paper, cached.to_result())
+        request_sections(paper)
+        db.session.commit()
+        return
+
+    paper.status = 'parsing'
+    db.session.commit()
+
+    try:
+        parser = _create_parser(paper)
+        page_writer = PageTextWriter(paper.content_hash)
+        progress = ProgressReporter(job.id)
+        result = parser.parse(progress_callback=progress, page_sink=page_writer, stage_callback=progress.set_stage)
+        page_writer.flush()
+
+        # 提取失败或结果为空时抛出异常：论文回到 pending 等待重试，最后一次失败标记为 failed，
+        # 不写入解析结果缓存，也不加入 sections 任务
+        if result.get('error'):
+            raise ValueError(result['error'])
+        if not result.get('title'):
+            raise ValueError('解析结果为空')
+
+        apply_parse_result(paper, result)
+        store_parse_result(paper.content_hash, result)
+        request_sections(paper)
+        if job.get_payload().get('force'):
+            # 重新解析：解析期间按旧内容缓存的生成结果作废
+            generation_cache.invalidate(paper.content_hash)
+        db.session.commit()
+
+    except Exception as e:
+        db.session.rollback()
+        paper = db.session.get(Paper, job.paper_id)
+        if paper:
+            paper.status = 'failed' if job.attempts >= job.max_attempts else 'pending'
+            paper.error_message = str(e)
+            db.session.commit()
+        raise
+
+
+@register_failure_handler('parse')
+def fail_parse(job: Job) -> None:
+    """
+    解析任务最终失败时把未解析完成的论文标记为 failed
+
+    worker 在最后一次尝试中被强杀时 handle_parse 的 except 分支不会执行，论文会一直停在 parsing；
+    增量重新解析失败的论文保留原有结果，不受影响。
+    """
+    paper = db.session.get(Paper, job.paper_id)
+    if paper and paper.status in ('pending', 'parsing'):
+        paper.status = 'failed'
+        paper.error_message = job.error_message or '解析任务执行中断'
+        db.session.commit()
+
+
+def _reparse_stages(job: Job, paper: Paper, stages: List[str]) -> None:
+    """
+    只重算指定的阶段，其余字段保持不变
+
+    逐页文本已存储时各阶段都从 PageText 读取，不重新打开PDF；
+    只有 metadata、category 阶段调用模型。结果同步到相同内容的解析结果缓存。
+    失败时抛出异常交给队列重试，论文保留原有的解析结果。
+    """
+    progress = ProgressReporter(job.id)
+    parser = _create_parser(paper)
+    versions = paper.get_stage_versions()
+    print(f"[DEBUG] 增量重新解析 paper_id={paper.id}: {', '.join(stages) or '无过期阶段'}")
+
+    try:
+        if 'extraction' in stages:
+            progress.set_stage('extracting')
+            for _ in _extract_and_store_pages(parser, paper.content_hash, progress):
+                pass
+
+        if 'metadata' in stages:
+            progress.set_stage('metadata')
+            head_text = parser.head_text_from_pages(iter_pages(paper))
+            metadata = parser.extract_metadata(head_text, stage_callback=progress.set_stage)
+            paper.title = metadata['title']
+            paper.authors = metadata['authors']
+            paper.abstract = metadata['abstract']
+            paper.keywords = metadata['keywords']
+            paper.category = metadata['category']
+        elif 'category' in stages:
+            paper.category = parser.extract_category(paper.title, paper.abstract, stage_callback=progress.set_stage)
+
+        if 'date' in stages:
+            progress.set_stage('date')
+            paper.publish_date = parser.extract_date_from_pages(iter_pages(paper))
+
+        if 'sections' in stages:
+            progress.set_stage('sections')
+            replace_sections(paper, parser.extract_sections_from_pages(iter_pages(paper), max_sections=None))
+            paper.sections_ready = True
+
+        for stage in stages:
+            versions[stage] = PDFParser.STAGE_VERSIONS[stage]
+        paper.set_stage_versions(versions)
+        paper.error_message = ''
+        paper.parse_time = datetime.utcnow()
+        # AI提取不完整时结果含默认值，只更新本论文，不写入解析结果缓存
+        if not (parser.ai_degraded and ('metadata' in stages or 'category' in stages)):
+            store_parse_result(paper.content_hash, paper_result(paper))
+        generation_cache.invalidate(paper.content_hash)
+        db.session.commit()
+
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+@register_handler('pages')
+def handle_pages(job: Job) -> None:
+    """补齐逐页文本：旧论文或解析器版本升级后首次被读取时触发"""
+    paper = db.session.get(Paper, job.paper_id)
+    if not paper:
+        return
+
+    if not paper.content_hash:
+        paper.content_hash = compute_file_hash(paper.filepath)
+        db.session.commit()
+
+    if has_pages(paper):
+        return
+
+    page_writer = PageTextWriter(paper.content_hash)
+    for page_number, raw_text in _create_parser(paper).iter_raw_pages():
+        page_writer(page_number, raw_text)
+    page_writer.flush()
+
+
+@register_handler('sections')
+def handle_sections(job: Job) -> None:
+    """
+    章节提取：在元数据入库后运行，不阻塞上传和解析
+
+    从逐页文本提取全部章节（不限制数量），写入论文和解析结果缓存，
+    相同内容的其他论文一并标记为章节就绪。
+    """
+    paper = db.session.get(Paper, job.paper_id)
+    if not paper or paper.status != 'parsed' or paper.sections_ready:
+        return
+
+    if not paper.content_hash:
+        paper.content_hash = compute_file_hash(paper.filepath)
+        db.session.commit()
+
+    # 相同内容的论文可能已用当前版本提取过章节
+    sections_version = PDFParser.STAGE_VERSIONS['sections']
+    cached = get_cached_result(paper.content_hash)
+    if cached and cached.sections_ready and cached.get_stage_versions().get('sections', '1') == sections_version:
+        sections = cached.sections
+    else:
+        progress = ProgressReporter(job.id)
+        progress.set_stage('sections')
+        parser = _create_parser(paper)
+        if has_pages(paper):
+            pages = iter_pages(paper)
+        else:
+            # 逐页文本缺失（旧论文）：重新提取并顺便补齐
+            pages = _extract_and_store_pages(parser, paper.content_hash, progress)
+
+        sections = parser.extract_sections_from_pages(pages, max_sections=None)
+        if cached:
+            cached.sections = sections
+            cached.sections_ready = True
+            cached.set_stage_versions({**cached.get_stage_versions(), 'sections': sections_version})
+
+    same_content = Paper.query.filter(
+        Paper.content_hash == paper.content_hash,
+        Paper.status == 'parsed',
+        Paper.sections_ready.isnot(True)
+    ).all()
+    sections_list = parse_sections(sections)
+    for same_paper in same_content:
+        replace_sections(same_paper, sections_list)
+        same_paper.sections_ready = True
+        same_paper.set_stage_versions({**same_paper.get_stage_versions(), 'sections': sections_version})
+    db.session.commit()
@@ -2,17 +2,271 @@ import json
 import re
 import os
 import sys
-from typing import Dict, List, Optional, Tuple, Callable
+import tempfile
+import threading
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from itertools import islice
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple, Callable, Union
 import PyPDF2
 import pdfplumber
 from zhipuai import ZhipuAI
+from app.services.llm_client import get_client
+from app.services.text_normalize import clean_content, clean_pages, clean_pdf_text
+
+
+def _extract_page_range(filepath: str, start: int, end: int,
+                        memory_budget: int = 0, memory_sample_every: int = 25) -> List[Tuple[str, str]]:
+    """
+    进程池任务：在子进程中自行打开PDF，提取 [start, end) 页并清理文本
+
+    必须是模块级函数才能被进程池序列化。
+
+    Returns:
+        List[Tuple[str, str]]: 按页顺序排列的 (原始文本, 清理后文本)，无文本的页为空字符串
+    """
+    sampler = PageMemorySampler(memory_budget, memory_sample_every)
+    texts = []
+    with pdfplumber.open(filepath) as pdf:
+        for j in range(start, end):
+            page_text = sampler.extract_text(pdf.pages[j], j)
+            texts.append((page_text, clean_pdf_text(page_text)))
+    return texts
+
+
+def _iter_lines(source: Union[str, IO[str]]) -> Iterator[str]:
+    """逐行读取文本；source 为字符串，或从头重新读取的文本文件"""
+    if isinstance(source, str):
+        return iter(source.split('\n'))
+    source.seek(0)
+    return iter(source)
+
+
+# 同一进程内多个解析同时抽样时共用一次 tracemalloc 跟踪
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+
+
+class PageMemorySampler:
+    """
+    解析器自身的内存检查：每隔 sample_every 页用 tracemalloc 跟踪一页的提取，
+    这一页新分配内存的峰值超过预算时抛出 MemoryError
+
+    只统计解析器提取这一页时的分配，与 worker 进程此前处理过什么无关
+    （原先按整个进程的 RSS 判断，gunicorn worker 占用较多内存后大PDF会随机失败）。
+    每页提取后调用 page.close() 释放 pdfplumber 的缓存，已处理的页不会累积，
+    因此单页峰值就是提取阶段的内存上界。
+    tracemalloc 会使分配密集的 pdfplumber 慢数倍，所以只抽样跟踪；budget 为 0 时不检查。
+    """
+
+    def __init__(self, budget: int, sample_every: int = 25):
+        self.budget = budget
+        self.sample_every = max(1, sample_every or 1)
+        self.peak = 0
+
+    def extract_text(self, page, index: int) -> str:
+        """提取一页文本并释放该页缓存，index 为从0开始的页序号"""
+        try:
+            if self.budget and index % self.sample_every == 0:
+                with self._trace() as traced_peak:
+                    text = page.extract_text() or ''
+                page_peak = traced_peak()
+                self.peak = max(self.peak, page_peak)
+                if page_peak > self.budget:
+                    raise MemoryError(
+                        f"第{index + 1}页提取内存 {page_peak / 1024 / 1024:.2f}MB "
+                        f"超过预算 {self.budget / 1024 / 1024:.2f}MB"
+                    )
+                return text
+            return page.extract_text() or ''
+        finally:
+            page.close()
+
+    @contextmanager
+    def _trace(self):
+        """跟踪期间的分配；产出的函数在退出后返回相对开始时的峰值增量（字节）"""
+        global _tracing_users
+
+        with _tracing_lock:
+            if _tracing_users == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _tracing_users = 1
+            elif _tracing_users:
+                _tracing_users += 1
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+
+        result = {'peak': 0}
+        try:
+            yield lambda: result['peak']
+        finally:
+            with _tracing_lock:
+                result['peak'] = max(0, tracemalloc.get_traced_memory()[1] - baseline)
+                if _tracing_users:
+                    _tracing_users -= 1
+                    if _tracing_users == 0:
+                        tracemalloc.stop()
+
+
+# 日期模式，按优先级排列：先在全文中找第一种格式，找不到再找下一种
+DATE_PATTERNS = [
+    re.compile(r'\b(\d{4})\s*年\s*(\d{1,2})\s*月\s*(\d{1,2})\s*日\b'),
+    re.compile(r'\b(\d{4})[-/](\d{1,2})[-/](\d{1,2})\b'),
+    re.compile(r'\b((?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+\d{1,2},?\s+\d{4})\b'),
+]
+
+
+class _DateScanner:
+    """
+    在分段输入的文本流上增量匹配日期，结果与对拼接后的全文逐个模式 re.search 一致
+
+    每次把上一段末尾 CARRY 个字符和新文本拼在一起匹配，跨页的日期也能命中；
+    离缓冲区末尾不足 MARGIN 的匹配可能被截断，推迟到下一段再确认。
+    日期匹配长度远小于 MARGIN。
+    """
+
+    CARRY = 128
+    MARGIN = 64
+
+    def __init__(self):
+        self._carry = ''
+        self._truncated = False  # carry 是否已丢弃了文本开头
+        self._matches: List[Optional[str]] = [None] * len(DATE_PATTERNS)
+
+    @property
+    def done(self) -> bool:
+        """最高优先级的模式已命中，后续文本不会改变结果"""
+        return self._matches[0] is not None
+
+    def feed(self, text: str) -> None:
+        if not text or self.done:
+            return
+        buffer = self._carry + text
+        self._scan(buffer, limit=len(buffer) - self.MARGIN)
+        self._carry = buffer[-self.CARRY:]
+        self._truncated = self._truncated or len(buffer) > self.CARRY
+
+    def finish(self) -> str:
+        """输入结束，返回优先级最高的匹配"""
+        if not self.done and self._carry:
+            self._scan(self._carry, limit=len(self._carry))
+            self._carry = ''
+        for match in self._matches:
+            if match is not None:
+                return match
+        return ""
+
+    def _scan(self, buffer: str, limit: int) -> None:
+        # carry 截断过时从第1个字符开始搜索，让第0个字符作为 \b 的上下文；
+        # 以第0个字符开头的匹配在上一段里已经检查过
+        start = 1 if self._truncated else 0
+        for index, pattern in enumerate(DATE_PATTERNS):
+            if self._matches[index] is not None:
+                continue
+            match = pattern.search(buffer, start)
+            if match and match.end() <= limit:
+                self._matches[index] = match.group(0)
+
+
+# 章节标题的序号格式，按 _normalize_section_number 的识别顺序排列，合并为一个正则一次匹配；
+# 分支按顺序尝试，命中的分支与逐个 re.match 时第一个命中的模式相同
+_NUMBER_FORMATS = [
+    ('dot', r'(?P<dot_num>\d+(?:\.\d+)*)\.\s+(?P<dot_title>.+)'),  # 1. Introduction, 1.1 Background
+    ('paren', r'[\(\[](?P<paren_num>\d+)[\]\)]\s*(?P<paren_title>.+)'),  # (1) Introduction, [1] Introduction
+    ('roman', r'(?P<roman_num>[IVXLCDM]+)\.\s+(?P<roman_title>.+)'),  # I. Introduction
+    ('cn', r'(?P<cn_num>[一二三四五六七八九十]+)[、.]\s*(?P<cn_title>.+)'),  # 一、引言
+    ('upper', r'(?P<upper_num>[A-Z]{3,})\s*(?:[：:]?\s*(?P<upper_title>.+))?'),  # INTRODUCTION, ABSTRACT:
+    ('letter', r'[\(\[]?(?P<letter_num>[a-zA-Z])[\]\)]?\.\s*(?P<letter_title>.+)'),  # (a) Point A, A. First point
+]
+
+
+def _compile_alternation(branches: List[str]) -> 're.Pattern':
+    return re.compile('^(?:' + '|'.join(f'(?:{branch})' for branch in branches) + ')$')
+
+
+_NUMBER_PATTERN = _compile_alternation([branch for _, branch in _NUMBER_FORMATS])
+# 罗马数字校验失败时从中文数字格式继续尝试
+_NUMBER_PATTERN_AFTER_ROMAN = _compile_alternation([branch for name, branch in _NUMBER_FORMATS if name in ('cn', 'upper', 'letter')])
+
+# 章节标题行的识别模式（_extract_sections 原先逐个 re.match 的七个模式）。
+# 前六个模式都要求标题部分非空，命中即交给序号规范化；只有最后的全大写模式允许没有标题。
+_HEADING_PATTERN = _compile_alternation([
+    r'\d+(?:\.\d+)*\.\s+.+',  # 1. Introduction, 1.1 Background
+    r'\d+\s+.+',  # 1 Introduction (无点号)
+    r'[一二三四五六七八九十]+[、.]\s*.+',  # 一、引言
+    r'[IVXLCDM]+\.\s+.+',  # I. Introduction, II. Background
+    r'[\(\[]\d+[\]\)]\s*.+',  # (1) Introduction, [1] Introduction
+    r'[\(\[]?[a-zA-Z][\]\)]?\.\s*.+',  # (a) Point A, A. First point
+    r'(?P<bare>[A-Z]{3,})\s*(?:[：:]?\s*(?P<bare_title>.+))?',  # INTRODUCTION, ABSTRACT:
+])
+
+# 未找到标准章节时的宽松匹配：数字开头的行
+_LOOSE_HEADING = re.compile(r'^\d+[\s\.]')
+_LOOSE_HEADING_SPLIT = re.compile(r'^(\d+)[\s\.]\s*')
 
 
 class PDFParser:
     """PDF解析器"""
 
-    def __init__(self, filepath: str):
+    # 解析器版本：解析结果或逐页文本的结构、算法变化时递增，旧版本的缓存不再复用
+    VERSION = '2'
+
+    # AI提取元数据使用的文本前缀长度（_extract_with_ai 最多使用前3500字符）
+    AI_TEXT_WINDOW = 3500
+
+    # AI没有提取到标题时使用的占位标题
+    DEFAULT_TITLE = '未命名论文'
+
+    # 解析阶段，按执行顺序排列
+    PARSE_STAGES = ('extraction', 'metadata', 'category', 'date', 'sections')
+
+    # 各阶段的算法版本：只有某个阶段的实现变化时递增该阶段，重新解析时只重算过期的阶段，
+    # 例如章节识别升级只需重跑正则，不必重新调用模型。
+    # extraction（逐页文本）的版本就是 VERSION，逐页文本按 VERSION 存储，缺失即过期
+    STAGE_VERSIONS = {
+        'extraction': VERSION,
+        'metadata': '1',
+        'category': '1',
+        'date': '1',
+        'sections': '2',  # 2: 不再限制章节数量
+    }
+
+    # 重算某个阶段时，使用其输出的阶段一并重算（分类依赖标题和摘要）
+    STAGE_DEPENDENTS = {
+        'extraction': ('date', 'sections'),
+        'metadata': ('category',),
+    }
+
+    def __init__(self, filepath: str, workers: int = 1, chunk_size: int = 10,
+                 ai_single_call: bool = False, ai_deadline: float = 20, file_size: Optional[int] = None,
+                 memory_budget: int = 256 * 1024 * 1024, memory_sample_every: int = 25,
+                 spill_threshold: int = 4 * 1024 * 1024):
+        """
+        Args:
+            filepath: PDF文件路径
+            file_size: 已知的文件大小（上传时已统计），不传时解析前读取
+            workers: 文本提取进程数，大于1时按页分块并行提取
+            chunk_size: 每批（每个进程任务）处理的页数
+            ai_single_call: AI元数据提取是否合并为一次调用
+            ai_deadline: 并发AI调用的单次截止时间（秒）
+            memory_budget: 单页提取的内存预算（字节），0 表示不检查，见 PageMemorySampler
+            memory_sample_every: 每隔多少页抽样检查一次内存
+            spill_threshold: 章节提取累积的全文超过该字符数时写入临时文件
+        """
         self.filepath = filepath
+        self.file_size = file_size
+        self.workers = max(1, workers or 1)
+        self.chunk_size = max(1, chunk_size or 10)
+        self.ai_single_call = ai_single_call
+        self.ai_deadline = ai_deadline
+        self.memory_budget = memory_budget or 0
+        self.memory_sample_every = memory_sample_every
+        self.spill_threshold = spill_threshold
+        self._stage_callback: Optional[Callable[[str], None]] = None
+        # 最近一次AI提取是否有步骤失败、超时或未设置 API Key（结果中含默认值，不应缓存）
+        self.ai_degraded = False
 
     def _normalize_section_number(self, line: str) -> Tuple[Optional[str], str]:
         """
@@ -31,52 +285,57 @@ class PDFParser:
             Tuple[Optional[str], str]: (规范化序号, 纯标题文本)
                                       如果无法识别序号，返回 (None, 原始文本)
         """
-        # 阿拉伯数字格式: 1. Introduction, 1.1 Background, 1.1.1 Details
-        arabic_dot = r'^(\d+(?:\.\d+)*)\.\s+(.+)$'
-        match = re.match(arabic_dot, line)
-        if match:
-            return match.group(1), match.group(2)
-
-        # 括号阿拉伯数字: (1) Introduction, [1] Introduction
-        arabic_paren = r'^[\(\[](\d+)[\]\)]\s*(.+)$'
-        match = re.match(arabic_paren, line)
-        if match:
-            return match.group(1), match.group(2)
-
-        # 罗马数字: I. Introduction, II. Background
-        roman_pattern = r'^([IVXLCDM]+)\.\s+(.+)$'
-        match = re.match(roman_pattern, line)
-        if match:
-            # 验证是否是有效的罗马数字
-            roman_num = match.group(1)
-            if self._is_valid_roman(roman_num):
-                return roman_num, match.group(2)
-
-        # 中文数字: 一、引言, 二、背景
-        chinese_pattern = r'^([一二三四五六七八九十]+)[、.]\s*(.+)$'
-        match = re.match(chinese_pattern, line)
-        if match:
-            # 转换为阿拉伯数字
-            chinese_num = match.group(1)
-            arabic_num = self._chinese_to_arabic(chinese_num)
-            return str(arabic_num), match.group(2)
-
-        # 全大写字母（可能是章节缩写）: INTRODUCTION, ABSTRACT
-        uppercase = r'^([A-Z]{3,})\s*(?:[：:]?\s*(.+))?$'
-        match = re.match(uppercase, line)
-        if match:
-            title = match.group(2) if match.group(2) else match.group(1)
-            return match.group(1), title
-
-        # 字母格式: (a) Point A, A. First point
-        letter_pattern = r'^[\(\[]?([a-zA-Z])[\]\)]?\.\s*(.+)$'
-        match = re.match(letter_pattern, line)
-        if match:
-            return match.group(1), match.group(2)
-
-        # 无法识别序号格式
+        match = _NUMBER_PATTERN.match(line)
+        if match and match.group('roman_num') is not None and not self._is_valid_roman(match.group('roman_num')):
+            # 形如罗马数字但不合法，按原顺序继续尝试后面的格式
+            match = _NUMBER_PATTERN_AFTER_ROMAN.match(line)
+        if not match:
+            # 无法识别序号格式
+            return None, line
+
+        groups = match.groupdict()
+        for name, _ in _NUMBER_FORMATS:
+            number = groups.get(f'{name}_num')
+            if number is None:
+                continue
+            title = groups[f'{name}_title']
+            if name == 'cn':
+                # 中文数字转换为阿拉伯数字
+                return str(self._chinese_to_arabic(number)), title
+            if name == 'upper' and not title:
+                return number, number
+            return number, title
+
         return None, line
 
+    def _classify_heading(self, line: str) -> Optional[Tuple[Optional[str], str]]:
+        """
+        判断一行是否是章节标题
+
+        每行只做一次合并正则匹配，命中后才做序号规范化；
+        结果与依次尝试各个标题模式、命中后规范化并校验标题长度的做法一致。
+
+        Args:
+            line: 去除首尾空白后的文本行
+
+        Returns:
+            Optional[Tuple[Optional[str], str]]: 是章节标题时返回 (序号, 标题)，否则返回 None
+        """
+        match = _HEADING_PATTERN.match(line)
+        if not match:
+            return None
+
+        bare = match.group('bare')
+        if bare is None or match.group('bare_title'):
+            section_number, section_title = self._normalize_section_number(line)
+            if len(section_title) >= 2:
+                return section_number, section_title
+
+        # 全大写单词单独成行（如 INTRODUCTION），序号和标题都是该单词
+        if bare is not None and not match.group('bare_title'):
+            return bare, bare
+        return None
+
     def _is_valid_roman(self, s: str) -> bool:
         """验证是否是有效的罗马数字"""
         roman_numerals = {
@@ -167,7 +426,9 @@ class PDFParser:
         """
         为章节分配父子关系
 
-        根据层级和序号前缀确定父章节
+        父章节是之前最近的一个层级更高（level 更小）的章节。单次遍历维护祖先栈：
+        栈内层级严格递增，新章节入栈前弹出同级和更低层级的章节，栈顶即为父章节，
+        章节数量不受限制，复杂度 O(n)。
 
         Args:
             sections: 章节列表，每个包含 number 和 level 字段
@@ -175,74 +436,30 @@ class PDFParser:
         Returns:
             List[Dict]: 添加了 parent 字段的章节列表
         """
-        for i, section in enumerate(sections):
+        ancestors = []
+        for section in sections:
             level = section.get('level', 1)
-            number = section.get('number', '')
-
-            # 从后向前查找可能的父章节
-            parent_index = None
-            for j in range(i - 1, -1, -1):
-                prev_section = sections[j]
-                prev_level = prev_section.get('level', 1)
-                prev_number = prev_section.get('number', '')
-
-                # 父章节的层级必须更小
-                if prev_level < level:
-                    # 对于数字序号，检查前缀匹配
-                    if number and prev_number and '.' in number:
-                        # 检查当前序号是否以父序号为前缀
-                        if number.startswith(prev_number + '.'):
-                            parent_index = j
-                            break
-
-                    # 如果没有前缀匹配，使用最近的更高层级章节
-                    if parent_index is None:
-                        parent_index = j
-                        break
+            while ancestors and ancestors[-1].get('level', 1) >= level:
+                ancestors.pop()
 
-            section['parent'] = sections[parent_index]['number'] if parent_index is not None else None
+            section['parent'] = ancestors[-1]['number'] if ancestors else None
+            ancestors.append(section)
 
         return sections
 
-    def _clean_pdf_text(self, text: str) -> str:
+    def _clean_pdf_text(self, text: str, keep_lines: bool = False) -> str:
         """
         清理PDF提取的文本，处理常见的编码问题
 
         Args:
             text: 原始文本
+            keep_lines: 是否保留换行；默认把换行合并为空格（元数据提取使用），
+                        章节提取需要按行识别标题，传 True
 
         Returns:
-            str: 清理后的文本（保留换行符结构）
+            str: 清理后的文本
         """
-        if not text:
-            return ""
-
-        # 移除PDF常见的乱码字符（\x00格式的控制字符）
-        text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]', '', text)
-
-        # 移除常见的PDF提取伪影（如连续的特殊字符）
-        text = re.sub(r'[\n\r]+', ' ', text)
-
-        # 规范化Unicode字符
-        text = text.replace('\u3000', ' ')  # 全角空格转半角
-        text = text.replace('\xa0', ' ')    # 不换行空格转普通空格
-
-        # 标准化换行符（保留换行结构！）
-        text = text.replace('\r\n', '\n').replace('\r', '\n')
-
-        # 移除行首行尾空白，但保留行结构
-        lines = text.split('\n')
-        cleaned_lines = []
-        for line in lines:
-            line = line.strip()
-            # 过滤掉只有特殊字符的行，但保留有内容的行
-            if re.search(r'[a-zA-Z0-9\u4e00-\u9fff]', line):
-                cleaned_lines.append(line)
-
-        # 用换行符连接行，保留段落结构
-        result = '\n'.join(cleaned_lines)
-
-        return result
+        return clean_pdf_text(text, keep_lines=keep_lines)
 
     def _clean_content(self, content: str) -> str:
         """
@@ -259,75 +476,113 @@ class PDFParser:
         Returns:
             str: 清理后的内容
         """
-        if not content:
-            return ""
-
-        # 规范化Unicode字符（全角转半角等）
-        content = content.replace('\u3000', ' ')  # 全角空格转半角
-        content = content.replace('\xa0', ' ')    # 不换行空格转普通空格
-
-        # 移除控制字符（保留换行、制表符）
-        import unicodedata
-        cleaned_chars = []
-        for char in content:
-            if unicodedata.category(char)[0] != 'C' or char in '\n\t':
-                cleaned_chars.append(char)
-        content = ''.join(cleaned_chars)
-
-        # 标准化换行符
-        content = content.replace('\r\n', '\n').replace('\r', '\n')
-
-        # 移除行首行尾空白
-        lines = content.split('\n')
-        lines = [line.strip() for line in lines]
-
-        # 移除空行，但保留段落分隔（连续空行变成单个空行）
-        cleaned_lines = []
-        prev_empty = False
-        for line in lines:
-            if not line:
-                if not prev_empty:
-                    cleaned_lines.append('')
-                prev_empty = True
-            else:
-                cleaned_lines.append(line)
-                prev_empty = False
-
-        # 重新组合内容，用单个空格连接段落内的行
-        result_paragraphs = []
-        current_paragraph = []
-
-        for line in cleaned_lines:
-            if not line:
-                # 空行表示段落结束
-                if current_paragraph:
-                    result_paragraphs.append(' '.join(current_paragraph))
-                    current_paragraph = []
-            else:
-                current_paragraph.append(line)
+        return clean_content(content)
+
+    def iter_pages(self, progress_callback: Optional[Callable[[int, int], None]] = None) -> Iterator[Tuple[int, str]]:
+        """
+        逐页产出清理后的文本，调用方按需消费，不在内存中保留全文
+
+        workers 大于1且页数超过一批时使用进程池并行提取，但仍按页序产出；
+        同时在途的批次数有上限，消费方处理慢时不会堆积已提取的文本。
+
+        Args:
+            progress_callback: 进度回调函数，参数为 (当前页数, 总页数)，每批调用一次
+
+        Yields:
+            Tuple[int, str]: (页码，从1开始, 清理后的页面文本；无文本的页为空字符串)
+        """
+        for page_number, _, page_text in self._iter_page_texts(progress_callback):
+            yield page_number, page_text
+
+    def iter_raw_pages(self, progress_callback: Optional[Callable[[int, int], None]] = None) -> Iterator[Tuple[int, str]]:
+        """逐页产出 (页码, pdfplumber 原始文本)，用于持久化逐页文本"""
+        for page_number, raw_text, _ in self._iter_page_texts(progress_callback):
+            yield page_number, raw_text
+
+    def _iter_page_texts(self, progress_callback: Optional[Callable[[int, int], None]] = None) -> Iterator[Tuple[int, str, str]]:
+        """逐页产出 (页码, pdfplumber 原始文本, 清理后文本)"""
+        sampler = PageMemorySampler(self.memory_budget, self.memory_sample_every)
+        with pdfplumber.open(self.filepath) as pdf:
+            total_pages = len(pdf.pages)
+
+            # 页数较多时交给进程池并行提取，这里只需要页数
+            use_parallel = self.workers > 1 and total_pages > self.chunk_size
+            if not use_parallel:
+                # 分批处理页面
+                for i in range(0, total_pages, self.chunk_size):
+                    batch_end = min(i + self.chunk_size, total_pages)
+
+                    for j in range(i, batch_end):
+                        page_text = sampler.extract_text(pdf.pages[j], j)
+                        # 清理PDF提取的文本，移除乱码字符
+                        yield j + 1, page_text, self._clean_pdf_text(page_text)
 
-        # 添加最后一个段落
-        if current_paragraph:
-            result_paragraphs.append(' '.join(current_paragraph))
+                    # 调用进度回调
+                    if progress_callback:
+                        progress_callback(batch_end, total_pages)
 
-        # 用双换行连接段落
-        result = '\n\n'.join(result_paragraphs)
+        if use_parallel:
+            yield from self._iter_pages_parallel(total_pages, progress_callback)
 
-        # 移除开头和结尾的多余空白
-        result = result.strip()
+    def _iter_pages_parallel(self, total_pages: int,
+                             progress_callback: Optional[Callable[[int, int], None]] = None) -> Iterator[Tuple[int, str, str]]:
+        """
+        按页分块，用进程池并行提取文本，按页序产出
 
-        # 限制内容长度，防止过长
-        if len(result) > 5000:
-            result = result[:5000] + '...'
+        Args:
+            total_pages: 总页数
+            progress_callback: 进度回调函数，参数为 (当前页数, 总页数)
 
-        return result
+        Yields:
+            Tuple[int, str, str]: (页码, 原始文本, 清理后文本)
+        """
+        chunks = [(start, min(start + self.chunk_size, total_pages))
+                  for start in range(0, total_pages, self.chunk_size)]
+        max_workers = min(self.workers, len(chunks))
+        print(f"[DEBUG] 并行提取文本: {total_pages} 页, {len(chunks)} 批, {max_workers} 个进程")
 
-    def parse(self, progress_callback: Optional[Callable[[int, int], None]] = None) -> Dict:
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+        try:
+            # 最多 2 * 进程数 个批次在途，按提交顺序取结果以保证页序
+            remaining = iter(chunks)
+            in_flight = deque()
+            for start, end in islice(remaining, max_workers * 2):
+                in_flight.append((start, end, self._submit_page_range(executor, start, end)))
+
+            while in_flight:
+                start, end, future = in_flight.popleft()
+                texts = future.result()
+
+                next_chunk = next(remaining, None)
+                if next_chunk:
+                    in_flight.append((*next_chunk, self._submit_page_range(executor, *next_chunk)))
+
+                for offset, (raw_text, page_text) in enumerate(texts):
+                    yield start + offset + 1, raw_text, page_text
+
+                if progress_callback:
+                    progress_callback(end, total_pages)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _submit_page_range(self, executor: ProcessPoolExecutor, start: int, end: int):
+        """提交一批页面的提取任务，子进程按同样的预算抽样检查内存"""
+        return executor.submit(_extract_page_range, self.filepath, start, end,
+                               self.memory_budget, self.memory_sample_every)
+
+    def parse(self, progress_callback: Optional[Callable[[int, int], None]] = None,
+              page_sink: Optional[Callable[[int, str], None]] = None,
+              stage_callback: Optional[Callable[[str], None]] = None) -> Dict:
         """
         解析PDF文件，提取元数据和内容
 
+        逐页消费页面流：AI提取只需要开头 AI_TEXT_WINDOW 个字符，
+        日期在页面流上增量匹配，因此峰值内存与页数无关。
+
         Args:
             progress_callback: 进度回调函数，参数为 (当前页数, 总页数)
+            page_sink: 页面文本回调，参数为 (页码, pdfplumber 原始文本)，用于持久化逐页文本
+            stage_callback: 阶段回调，参数为阶段名（extracting, metadata, ai_metadata, ai_category, ai_all）
 
         Returns:
             Dict: 包含title, authors, abstract, keywords, sections等信息的字典
@@ -335,64 +590,56 @@ class PDFParser:
         print(f"[DEBUG] 开始解析PDF: {self.filepath}")
         try:
             # 检查文件大小
-            file_size = os.path.getsize(self.filepath)
+            file_size = self.file_size if self.file_size is not None else os.path.getsize(self.filepath)
             max_file_size = 50 * 1024 * 1024  # 50MB
 
             if file_size > max_file_size:
                 print(f"警告: PDF文件过大 ({file_size / 1024 / 1024:.2f}MB)，可能需要较长时间处理")
 
-            # 检查内存使用
-            import psutil
-            process = psutil.Process()
-            memory_info = process.memory_info()
-            max_memory = 500 * 1024 * 1024  # 500MB
+            # 页面文本按原顺序直接拼接（不加分隔符），只保留开头部分
+            head_parts = []
+            head_length = 0
+            total_length = 0
+            date_scanner = _DateScanner()
 
-            if memory_info.rss > max_memory:
-                raise MemoryError(f"内存使用过高: {memory_info.rss / 1024 / 1024:.2f}MB")
+            self._stage_callback = stage_callback
+            self._report_stage('extracting')
 
-            # 使用pdfplumber提取文本内容，分批处理
-            with pdfplumber.open(self.filepath) as pdf:
-                total_pages = len(pdf.pages)
-                full_text = ""
+            for page_number, raw_text, page_text in self._iter_page_texts(progress_callback):
+                if page_sink:
+                    page_sink(page_number, raw_text)
+                if head_length < self.AI_TEXT_WINDOW:
+                    head_parts.append(page_text)
+                    head_length += len(page_text)
+                if not date_scanner.done:
+                    date_scanner.feed(page_text)
+                total_length += len(page_text)
 
-                # 分批处理页面
-                batch_size = 10
-                for i in range(0, total_pages, batch_size):
-                    batch_end = min(i + batch_size, total_pages)
-                    batch_text = ""
-
-                    for j in range(i, batch_end):
-                        page = pdf.pages[j]
-                        page_text = page.extract_text()
-                        if page_text:
-                            # 清理PDF提取的文本，移除乱码字符
-                            page_text = self._clean_pdf_text(page_text)
-                            batch_text += page_text
-
-                    full_text += batch_text
-
-                    # 调用进度回调
-                    if progress_callback:
-                        progress_callback(batch_end, total_pages)
+            if not total_length:
+                # 打不开或没有文本层的文件：按失败处理，不调用AI，也不缓存空结果
+                raise ValueError('未能从PDF中提取到文本')
 
-                    # 检查内存使用
-                    memory_info = process.memory_info()
-                    if memory_info.rss > max_memory:
-                        raise MemoryError(f"内存使用过高: {memory_info.rss / 1024 / 1024:.2f}MB")
+            head_text = ''.join(head_parts)[:self.AI_TEXT_WINDOW]
 
             # 使用AI提取元数据（快速提取，20秒内完成）
             print("[DEBUG] 使用AI快速提取论文信息")
-            ai_result = self._extract_with_ai(full_text)
+            self._report_stage('metadata')
+            ai_result = self._extract_with_ai(head_text)
 
             # 构建结果，使用AI提取的数据
             result = {
-                'title': ai_result.get('title', '未命名论文'),
+                'title': ai_result.get('title', self.DEFAULT_TITLE),
                 'authors': ai_result.get('authors', '[]'),
                 'abstract': ai_result.get('abstract', ''),
                 'keywords': ai_result.get('keywords', '[]'),
-                'sections': '[]',  # 章节暂时留空，可后续异步提取或在生成时动态生成
-                'publish_date': self._extract_date(full_text),
-                'category': ai_result.get('category', '未分类')
+                'sections': '[]',  # 章节由后台 sections 任务在元数据入库后提取
+                'publish_date': date_scanner.finish(),
+                'category': ai_result.get('category', '未分类'),
+                # 章节阶段的版本由 sections 任务写入
+                'stage_versions': {stage: version for stage, version in self.STAGE_VERSIONS.items()
+                                   if stage != 'sections'},
+                # AI提取不完整时元数据含默认值，可以入库展示，但不写入解析结果缓存
+                'degraded': self.ai_degraded
             }
 
             # 调试日志
@@ -404,8 +651,8 @@ class PDFParser:
                 print(f"[DEBUG]   作者: {len(result.get('authors', ''))} 字符")
                 print(f"[DEBUG]   摘要: {len(result.get('abstract', ''))} 字符")
                 print(f"[DEBUG]   关键词: {len(result.get('keywords', ''))} 字符")
-                print(f"[DEBUG]   章节: 留空（后续异步提取）")
-                print(f"[DEBUG]   原始文本长度: {len(full_text)} 字符")
+                print(f"[DEBUG]   章节: 留空（由后台 sections 任务提取）")
+                print(f"[DEBUG]   原始文本长度: {total_length} 字符")
             except Exception as log_error:
                 print(f"[DEBUG] 日志输出错误: {log_error}")
 
@@ -433,9 +680,67 @@ class PDFParser:
                 'keywords': '',
                 'sections': '',
                 'publish_date': '',
-                'category': ''
+                'category': '',
+                'error': f'解析失败: {str(e)}'
             }
 
+    def head_text_from_pages(self, pages: Iterable[Tuple[int, str]]) -> str:
+        """按页序拼接清理后的文本，取开头 AI_TEXT_WINDOW 个字符（与 parse() 传给AI的文本相同）"""
+        head_parts = []
+        head_length = 0
+        for _, raw_text in pages:
+            page_text = self._clean_pdf_text(raw_text)
+            head_parts.append(page_text)
+            head_length += len(page_text)
+            if head_length >= self.AI_TEXT_WINDOW:
+                break
+        return ''.join(head_parts)[:self.AI_TEXT_WINDOW]
+
+    def extract_date_from_pages(self, pages: Iterable[Tuple[int, str]]) -> str:
+        """在逐页原始文本上匹配发表日期（与 parse() 的结果相同），找到即停止读取"""
+        date_scanner = _DateScanner()
+        for _, raw_text in pages:
+            date_scanner.feed(self._clean_pdf_text(raw_text))
+            if date_scanner.done:
+                break
+        return date_scanner.finish()
+
+    def extract_metadata(self, text: str, stage_callback: Optional[Callable[[str], None]] = None) -> Dict:
+        """
+        重新提取元数据（标题、作者、摘要、关键词及依赖它们的分类）
+
+        Args:
+            text: 论文开头的文本，见 head_text_from_pages
+            stage_callback: 阶段回调，同 parse()
+
+        Returns:
+            Dict: 字段缺失时使用与 parse() 相同的默认值
+        """
+        self._stage_callback = stage_callback
+        ai_result = self._extract_with_ai(text)
+        return {
+            'title': ai_result.get('title', self.DEFAULT_TITLE),
+            'authors': ai_result.get('authors', '[]'),
+            'abstract': ai_result.get('abstract', ''),
+            'keywords': ai_result.get('keywords', '[]'),
+            'category': ai_result.get('category', '未分类')
+        }
+
+    def extract_category(self, title: str, abstract: str,
+                         stage_callback: Optional[Callable[[str], None]] = None) -> str:
+        """根据已有的标题和摘要重新判断分类，未设置 API Key 或调用失败时返回 '未分类'"""
+        self._stage_callback = stage_callback
+        self.ai_degraded = False
+        client = get_client()
+        if not client:
+            print("[DEBUG] 未设置ZHIPUAI_API_KEY，跳过AI分类")
+            self.ai_degraded = True
+            return '未分类'
+
+        self._report_stage('ai_category')
+        result = self._run_ai_step('分类', self._ai_extract_category, client, title or '', abstract or '')
+        return self._clean_ai_metadata(result).get('category', '未分类')
+
     def _extract_title(self, text: str) -> str:
         """提取标题"""
         lines = text.split('\n')
@@ -604,7 +909,38 @@ class PDFParser:
 
         return json.dumps(unique_keywords, ensure_ascii=False)  # 最多返回10个关键词
 
-    def _extract_sections(self, text: str) -> str:
+    def extract_sections_from_pages(self, pages: Iterable[Tuple[int, str]], max_sections: Optional[int] = None) -> str:
+        """
+        从逐页原始文本提取章节（后台 sections 任务使用）
+
+        按批清理页面写入 SpooledTemporaryFile：全文不超过 spill_threshold 个字符时留在内存，
+        超过后转存到临时文件再按行读回，大论文不会在内存中拼出全文。
+
+        Args:
+            pages: (页码, pdfplumber 原始文本) 序列，按页码排序，可以是逐页读取的生成器
+            max_sections: 最多保留的章节数，None 表示不限制
+
+        Returns:
+            str: JSON格式的章节数组
+        """
+        with tempfile.SpooledTemporaryFile(max_size=self.spill_threshold, mode='w+', encoding='utf-8') as buffer:
+            batch = []
+            for _, raw_text in pages:
+                batch.append(raw_text)
+                if len(batch) >= self.chunk_size:
+                    self._write_clean_batch(buffer, batch)
+                    batch = []
+            self._write_clean_batch(buffer, batch)
+            return self._extract_sections(buffer, max_sections=max_sections)
+
+    def _write_clean_batch(self, buffer: IO[str], raw_texts: List[str]) -> None:
+        """清理一批页面文本并追加到缓冲区"""
+        text = clean_pages(raw_texts)
+        if text:
+            buffer.write(text)
+            buffer.write('\n')
+
+    def _extract_sections(self, text: Union[str, IO[str]], max_sections: Optional[int] = None) -> str:
         """
         提取章节
 
@@ -612,31 +948,23 @@ class PDFParser:
         返回包含 number, title, content, level, parent 的结构化数据
 
         Args:
-            text: PDF文本内容
+            text: PDF文本内容（按行分隔），或可重复读取的文本文件
+            max_sections: 最多保留的章节数，默认不限制
 
         Returns:
             str: JSON格式的章节数组
         """
         sections = []
 
-        # 扩展的章节标题模式 - 更宽松的匹配
-        section_patterns = [
-            r'^(\d+(?:\.\d+)*)\.\s+(.+)$',  # 1. Introduction, 1.1 Background
-            r'^(\d+)\s+(.+)$',  # 1 Introduction (无点号)
-            r'^([一二三四五六七八九十]+)[、.]\s*(.+)$',  # 一、引言
-            r'^([IVXLCDM]+)\.\s+(.+)$',  # I. Introduction, II. Background
-            r'^[\(\[](\d+)[\]\)]\s*(.+)$',  # (1) Introduction, [1] Introduction
-            r'^[\(\[]?([a-zA-Z])[\]\)]?\.\s*(.+)$',  # (a) Point A, A. First point
-            r'^([A-Z]{3,})\s*(?:[：:]?\s*(.+))?$',  # INTRODUCTION, ABSTRACT:
-        ]
-
-        lines = text.split('\n')
+        # 当前章节的内容按行收集，章节结束时再拼接
         current_section = None
+        content_lines = []
+        content_length = 0
         in_abstract = False
+        line_count = 0
 
-        print(f"[DEBUG] 开始章节提取，总行数: {len(lines)}")
-
-        for line in lines:
+        for line in _iter_lines(text):
+            line_count += 1
             line = line.strip()
             if not line:
                 continue
@@ -651,66 +979,54 @@ class PDFParser:
                     in_abstract = False
                 continue
 
-            # 检查是否是章节标题
-            is_section = False
-            section_number = None
-            section_title = None
-
-            for pattern in section_patterns:
-                match = re.match(pattern, line)
-                if match:
-                    # 使用规范化方法处理序号
-                    if len(match.groups()) >= 2 and match.group(2):
-                        section_number, section_title = self._normalize_section_number(line)
-                    else:
-                        section_number = match.group(1) if match.group(1) else None
-                        section_title = match.group(1) if match.group(1) else line
-
-                    # 验证章节标题是否合理（至少包含一些文字）
-                    if section_title and len(section_title) >= 2:
-                        is_section = True
-                        print(f"[DEBUG] 找到章节: {section_number} {section_title}")
-                        break
+            # 检查是否是章节标题（单次合并匹配，见 _HEADING_PATTERN）
+            heading = self._classify_heading(line)
 
-            if is_section:
+            if heading:
                 # 保存当前章节（如果有标题就保存，不过滤内容长度）
                 if current_section and current_section.get('title'):
+                    current_section['content'] = ' '.join(content_lines)
                     sections.append(current_section)
-                    print(f"[DEBUG] 保存章节: {current_section.get('number')} {current_section.get('title')}, 内容长度: {len(current_section.get('content', ''))}")
 
                 # 创建新章节
+                section_number, section_title = heading
                 current_section = {
                     'number': section_number,
                     'title': section_title,
                     'content': ''
                 }
+                content_lines = []
+                content_length = 0
             elif current_section:
-                # 累积章节内容
-                if current_section['content']:
-                    current_section['content'] += ' '
-                current_section['content'] += line
+                # 累积章节内容（行之间以空格分隔）
+                content_length += len(line) + (1 if content_lines else 0)
+                content_lines.append(line)
 
                 # 限制每个章节内容长度
-                if len(current_section['content']) > 3000:
+                if content_length > 3000:
+                    current_section['content'] = ' '.join(content_lines)
                     sections.append(current_section)
                     current_section = None
 
         # 添加最后一个章节（只要有标题就保存）
         if current_section and current_section.get('title'):
+            current_section['content'] = ' '.join(content_lines)
             sections.append(current_section)
             print(f"[DEBUG] 保存最后章节: {current_section.get('number')} {current_section.get('title')}, 内容长度: {len(current_section.get('content', ''))}")
 
+        print(f"[DEBUG] 章节提取扫描完成，总行数: {line_count}")
+
         # 如果没有找到任何章节，尝试使用更宽松的方法
         if not sections:
             print("[DEBUG] 未找到标准格式的章节，尝试宽松匹配")
             # 查找所有以数字或中文数字开头的行
-            for line in lines:
+            for line in _iter_lines(text):
                 line = line.strip()
                 if not line:
                     continue
                 # 匹配简单的数字开头
-                if re.match(r'^\d+[\s\.]', line):
-                    parts = re.split(r'^(\d+)[\s\.]\s*', line, maxsplit=1)
+                if _LOOSE_HEADING.match(line):
+                    parts = _LOOSE_HEADING_SPLIT.split(line, maxsplit=1)
                     if len(parts) >= 3:
                         sections.append({
                             'number': parts[1],
@@ -738,7 +1054,8 @@ class PDFParser:
         sections = self._assign_parent_relationships(sections)
 
         # 限制章节数量
-        sections = sections[:20]
+        if max_sections is not None:
+            sections = sections[:max_sections]
 
         print(f"[DEBUG] 最终章节数量: {len(sections)}")
 
@@ -746,50 +1063,121 @@ class PDFParser:
 
     def _extract_date(self, text: str) -> str:
         """提取发布日期"""
-        # 查找日期模式
-        date_patterns = [
-            r'\b(\d{4})\s*年\s*(\d{1,2})\s*月\s*(\d{1,2})\s*日\b',
-            r'\b(\d{4})[-/](\d{1,2})[-/](\d{1,2})\b',
-            r'\b((?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+\d{1,2},?\s+\d{4})\b',
-        ]
-
-        for pattern in date_patterns:
-            match = re.search(pattern, text)
-            if match:
-                return match.group(0)
-
-        return ""
+        scanner = _DateScanner()
+        scanner.feed(text)
+        return scanner.finish()
 
     def _extract_with_ai(self, text: str) -> Dict:
         """
-        使用AI快速提取论文元数据（分步提取，20秒内完成）
+        使用AI快速提取论文元数据
+
+        策略（默认）：
+        1. 标题+作者（前1500字符）与 摘要+关键词（前3500字符）互不依赖，在线程池中并发调用
+        2. 分类依赖前两步的标题和摘要，两者返回后再调用
+        每次调用都有独立的截止时间，某一步失败或超时不影响其他步骤的结果。
 
-        策略：
-        1. 快速提取标题和作者（只分析前1500字符，5秒内完成）
-        2. 提取摘要和关键词（分析前3500字符，10秒内完成）
-        3. 章节留空，后续异步提取或在生成时动态生成
+        ai_single_call=True 时改为一次调用，用一个结构化JSON返回全部字段。
 
         Args:
-            text: PDF提取的文本内容
+            text: PDF提取的文本内容（只使用开头 AI_TEXT_WINDOW 个字符）
 
         Returns:
-            Dict: 包含title, authors, abstract, keywords的字典
+            Dict: 包含title, authors, abstract, keywords, category的字典；
+                  有步骤失败或未提取到标题时 self.ai_degraded 为 True
         """
         import time
-        api_key = os.environ.get('ZHIPUAI_API_KEY', '')
-        if not api_key:
+        self.ai_degraded = False
+        client = get_client()
+        if not client:
             print("[DEBUG] 未设置ZHIPUAI_API_KEY，跳过AI提取")
+            self.ai_degraded = True
             return {}
 
-        client = ZhipuAI(api_key=api_key)
-        cleaned_result = {}
+        start_time = time.time()
+
+        if self.ai_single_call:
+            self._report_stage('ai_all')
+            raw_result = self._run_ai_step('单次提取', self._ai_extract_all, client, text)
+            cleaned_result = self._clean_ai_metadata(raw_result)
+            if 'title' not in cleaned_result:
+                self.ai_degraded = True
+            print(f"[DEBUG] AI快速提取完成（单次调用），总耗时: {time.time() - start_time:.1f}秒")
+            return cleaned_result
+
+        executor = ThreadPoolExecutor(max_workers=2)
+        try:
+            # ========== 第一、二步并发：标题+作者、摘要+关键词 ==========
+            self._report_stage('ai_metadata')
+            future_1 = executor.submit(self._ai_extract_title_authors, client, text)
+            future_2 = executor.submit(self._ai_extract_abstract_keywords, client, text)
+            result_1 = self._wait_ai_step('第一步（标题+作者）', future_1)
+            result_2 = self._wait_ai_step('第二步（摘要+关键词）', future_2)
+        finally:
+            # 超时的调用不再等待，让其在后台自行结束
+            executor.shutdown(wait=False)
+
+        # ========== 第三步：提取论文分类（依赖标题和摘要） ==========
+        title = str(result_1.get('title', '')).strip()
+        abstract = str(result_2.get('abstract', '')).strip()
+        self._report_stage('ai_category')
+        result_3 = self._run_ai_step('第三步（分类）', self._ai_extract_category, client, title, abstract)
+
+        cleaned_result = self._clean_ai_metadata({**result_1, **result_2, **result_3})
+        if 'title' not in cleaned_result:
+            self.ai_degraded = True
+        print(f"[DEBUG] AI快速提取完成，总耗时: {time.time() - start_time:.1f}秒")
+        return cleaned_result
+
+    def _report_stage(self, stage: str) -> None:
+        """通知调用方进入新阶段，回调异常不影响解析"""
+        if not self._stage_callback:
+            return
+        try:
+            self._stage_callback(stage)
+        except Exception as e:
+            print(f"[DEBUG] 阶段回调失败: {str(e)}")
 
+    def _wait_ai_step(self, name: str, future) -> Dict:
+        """等待一个并发的AI步骤，超过截止时间或失败时返回空结果"""
         try:
-            # ========== 第一步：快速提取标题和作者（5秒） ==========
-            start_time = time.time()
-            text_sample_1 = text[:1500] if len(text) > 1500 else text
+            return future.result(timeout=self.ai_deadline)
+        except FuturesTimeoutError:
+            print(f"[DEBUG] AI提取{name}超时（{self.ai_deadline}秒）")
+        except Exception as e:
+            print(f"[DEBUG] AI提取{name}失败: {str(e)}")
+        self.ai_degraded = True
+        return {}
 
-            prompt_1 = f"""Extract the title and authors from the paper below.
+    def _run_ai_step(self, name: str, func: Callable[..., Dict], *args) -> Dict:
+        """在当前线程执行一个AI步骤，失败时返回空结果"""
+        import time
+        start_time = time.time()
+        try:
+            result = func(*args)
+            print(f"[DEBUG] AI提取{name}完成，耗时: {time.time() - start_time:.1f}秒")
+            return result
+        except Exception as e:
+            print(f"[DEBUG] AI提取{name}失败: {str(e)}")
+            self.ai_degraded = True
+            return {}
+
+    def _ai_chat_json(self, client: ZhipuAI, prompt: str, temperature: float, max_tokens: int, timeout: int) -> Dict:
+        """调用模型并解析返回的JSON对象"""
+        response = client.chat.completions.create(
+            model="glm-4-flash",
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout=timeout
+        )
+        result = json.loads(self._clean_json_response(response.choices[0].message.content))
+        return result if isinstance(result, dict) else {}
+
+    def _ai_extract_title_authors(self, client: ZhipuAI, text: str) -> Dict:
+        """提取标题和作者（只分析前1500字符）"""
+        text_sample_1 = text[:1500] if len(text) > 1500 else text
+
+        prompt_1 = f"""Extract the title and authors from the paper below.
 The paper may be in Chinese, English, or bilingual.
 - If in Chinese: keep original
 - If in English or bilingual: translate to Chinese
@@ -799,40 +1187,13 @@ Text:
 
 返回JSON：{{"title":"论文标题","authors":["作者1","作者2"]}}"""
 
-            response_1 = client.chat.completions.create(
-                model="glm-4-flash",
-                messages=[{"role": "user", "content": prompt_1}],
-                temperature=0.2,
-                max_tokens=300,
-                timeout=15
-            )
-
-            result_1 = json.loads(self._clean_json_response(response_1.choices[0].message.content))
-
-            # 标题
-            title = result_1.get('title', '').strip()
-            if title and len(title) > 5 and len(title) < 300:
-                cleaned_result['title'] = title
-
-            # 作者
-            authors = result_1.get('authors', [])
-            if isinstance(authors, list):
-                valid_authors = []
-                for author in authors:
-                    author = str(author).strip()
-                    if len(author) < 50 and not re.search(r'(Net|CNN|Transformer|ResNet|VGG|模型|算法)', author, re.IGNORECASE):
-                        valid_authors.append(author)
-                if valid_authors:
-                    cleaned_result['authors'] = json.dumps(valid_authors[:10], ensure_ascii=False)
-
-            elapsed_1 = time.time() - start_time
-            print(f"[DEBUG] 第一步完成（标题+作者），耗时: {elapsed_1:.1f}秒")
-
-            # ========== 第二步：提取摘要和关键词（10秒） ==========
-            start_time = time.time()
-            text_sample_2 = text[:3500] if len(text) > 3500 else text
-
-            prompt_2 = f"""Extract the abstract and keywords from the paper below.
+        return self._ai_chat_json(client, prompt_1, temperature=0.2, max_tokens=300, timeout=15)
+
+    def _ai_extract_abstract_keywords(self, client: ZhipuAI, text: str) -> Dict:
+        """提取摘要和关键词（分析前3500字符）"""
+        text_sample_2 = text[:3500] if len(text) > 3500 else text
+
+        prompt_2 = f"""Extract the abstract and keywords from the paper below.
 The paper may be in Chinese, English, or bilingual.
 - If in Chinese: keep original
 - If in English or bilingual: translate to Chinese
@@ -842,36 +1203,11 @@ Text:
 
 返回JSON：{{"abstract":"摘要内容","keywords":["关键词1","关键词2"]}}"""
 
-            response_2 = client.chat.completions.create(
-                model="glm-4-flash",
-                messages=[{"role": "user", "content": prompt_2}],
-                temperature=0.2,
-                max_tokens=800,
-                timeout=15
-            )
-
-            result_2 = json.loads(self._clean_json_response(response_2.choices[0].message.content))
-
-            # 摘要
-            abstract = result_2.get('abstract', '').strip()
-            if abstract and len(abstract) > 50:
-                abstract = re.sub(r'\s+', ' ', abstract)
-                cleaned_result['abstract'] = abstract[:3000]
-
-            # 关键词
-            keywords = result_2.get('keywords', [])
-            if isinstance(keywords, list):
-                valid_keywords = [kw.strip() for kw in keywords if isinstance(kw, str) and len(kw.strip()) < 30 and len(kw.strip()) > 1]
-                if valid_keywords:
-                    cleaned_result['keywords'] = json.dumps(valid_keywords[:10], ensure_ascii=False)
+        return self._ai_chat_json(client, prompt_2, temperature=0.2, max_tokens=800, timeout=15)
 
-            elapsed_2 = time.time() - start_time
-            print(f"[DEBUG] 第二步完成（摘要+关键词），耗时: {elapsed_2:.1f}秒")
-
-            # ========== 第三步：提取论文分类（5秒） ==========
-            start_time = time.time()
-
-            prompt_3 = f"""判断论文的学科分类。
+    def _ai_extract_category(self, client: ZhipuAI, title: str, abstract: str) -> Dict:
+        """根据标题和摘要判断学科分类"""
+        prompt_3 = f"""判断论文的学科分类。
 论文可能是中文、英文或双语。
 
 文本（标题和摘要）：
@@ -883,30 +1219,64 @@ Text:
 
 返回JSON：{{"category":"分类名称"}}"""
 
-            response_3 = client.chat.completions.create(
-                model="glm-4-flash",
-                messages=[{"role": "user", "content": prompt_3}],
-                temperature=0.1,
-                max_tokens=50,
-                timeout=10
-            )
+        return self._ai_chat_json(client, prompt_3, temperature=0.1, max_tokens=50, timeout=10)
+
+    def _ai_extract_all(self, client: ZhipuAI, text: str) -> Dict:
+        """单次调用提取全部元数据（分析前3500字符）"""
+        text_sample = text[:3500] if len(text) > 3500 else text
+
+        prompt = f"""Extract the title, authors, abstract, keywords and subject category from the paper below.
+The paper may be in Chinese, English, or bilingual.
+- If in Chinese: keep original
+- If in English or bilingual: translate to Chinese
+- category must be one of: 计算机、物理、化学、生物、医学、数学、经济、管理、人文、社科、工程、其他
 
-            result_3 = json.loads(self._clean_json_response(response_3.choices[0].message.content))
-            category = result_3.get('category', '').strip()
-            if category:
-                cleaned_result['category'] = category
+Text:
+{text_sample}
 
-            elapsed_3 = time.time() - start_time
-            print(f"[DEBUG] 第三步完成（分类），耗时: {elapsed_3:.1f}秒")
+返回JSON：{{"title":"论文标题","authors":["作者1","作者2"],"abstract":"摘要内容","keywords":["关键词1","关键词2"],"category":"分类名称"}}"""
 
-            print(f"[DEBUG] AI快速提取完成，总耗时约: {elapsed_1 + elapsed_2 + elapsed_3:.1f}秒")
-            return cleaned_result
+        return self._ai_chat_json(client, prompt, temperature=0.2, max_tokens=1200, timeout=25)
 
-        except Exception as e:
-            print(f"[DEBUG] AI提取失败: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return {}
+    def _clean_ai_metadata(self, raw: Dict) -> Dict:
+        """校验并规范化AI返回的元数据字段，无效字段直接丢弃"""
+        cleaned_result = {}
+
+        # 标题
+        title = str(raw.get('title', '') or '').strip()
+        if title and len(title) > 5 and len(title) < 300:
+            cleaned_result['title'] = title
+
+        # 作者
+        authors = raw.get('authors', [])
+        if isinstance(authors, list):
+            valid_authors = []
+            for author in authors:
+                author = str(author).strip()
+                if len(author) < 50 and not re.search(r'(Net|CNN|Transformer|ResNet|VGG|模型|算法)', author, re.IGNORECASE):
+                    valid_authors.append(author)
+            if valid_authors:
+                cleaned_result['authors'] = json.dumps(valid_authors[:10], ensure_ascii=False)
+
+        # 摘要
+        abstract = str(raw.get('abstract', '') or '').strip()
+        if abstract and len(abstract) > 50:
+            abstract = re.sub(r'\s+', ' ', abstract)
+            cleaned_result['abstract'] = abstract[:3000]
+
+        # 关键词
+        keywords = raw.get('keywords', [])
+        if isinstance(keywords, list):
+            valid_keywords = [kw.strip() for kw in keywords if isinstance(kw, str) and len(kw.strip()) < 30 and len(kw.strip()) > 1]
+            if valid_keywords:
+                cleaned_result['keywords'] = json.dumps(valid_keywords[:10], ensure_ascii=False)
+
+        # 分类
+        category = str(raw.get('category', '') or '').strip()
+        if category:
+            cleaned_result['category'] = category
+
+        return cleaned_result
 
     def _clean_json_response(self, response_text: str) -> str:
         """清理AI响应，提取纯JSON"""
@@ -0,0 +1,216 @@
+import json
+from typing import Dict, List, Optional, Union
+from app.models import db, Paper, PaperSection
+from app.services.chunker import CJK_TOKENS_PER_CHAR, estimate_tokens, plan_sections, section_header_tokens
+
+
+def parse_sections(sections: Union[str, List[Dict], None]) -> List[Dict]:
+    """章节 JSON 字符串或列表 -> 列表（无效数据返回空列表）"""
+    if not sections:
+        return []
+    if isinstance(sections, str):
+        try:
+            sections = json.loads(sections)
+        except ValueError:
+            return []
+    return sections if isinstance(sections, list) else []
+
+
+def replace_sections(paper: Paper, sections: Union[str, List[Dict], None]) -> None:
+    """
+    用新的章节替换论文已有的章节（不提交）
+
+    Args:
+        paper: 论文，尚未入库时先 flush 以获得ID
+        sections: PDFParser 输出的章节 JSON 字符串或列表
+    """
+    if paper.id is None:
+        db.session.add(paper)
+        db.session.flush()
+    else:
+        PaperSection.query.filter_by(paper_id=paper.id).delete(synchronize_session=False)
+
+    rows = []
+    for ordinal, section in enumerate(parse_sections(sections)):
+        content = section.get('content') or ''
+        rows.append({
+            'paper_id': paper.id,
+            'ordinal': ordinal,
+            'number': section.get('number') or '',
+            'level': section.get('level') or 1,
+            'parent': section.get('parent'),
+            'title': section.get('title') or '',
+            'content': content,
+            'char_count': len(content),
+            'token_count': estimate_tokens(content)
+        })
+    if rows:
+        db.session.execute(db.insert(PaperSection), rows)
+    paper.legacy_sections = ''
+
+
+def migrate_legacy_sections(paper: Paper) -> None:
+    """旧论文的章节还存在 papers.sections 的 JSON 中：首次读取时写入 paper_sections 表并提交"""
+    if not paper.legacy_sections:
+        return
+    replace_sections(paper, paper.legacy_sections)
+    db.session.commit()
+
+
+def load_sections(paper: Paper, limit: Optional[int] = None, content_chars: Optional[int] = None,
+                  token_budget: Optional[int] = None) -> List[Dict]:
+    """
+    按顺序读取论文章节
+
+    Args:
+        paper: 论文
+        limit: 最多读取的章节数
+        content_chars: 内容最多读取的字符数（在数据库中截取），0 表示不读取内容，None 表示完整内容
+        token_budget: 章节标题和内容合计的 token 预算（见 chunker.plan_sections），与 content_chars 同时给出时取较小值
+
+    Returns:
+        List[Dict]: 与 PDFParser 输出结构相同的章节列表（number, title, level, parent, content）
+    """
+    migrate_legacy_sections(paper)
+
+    if token_budget is not None:
+        return _load_within_budget(paper, limit, content_chars, token_budget)
+
+    if content_chars is None:
+        content = PaperSection.content
+    elif content_chars > 0:
+        content = db.func.substr(PaperSection.content, 1, content_chars)
+    else:
+        content = db.literal('')
+
+    query = db.session.query(
+        PaperSection.number,
+        PaperSection.title,
+        PaperSection.level,
+        PaperSection.parent,
+        content.label('content')
+    ).filter_by(paper_id=paper.id).order_by(PaperSection.ordinal)
+    if limit:
+        query = query.limit(limit)
+
+    return [
+        {'number': number, 'title': title, 'level': level, 'parent': parent, 'content': text or ''}
+        for number, title, level, parent, text in query.all()
+    ]
+
+
+def _load_within_budget(paper: Paper, limit: Optional[int], content_chars: Optional[int],
+                        token_budget: int) -> List[Dict]:
+    """
+    按 token 预算读取章节：先读取标题和每个章节保存的 token 数规划截取长度，
+    再在数据库中按各自的长度截取内容，不读取预算之外的内容
+
+    字符数按章节的平均 token 密度换算，结果可能略超预算，组织提示词时再由 chunker.pack_sections 精确截取。
+    """
+    query = db.session.query(
+        PaperSection.ordinal,
+        PaperSection.number,
+        PaperSection.title,
+        PaperSection.char_count,
+        PaperSection.token_count
+    ).filter_by(paper_id=paper.id).order_by(PaperSection.ordinal)
+    if limit:
+        query = query.limit(limit)
+    rows = query.all()
+
+    # 旧数据没有保存 token 数时按汉字密度估计上限
+    contents = []
+    for _, _, _, char_count, token_count in rows:
+        tokens = token_count if token_count is not None else int((char_count or 0) * CJK_TOKENS_PER_CHAR) + 1
+        if content_chars is not None and char_count:
+            tokens = tokens * min(content_chars, char_count) // char_count
+        contents.append(tokens)
+
+    allotted = plan_sections([section_header_tokens(number, title) for _, number, title, _, _ in rows],
+                             contents, token_budget)
+    if not allotted:
+        return []
+
+    limits = {}
+    for (ordinal, _, _, char_count, token_count), share, tokens in zip(rows, allotted, contents):
+        chars = char_count or 0
+        if content_chars is not None:
+            chars = min(chars, content_chars)
+        # 按平均密度换算为字符数
+        limits[ordinal] = chars if share >= tokens else chars * share // max(tokens, 1)
+
+    last_ordinal = rows[len(allotted) - 1][0]
+    content = db.func.substr(PaperSection.content, 1, db.case(limits, value=PaperSection.ordinal, else_=0))
+    selected = db.session.query(
+        PaperSection.number,
+        PaperSection.title,
+        PaperSection.level,
+        PaperSection.parent,
+        content
+    ).filter(
+        PaperSection.paper_id == paper.id,
+        PaperSection.ordinal <= last_ordinal
+    ).order_by(PaperSection.ordinal)
+
+    return [
+        {'number': number, 'title': title, 'level': level, 'parent': parent, 'content': text or ''}
+        for number, title, level, parent, text in selected.all()
+    ]
+
+
+def load_outline(paper: Paper, preview_chars: int = 300) -> List[Dict]:
+    """
+    论文大纲：全部章节的结构和内容预览，完整内容按需通过 load_section 读取
+
+    章节数量不受限制，大纲只带每个章节内容的前 preview_chars 个字符，响应大小与正文长度无关。
+
+    Returns:
+        List[Dict]: ordinal, number, title, level, parent, content（预览）, charCount
+    """
+    migrate_legacy_sections(paper)
+
+    query = db.session.query(
+        PaperSection.ordinal,
+        PaperSection.number,
+        PaperSection.title,
+        PaperSection.level,
+        PaperSection.parent,
+        db.func.substr(PaperSection.content, 1, preview_chars),
+        PaperSection.char_count
+    ).filter_by(paper_id=paper.id).order_by(PaperSection.ordinal)
+
+    return [
+        {
+            'ordinal': ordinal,
+            'number': number,
+            'title': title,
+            'level': level,
+            'parent': parent,
+            'content': preview or '',
+            'charCount': char_count or 0
+        }
+        for ordinal, number, title, level, parent, preview, char_count in query.all()
+    ]
+
+
+def load_section(paper: Paper, ordinal: int) -> Optional[Dict]:
+    """读取单个章节的完整内容，不存在时返回 None"""
+    migrate_legacy_sections(paper)
+
+    section = PaperSection.query.filter_by(paper_id=paper.id, ordinal=ordinal).first()
+    if not section:
+        return None
+    return {
+        'ordinal': section.ordinal,
+        'number': section.number,
+        'title': section.title,
+        'level': section.level,
+        'parent': section.parent,
+        'content': section.content or '',
+        'charCount': section.char_count or 0
+    }
+
+
+def dump_sections(paper: Paper) -> str:
+    """论文全部章节的 JSON 字符串（写入解析结果缓存用）"""
+    return json.dumps(load_sections(paper), ensure_ascii=False)
@@ -0,0 +1,140 @@
+"""
+文本规范化：PDF页面文本清理、章节内容清理、翻译前的乱码行过滤
+
+正则全部预编译；控制字符等零散出现的字符逐个匹配（字符类不加 +，比贪婪匹配连续字符快）。
+按 Unicode 类别删除字符使用 str.translate 映射表，映射表按需计算并缓存，每个字符只判断一次，
+只对含不可打印字符的行执行。
+固定范围的控制字符仍用字符类正则删除：str.translate 只对纯 ASCII 文本有快速路径，
+含中文的页面逐字符查表反而比 re.sub 慢。
+结果与 PDFParser 和 AIGenerator 中原来逐字符循环的实现一致。
+"""
+import re
+import unicodedata
+from itertools import groupby
+from typing import Callable, Iterable, List
+
+
+class _CachedTable(dict):
+    """
+    str.translate 映射表：未出现过的字符按 keep 判断后写入缓存
+
+    keep(ch) 为 False 的字符映射为 None（删除），否则映射为自身。
+    """
+
+    def __init__(self, keep: Callable[[str], bool]):
+        super().__init__()
+        self._keep = keep
+
+    def __missing__(self, code: int):
+        value = code if self._keep(chr(code)) else None
+        self[code] = value
+        return value
+
+
+# PDF常见的乱码：C0、C1控制字符，保留换行、制表符和回车
+_PDF_CONTROL_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]')
+_NEWLINE_RUNS = re.compile(r'[\n\r]+')
+_MEANINGFUL = re.compile(r'[a-zA-Z0-9\u4e00-\u9fff]')
+
+# 章节内容：删除除换行、制表符外的所有 Unicode 控制类字符（类别 C*）
+_CONTENT_TABLE = _CachedTable(lambda ch: unicodedata.category(ch)[0] != 'C' or ch in '\n\t')
+
+# 乱码行过滤
+_SPECIAL_CHARS = re.compile(r'[\x00-\x1f\ufffd]')
+_UNREADABLE_CHARS = re.compile(r'[^\w\u4e00-\u9fff]|_')
+_SYMBOL_LINE = re.compile(r'^[\d\s\-\+\=\.\/\|\\\(\)\[\]\{\}<>]+$')
+_ARTIFACT_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f\ufffd]')
+
+
+def clean_pdf_text(text: str, keep_lines: bool = False) -> str:
+    """
+    清理PDF提取的文本，处理常见的编码问题
+
+    Args:
+        text: 原始文本，可以是单页，也可以是多页用换行拼接后的整体（keep_lines=True 时结果相同，只是没有空行）
+        keep_lines: 是否保留换行；默认把换行合并为空格
+
+    Returns:
+        str: 清理后的文本，只保留包含字母、数字或中文的行
+    """
+    if not text:
+        return ""
+
+    text = _PDF_CONTROL_CHARS.sub('', text)
+    text = text.replace('\u3000', ' ').replace('\xa0', ' ')
+
+    if not keep_lines:
+        # 换行全部合并为空格后只剩一行
+        line = _NEWLINE_RUNS.sub(' ', text).strip()
+        return line if _MEANINGFUL.search(line) else ""
+
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    lines = [line.strip() for line in text.split('\n')]
+    return '\n'.join([line for line in lines if _MEANINGFUL.search(line)])
+
+
+def clean_pages(texts: Iterable[str]) -> str:
+    """批量清理多页原始文本：拼接后整体清理一次，按行返回（空页不产生空行）"""
+    return clean_pdf_text('\n'.join(texts), keep_lines=True)
+
+
+def clean_content(content: str, max_length: int = 5000) -> str:
+    """
+    清理章节内容：删除控制字符，段落内的行用空格连接，段落之间用空行分隔
+
+    Args:
+        content: 原始内容文本
+        max_length: 超过该长度时截断并追加 '...'
+
+    Returns:
+        str: 清理后的内容
+    """
+    if not content:
+        return ""
+
+    content = content.replace('\u3000', ' ').replace('\xa0', ' ')
+
+    # 只有含不可打印字符（控制字符、制表符、特殊空白等）的行才需要逐字符查表
+    lines = [
+        (line if line.isprintable() else line.translate(_CONTENT_TABLE)).strip()
+        for line in content.split('\n')
+    ]
+    paragraphs = [' '.join(group) for non_empty, group in groupby(lines, key=bool) if non_empty]
+    result = '\n\n'.join(paragraphs).strip()
+
+    if len(result) > max_length:
+        result = result[:max_length] + '...'
+    return result
+
+
+def filter_readable_lines(text: str) -> List[str]:
+    """
+    过滤页面文本中的乱码行，返回清理后的可读行
+
+    跳过的行：长度不超过1、控制字符和替换字符超过30%、可读字符（字母数字中文）少于30%、
+    只有数字和符号；保留的行删除控制字符和替换字符。
+    """
+    cleaned_lines = []
+    for line in text.split('\n'):
+        line = line.strip()
+        length = len(line)
+        if length <= 1:
+            continue
+
+        if line.isprintable():
+            # 可打印的行不含控制字符，只可能含替换字符
+            special = line.count('\ufffd')
+        else:
+            special = len(_SPECIAL_CHARS.findall(line))
+        if special / length > 0.3:
+            continue
+
+        if len(_UNREADABLE_CHARS.sub('', line)) < length * 0.3:
+            continue
+
+        if _SYMBOL_LINE.match(line):
+            continue
+
+        cleaned_lines.append(_ARTIFACT_CHARS.sub('', line))
+    return cleaned_lines
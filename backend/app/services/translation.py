@@ -0,0 +1,219 @@
+"""
+论文翻译：按页（没有逐页文本时按章节）拆分为分段，并发翻译后按顺序合并
+
+- 拆分（map）：论文标题、摘要、关键词和每一页各为一段，超出 token 预算
+  （Config.AI_INPUT_TOKEN_BUDGETS['translate']）的页面按行拆分为多段，全文翻译，不截断
+- 翻译：每个分段单独调用模型，最多 TRANSLATE_CONCURRENCY 个同时进行，
+  TRANSLATE_REQUESTS_PER_MINUTE 限制每分钟发起的调用数；每段完成后立即写入 translation_segments 表，
+  客户端通过 /api/chat/translate/<recordId>/segments 逐段读取，不必等待全文完成
+- 合并（reduce）：全部分段结束后按顺序合并为 {originalSections, translatedContent} 写入生成记录
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+from flask import current_app
+from app.models import db, Paper, TranslationSegment
+from app.services import page_store, section_store
+from app.services.ai_generator import AIGenerator
+from app.services.chunker import estimate_tokens, input_budget, split_to_tokens
+from app.services.text_normalize import filter_readable_lines
+
+# 单个分段译文的 max_tokens：原文不超过翻译预算，译文长度与原文相近
+SEGMENT_OUTPUT_TOKENS = 4000
+
+
+class RateLimiter:
+    """
+    限制调用的发起速率（多线程共享）：相邻两次调用的开始时间至少间隔 60 / per_minute 秒
+
+    Args:
+        per_minute: 每分钟最多发起的调用数，0 表示不限制
+    """
+
+    def __init__(self, per_minute: int):
+        self._interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self) -> None:
+        """等待到允许发起下一次调用"""
+        if not self._interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self._interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def build_segments(paper: Paper, budget: Optional[int] = None) -> List[Dict]:
+    """
+    把论文拆分为翻译分段
+
+    Args:
+        paper: 论文
+        budget: 每个分段原文的 token 预算，默认 input_budget('translate', output_tokens=SEGMENT_OUTPUT_TOKENS)
+
+    Returns:
+        List[Dict]: 按顺序排列的 {title, content}
+    """
+    if budget is None:
+        budget = input_budget('translate', output_tokens=SEGMENT_OUTPUT_TOKENS)
+
+    parts = []
+    if paper.title:
+        parts.append(('论文标题', paper.title))
+    if paper.abstract:
+        parts.append(('摘要', paper.abstract))
+    if paper.keywords:
+        parts.append(('关键词', paper.keywords))
+
+    # 使用解析时存储的逐页文本（不再重新打开PDF）
+    has_pages = False
+    if page_store.has_pages(paper):
+        for page_number, text in page_store.iter_pages(paper):
+            # 过滤乱码行（控制字符、替换字符过多或只有数字符号的行）
+            page_content = '\n'.join(filter_readable_lines(text or ''))
+            if len(page_content) > 30:
+                parts.append((f'第{page_number}页', page_content))
+                has_pages = True
+    else:
+        page_store.load_pages(paper, limit=1)  # 没有逐页文本时请求后台补齐，本次按章节翻译
+
+    if not has_pages:
+        print(f"[WARNING] 论文没有可用的逐页文本，按章节翻译: paper_id={paper.id}")
+        for section in section_store.load_sections(paper):
+            title = section.get('title') or ''
+            header = f"{section['number']} {title}" if section.get('number') else title
+            if header or section.get('content'):
+                parts.append((header, section.get('content') or ''))
+
+    segments = []
+    for title, content in parts:
+        pieces = split_to_tokens(content, budget) or ['']
+        for index, piece in enumerate(pieces, 1):
+            segment_title = f'{title}（{index}/{len(pieces)}）' if len(pieces) > 1 else title
+            segments.append({'title': segment_title, 'content': piece})
+    return segments
+
+
+def translate_record(record_id: int, paper: Paper, model: str, target_lang: str = 'zh',
+                     progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+    """
+    翻译论文并逐段写入 translation_segments（每段完成后提交）
+
+    记录已有分段时（任务重新执行）沿用已完成的分段，只翻译其余分段。
+
+    Args:
+        record_id: 翻译的生成记录ID
+        paper: 论文
+        model: 模型名称
+        target_lang: 目标语言，'zh'为中文，'en'为英文
+        progress: 进度回调 (已结束的分段数, 分段总数)，如 job_queue.ProgressReporter
+
+    Returns:
+        Dict: {originalSections, translatedContent}，与逐段读取的结果一致
+
+    Raises:
+        ValueError: 论文没有可翻译的内容，或全部分段都翻译失败
+    """
+    segments = TranslationSegment.query.filter_by(record_id=record_id).order_by(TranslationSegment.ordinal).all()
+    if not segments:
+        segments = [
+            TranslationSegment(record_id=record_id, ordinal=ordinal, title=segment['title'],
+                               source=segment['content'], status='pending')
+            for ordinal, segment in enumerate(build_segments(paper))
+        ]
+        if not segments:
+            raise ValueError('论文没有可翻译的内容')
+        db.session.add_all(segments)
+        db.session.commit()
+
+    total = len(segments)
+    todo = [(segment.id, segment.title, segment.source) for segment in segments if segment.status != 'completed']
+    finished = total - len(todo)
+    print(f"[DEBUG] 翻译开始 - record_id={record_id}, 分段: {total}, 待翻译: {len(todo)}, "
+          f"原文约 {sum(estimate_tokens(segment.source) for segment in segments)} tokens")
+    if progress:
+        progress(finished, total)
+
+    start_time = time.time()
+    concurrency = max(1, int(current_app.config.get('TRANSLATE_CONCURRENCY', 4)))
+    limiter = RateLimiter(int(current_app.config.get('TRANSLATE_REQUESTS_PER_MINUTE', 0)))
+    app = current_app._get_current_object()
+
+    if todo:
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(todo)), thread_name_prefix='translate') as executor:
+            # 按顺序提交，前面的页面先完成
+            futures = {
+                executor.submit(_translate_one, app, limiter, title, source, target_lang, model): segment_id
+                for segment_id, title, source in todo
+            }
+            for future in as_completed(futures):
+                segment = db.session.get(TranslationSegment, futures[future])
+                try:
+                    segment.translated = future.result()
+                    segment.status = 'completed'
+                    segment.error_message = ''
+                except Exception as e:
+                    print(f"[DEBUG] 分段翻译失败: record_id={record_id}, {segment.title}: {str(e)}")
+                    segment.status = 'failed'
+                    segment.error_message = str(e)
+                db.session.commit()
+
+                finished += 1
+                if progress:
+                    progress(finished, total)
+
+    segments = TranslationSegment.query.filter_by(record_id=record_id).order_by(TranslationSegment.ordinal).all()
+    failed = sum(1 for segment in segments if segment.status != 'completed')
+    print(f"[DEBUG] 翻译完成 - record_id={record_id}, 分段: {total}, 失败: {failed}, 耗时: {time.time() - start_time:.2f}秒")
+    if failed == total:
+        raise ValueError(f'全部 {total} 个分段翻译失败: {segments[0].error_message}')
+    return merge_segments(segments)
+
+
+def _translate_one(app, limiter: RateLimiter, title: str, source: str, target_lang: str, model: str) -> str:
+    """在线程池中翻译一个分段（不访问数据库）"""
+    if not source.strip():
+        return source
+    limiter.wait()
+    with app.app_context():
+        return AIGenerator().translate_segment(title, source, target_lang, model=model,
+                                               max_tokens=SEGMENT_OUTPUT_TOKENS)
+
+
+def merge_segments(segments: List[TranslationSegment]) -> Dict:
+    """
+    按顺序合并分段（reduce）
+
+    Returns:
+        Dict: originalSections 为 [{title, content}]，translatedContent 为按【标题】分段的译文，
+              未完成或失败的分段标记为未翻译
+    """
+    original_sections, translated_parts = [], []
+    for segment in segments:
+        original_sections.append({'title': segment.title, 'content': segment.source or ''})
+        if segment.status == 'completed':
+            translated = segment.translated or ''
+        elif segment.status == 'failed':
+            translated = '（此部分翻译失败）'
+        else:
+            translated = '（翻译中...）'
+        translated_parts.append(f"【{segment.title}】\n{translated}")
+
+    return {
+        'originalSections': original_sections,
+        'translatedContent': '\n\n'.join(translated_parts)
+    }
+
+
+def segment_progress(record_id: int) -> Tuple[int, int]:
+    """翻译进度：(已结束的分段数, 分段总数)，分段尚未拆分时总数为 0"""
+    rows = db.session.query(TranslationSegment.status, db.func.count()).filter_by(
+        record_id=record_id
+    ).group_by(TranslationSegment.status).all()
+    counts = dict(rows)
+    return counts.get('completed', 0) + counts.get('failed', 0), sum(counts.values())
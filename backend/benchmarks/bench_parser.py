@@ -0,0 +1,305 @@
+"""
+PDF解析基准测试（合成论文语料）
+
+离线生成 1/10/50/200 页、单栏/双栏、拉丁文/中文的合成论文PDF（见 synthetic_pdf.py），
+对每份文档分阶段计时 PDFParser：
+    extraction  pdfplumber 逐页提取原始文本（iter_raw_pages，每页提取后释放缓存）
+    cleaning    逐页清理（clean_pdf_text，元数据用）和整篇批量清理（clean_pages，章节用）
+    date        在清理后的页面流上增量匹配日期（_DateScanner）
+    sections    章节识别，包含层级检测和父子关系分配（_extract_sections，不限数量）
+    hierarchy   单独计时层级检测和父子关系分配
+    parse       完整 parse()（AI调用替换为立即返回的桩，不访问网络）
+输出每个阶段的耗时、页/秒和峰值内存。峰值内存单独执行一次测量：
+    rss          在 fork 出的子进程中执行，取 ru_maxrss 相对开始时的增量（默认，不影响速度）
+    tracemalloc  Python 分配的峰值增量，更精确但会使 pdfplumber 慢数倍
+
+结果以JSON输出，可保存后与下一个版本比较：
+    python benchmarks/bench_parser.py --output bench-v2.json
+    python benchmarks/bench_parser.py --compare bench-v2.json [--tolerance 0.2]
+比较时任一阶段的页/秒下降超过 tolerance，退出码为 1。
+
+用法（在 backend 目录下）：
+    python benchmarks/bench_parser.py [--sizes 1,10,50,200] [--repeat 1] [--memory rss|tracemalloc|none]
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from types import SimpleNamespace
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.services import pdf_parser  # noqa: E402
+from app.services.pdf_parser import PDFParser, _DateScanner  # noqa: E402
+from app.services.text_normalize import clean_pages, clean_pdf_text  # noqa: E402
+from synthetic_pdf import generate_pdf  # noqa: E402
+
+STAGES = ['extraction', 'cleaning', 'date', 'sections', 'hierarchy', 'parse']
+# 需要打开PDF的阶段按 --repeat 重复；其余阶段只需毫秒级，至少重复 5 次以减小抖动
+HEAVY_STAGES = {'extraction', 'parse'}
+
+
+# ========== AI调用桩 ==========
+
+class _StubCompletions:
+    """按提示词返回固定的元数据JSON，模拟模型调用但不访问网络"""
+
+    RESPONSE = json.dumps({
+        'title': 'A Synthetic Study of Document Parsing Performance',
+        'authors': ['Alice Zhang', 'Bob Li', 'Carol Wang'],
+        'abstract': 'Synthetic abstract.',
+        'keywords': ['parsing', 'benchmark'],
+        'category': '计算机科学'
+    }, ensure_ascii=False)
+
+    def create(self, **kwargs):
+        message = SimpleNamespace(content=self.RESPONSE)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+STUB_CLIENT = SimpleNamespace(chat=SimpleNamespace(completions=_StubCompletions()))
+
+
+# ========== 各阶段 ==========
+
+def _quiet(func, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+def build_stages(path: str):
+    """
+    返回 (阶段名 -> 无参函数)；后一阶段的输入由前一阶段预先算好，各阶段可以单独重复执行
+
+    解析器的内存抽样（PageMemorySampler）会重置 tracemalloc 峰值，这里关闭它，
+    只有 parse 阶段使用默认配置，反映线上的实际开销。
+    """
+    parser = PDFParser(path, memory_budget=0)
+    raw_pages = _quiet(lambda: [text for _, text in parser.iter_raw_pages()])
+    cleaned_pages = [clean_pdf_text(text) for text in raw_pages]
+    section_text = clean_pages(raw_pages)
+    sections = json.loads(_quiet(parser._extract_sections, section_text, None))
+
+    def extraction():
+        return _quiet(lambda: [text for _, text in parser.iter_raw_pages()])
+
+    def cleaning():
+        for text in raw_pages:
+            clean_pdf_text(text)
+        return clean_pages(raw_pages)
+
+    def date():
+        scanner = _DateScanner()
+        for text in cleaned_pages:
+            if scanner.done:
+                break
+            scanner.feed(text)
+        return scanner.finish()
+
+    def extract_sections():
+        return _quiet(parser._extract_sections, section_text, None)
+
+    def hierarchy():
+        items = [{'number': s['number'], 'title': s['title']} for s in sections]
+        for item in items:
+            item['level'] = parser._detect_section_hierarchy(item['number'])
+        return parser._assign_parent_relationships(items)
+
+    def parse():
+        full_parser = PDFParser(path, memory_budget=0 if tracemalloc.is_tracing() else 256 * 1024 * 1024)
+        return _quiet(full_parser.parse)
+
+    stages = {
+        'extraction': extraction,
+        'cleaning': cleaning,
+        'date': date,
+        'sections': extract_sections,
+        'hierarchy': hierarchy,
+        'parse': parse,
+    }
+    return stages, len(raw_pages), len(sections)
+
+
+def time_stage(func, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def peak_memory(func, method: str):
+    """单独执行一次，返回该阶段的峰值新增内存（字节）；method 为 none 时返回 None"""
+    if method == 'tracemalloc':
+        tracemalloc.start()
+        try:
+            baseline = tracemalloc.get_traced_memory()[0]
+            func()
+            return tracemalloc.get_traced_memory()[1] - baseline
+        finally:
+            tracemalloc.stop()
+    if method == 'rss':
+        return _peak_rss(func)
+    return None
+
+
+def _peak_rss(func):
+    """在 fork 出的子进程中执行，返回 ru_maxrss 的增量（字节）；子进程出错时返回 None"""
+    # Linux 的 ru_maxrss 单位是 KB，macOS 是字节
+    scale = 1 if sys.platform == 'darwin' else 1024
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        code = 0
+        try:
+            before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            func()
+            after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            os.write(write_fd, str((after - before) * scale).encode())
+        except BaseException:
+            code = 1
+        finally:
+            os._exit(code)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd) as pipe:
+        output = pipe.read()
+    _, status = os.waitpid(pid, 0)
+    return int(output) if status == 0 and output else None
+
+
+# ========== 运行与比较 ==========
+
+def run(sizes, repeat: int, memory_method: str, workdir: str):
+    results = []
+    for script in ('latin', 'cjk'):
+        for columns in (1, 2):
+            for num_pages in sizes:
+                name = f'{script}-{columns}col-{num_pages}p'
+                path = os.path.join(workdir, f'{name}.pdf')
+                generate_pdf(path, num_pages, columns, script)
+                with open(path, 'rb') as f:
+                    digest = hashlib.sha256(f.read()).hexdigest()
+
+                stages, pages, section_count = build_stages(path)
+                entry = {
+                    'document': name,
+                    'script': script,
+                    'columns': columns,
+                    'pages': pages,
+                    'file_bytes': os.path.getsize(path),
+                    'sha256': digest,
+                    'sections': section_count,
+                    'stages': {}
+                }
+                for stage in STAGES:
+                    seconds = time_stage(stages[stage], repeat if stage in HEAVY_STAGES else max(repeat, 5))
+                    entry['stages'][stage] = {
+                        'seconds': round(seconds, 6),
+                        'pages_per_sec': round(pages / seconds, 2) if seconds > 0 else None,
+                        'peak_bytes': peak_memory(stages[stage], memory_method)
+                    }
+                results.append(entry)
+                print(_format_entry(entry), file=sys.stderr)
+    return results
+
+
+def _format_entry(entry) -> str:
+    parts = []
+    for stage in STAGES:
+        data = entry['stages'][stage]
+        memory = f"/{data['peak_bytes'] / 1024 / 1024:.1f}MB" if data['peak_bytes'] is not None else ''
+        parts.append(f"{stage} {data['pages_per_sec']:.0f}p/s{memory}")
+    return f"{entry['document']:<20} " + '  '.join(parts)
+
+
+def compare(current, baseline, tolerance: float) -> int:
+    """逐文档逐阶段比较页/秒，返回下降超过 tolerance 的数量（语料不同的文档跳过）"""
+    previous = {entry['document']: entry for entry in baseline['results']}
+    regressions = 0
+    for entry in current['results']:
+        old = previous.get(entry['document'])
+        if not old or old.get('sha256') != entry['sha256']:
+            continue
+        for stage in STAGES:
+            new_rate = entry['stages'][stage]['pages_per_sec']
+            old_rate = old['stages'].get(stage, {}).get('pages_per_sec')
+            if not new_rate or not old_rate:
+                continue
+            ratio = new_rate / old_rate
+            flag = ''
+            if ratio < 1 - tolerance:
+                regressions += 1
+                flag = '  <-- 变慢'
+            print(f"{entry['document']:<20} {stage:<11} {old_rate:10.1f} -> {new_rate:10.1f} p/s "
+                  f"({ratio:.2f}x){flag}", file=sys.stderr)
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='PDF解析基准测试（合成论文语料）')
+    arg_parser.add_argument('--sizes', default='1,10,50,200', help='页数列表，逗号分隔')
+    arg_parser.add_argument('--repeat', type=int, default=1, help='提取和完整解析的重复次数，取最快一次')
+    arg_parser.add_argument('--memory', choices=['rss', 'tracemalloc', 'none'], default='rss',
+                            help='峰值内存的测量方式（tracemalloc 会使提取慢数倍）')
+    arg_parser.add_argument('--output', help='结果JSON写入该文件（默认输出到标准输出）')
+    arg_parser.add_argument('--compare', help='与之前保存的结果JSON比较')
+    arg_parser.add_argument('--tolerance', type=float, default=0.2, help='比较时允许的页/秒下降比例')
+    args = arg_parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+
+    # parse 阶段的AI调用使用桩客户端
+    pdf_parser.get_client = lambda: STUB_CLIENT
+
+    with tempfile.TemporaryDirectory() as workdir:
+        memory_method = args.memory
+        if memory_method == 'rss' and (resource is None or not hasattr(os, 'fork')):
+            memory_method = 'tracemalloc'
+        results = run(sizes, max(1, args.repeat), memory_method, workdir)
+
+    report = {
+        'benchmark': 'pdf_parser',
+        'parser_version': PDFParser.VERSION,
+        'created_at': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'memory_method': memory_method,
+        'results': results
+    }
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        print(f'比较完成：{regressions} 个阶段变慢超过 {args.tolerance:.0%}', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
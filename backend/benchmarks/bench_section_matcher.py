@@ -0,0 +1,208 @@
+"""
+章节标题识别基准测试
+
+对比旧实现（每行依次 re.match 七个模式，命中后再用六个未编译正则规范化序号）
+与 PDFParser._classify_heading 的单次合并匹配：
+1. 在固定种子生成的语料上逐行比对识别结果，并比对 _extract_sections 的完整输出
+2. 输出两种实现的耗时和加速比
+
+用法（在 backend 目录下）：
+    python benchmarks/bench_section_matcher.py [--lines 10000] [--repeat 5]
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.pdf_parser import PDFParser  # noqa: E402
+
+
+# ========== 旧实现（参照） ==========
+
+LEGACY_SECTION_PATTERNS = [
+    r'^(\d+(?:\.\d+)*)\.\s+(.+)$',
+    r'^(\d+)\s+(.+)$',
+    r'^([一二三四五六七八九十]+)[、.]\s*(.+)$',
+    r'^([IVXLCDM]+)\.\s+(.+)$',
+    r'^[\(\[](\d+)[\]\)]\s*(.+)$',
+    r'^[\(\[]?([a-zA-Z])[\]\)]?\.\s*(.+)$',
+    r'^([A-Z]{3,})\s*(?:[：:]?\s*(.+))?$',
+]
+
+
+def legacy_normalize_section_number(parser, line):
+    match = re.match(r'^(\d+(?:\.\d+)*)\.\s+(.+)$', line)
+    if match:
+        return match.group(1), match.group(2)
+    match = re.match(r'^[\(\[](\d+)[\]\)]\s*(.+)$', line)
+    if match:
+        return match.group(1), match.group(2)
+    match = re.match(r'^([IVXLCDM]+)\.\s+(.+)$', line)
+    if match:
+        roman_num = match.group(1)
+        if parser._is_valid_roman(roman_num):
+            return roman_num, match.group(2)
+    match = re.match(r'^([一二三四五六七八九十]+)[、.]\s*(.+)$', line)
+    if match:
+        return str(parser._chinese_to_arabic(match.group(1))), match.group(2)
+    match = re.match(r'^([A-Z]{3,})\s*(?:[：:]?\s*(.+))?$', line)
+    if match:
+        title = match.group(2) if match.group(2) else match.group(1)
+        return match.group(1), title
+    match = re.match(r'^[\(\[]?([a-zA-Z])[\]\)]?\.\s*(.+)$', line)
+    if match:
+        return match.group(1), match.group(2)
+    return None, line
+
+
+def legacy_classify_heading(parser, line):
+    for pattern in LEGACY_SECTION_PATTERNS:
+        match = re.match(pattern, line)
+        if match:
+            if len(match.groups()) >= 2 and match.group(2):
+                section_number, section_title = legacy_normalize_section_number(parser, line)
+            else:
+                section_number = match.group(1) if match.group(1) else None
+                section_title = match.group(1) if match.group(1) else line
+            if section_title and len(section_title) >= 2:
+                return section_number, section_title
+    return None
+
+
+class LegacyParser(PDFParser):
+    """只替换标题识别，其余流程与当前 _extract_sections 相同"""
+
+    def _classify_heading(self, line):
+        return legacy_classify_heading(self, line)
+
+
+# ========== 语料 ==========
+
+EDGE_CASES = [
+    '1. Introduction', '1.1 Background', '1.2.3. Details here', '2 Related Work', '1. A',
+    '12', '3.', '(1) First', '[2] Second item', '(3)x', '[a] bracket letter', '(b). Point',
+    'I. Introduction', 'IV. Results', 'IIII. Invalid', 'IC. Invalid roman', 'MCMXC. Year',
+    'VX. Odd', 'IIC. Upper fallback', 'MM. Short', 'I. A', 'X.  Trailing',
+    '一、引言', '二. 相关工作', '十一、总结', '十、', '三、x',
+    'INTRODUCTION', 'ABSTRACT: text', 'RELATED WORK', 'CONCLUSIONS：结论', 'CNN', 'AB',
+    'ABC:', 'ABC: x', 'LSTM based models', 'IEEE. Conference',
+    'A. First point', 'a. lower', 'B) nothing', 'Z.x', 'e.g. something', 'i.e. that',
+    'Fig. 3 shows', 'Table 2. Results', 'the model is trained', '  ', '',
+    '2023年5月1日', '1\tTabbed', '1.　全角空格', '(12) twelve', '[IV] roman bracket',
+]
+
+WORDS = ('the model data learning results method training network paper proposed '
+         'approach performance analysis 模型 数据 方法 实验 结果 分析 研究').split()
+
+
+def _sentence(rng, low=4, high=16):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def build_corpus(num_lines: int, seed: int = 20240601) -> str:
+    """生成论文风格的文本：正文行为主，夹杂各种格式的标题、参考文献和边界情况"""
+    rng = random.Random(seed)
+    lines = ['A Study of Things', 'Author One, Author Two', 'Abstract', _sentence(rng),
+             'Keywords: a, b', 'Introduction']
+    roman = ['I', 'II', 'III', 'IV', 'V', 'VI', 'VII', 'VIII', 'IX', 'X']
+    chinese = ['一', '二', '三', '四', '五', '六', '七', '八', '九', '十']
+    section = 0
+    while len(lines) < num_lines:
+        roll = rng.random()
+        if roll < 0.70:
+            lines.append(_sentence(rng))
+        elif roll < 0.75:
+            section += 1
+            lines.append(f'{section}. {_sentence(rng, 1, 3)}')
+        elif roll < 0.80:
+            lines.append(f'{max(section, 1)}.{rng.randint(1, 9)} {_sentence(rng, 1, 3)}')
+        elif roll < 0.83:
+            lines.append(f'{rng.choice(roman)}. {_sentence(rng, 1, 3)}')
+        elif roll < 0.86:
+            lines.append(f'{rng.choice(chinese)}、{_sentence(rng, 1, 3)}')
+        elif roll < 0.90:
+            lines.append(f'[{rng.randint(1, 60)}] {_sentence(rng, 6, 12)}')
+        elif roll < 0.93:
+            lines.append(f'{rng.randint(1, 400)} {_sentence(rng)}')
+        elif roll < 0.95:
+            lines.append(rng.choice(['RESULTS', 'DISCUSSION', 'METHODS: overview', 'CNN']))
+        else:
+            lines.append(rng.choice(EDGE_CASES))
+    return '\n'.join(lines)
+
+
+def load_repo_pdf_text() -> str:
+    """仓库自带的任务书PDF（如果存在）按页拼接的原始文本"""
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    for name in os.listdir(root):
+        if name.lower().endswith('.pdf'):
+            return '\n'.join(text for _, text in PDFParser(os.path.join(root, name)).iter_raw_pages())
+    return ''
+
+
+# ========== 比对与计时 ==========
+
+def check_equivalence(parser, legacy, corpora):
+    mismatches = 0
+    for text in corpora:
+        for line in text.split('\n'):
+            line = line.strip()
+            if legacy_classify_heading(legacy, line) != parser._classify_heading(line):
+                mismatches += 1
+                print(f'  不一致: {line!r}: {legacy_classify_heading(legacy, line)} != {parser._classify_heading(line)}')
+        with contextlib.redirect_stdout(io.StringIO()):
+            if legacy._extract_sections(text) != parser._extract_sections(text):
+                mismatches += 1
+                print('  _extract_sections 输出不一致')
+    return mismatches
+
+
+def time_classifier(classify, lines, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for line in lines:
+            classify(line)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='章节标题识别基准测试')
+    arg_parser.add_argument('--lines', type=int, default=10000, help='生成语料的行数')
+    arg_parser.add_argument('--repeat', type=int, default=5, help='重复次数，取最快一次')
+    args = arg_parser.parse_args()
+
+    parser = PDFParser('benchmark.pdf')
+    legacy = LegacyParser('benchmark.pdf')
+
+    corpus = build_corpus(args.lines)
+    corpora = [corpus, '\n'.join(EDGE_CASES)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        repo_text = load_repo_pdf_text()
+    if repo_text:
+        corpora.append(repo_text)
+
+    mismatches = check_equivalence(parser, legacy, corpora)
+    print(f'一致性检查: {sum(len(t.splitlines()) for t in corpora)} 行, 不一致 {mismatches} 处')
+    if mismatches:
+        sys.exit(1)
+
+    lines = [line.strip() for line in corpus.split('\n') if line.strip()]
+    legacy_time = time_classifier(lambda line: legacy_classify_heading(legacy, line), lines, args.repeat)
+    new_time = time_classifier(parser._classify_heading, lines, args.repeat)
+
+    print(f'逐行识别 {len(lines)} 行:')
+    print(f'  旧实现: {legacy_time * 1000:.1f} ms')
+    print(f'  新实现: {new_time * 1000:.1f} ms')
+    print(f'  加速比: {legacy_time / new_time:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+"""
+文本清理基准测试
+
+对比旧实现（多次 re.sub、逐字符 unicodedata.category 循环、逐字符统计乱码比例）
+与 app.services.text_normalize 中预编译正则和缓存 str.translate 映射表的实现：
+1. 在论文语料上逐页比对三个清理函数的输出，并比对整篇批量清理与逐页清理后拼接的章节提取结果
+2. 输出每个函数两种实现的吞吐量（MB/s，按输入文本的 UTF-8 字节数计算）
+
+语料为仓库自带的任务书PDF、--pdf-dir 目录下的所有PDF（例如 uploads/blobs），
+以及固定种子生成的夹杂控制字符、替换字符和全角空格的合成页面。
+
+用法（在 backend 目录下）：
+    python benchmarks/bench_text_normalize.py [--pdf-dir uploads/blobs] [--repeat 5]
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import re
+import sys
+import time
+import unicodedata
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.pdf_parser import PDFParser  # noqa: E402
+from app.services import text_normalize  # noqa: E402
+
+
+# ========== 旧实现（参照） ==========
+
+def legacy_clean_pdf_text(text, keep_lines=False):
+    if not text:
+        return ""
+    text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]', '', text)
+    if not keep_lines:
+        text = re.sub(r'[\x01-\x07\n\r]+', ' ', text)
+    text = text.replace('\u3000', ' ')
+    text = text.replace('\xa0', ' ')
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    cleaned_lines = []
+    for line in text.split('\n'):
+        line = line.strip()
+        if re.search(r'[a-zA-Z0-9\u4e00-\u9fff]', line):
+            cleaned_lines.append(line)
+    return '\n'.join(cleaned_lines)
+
+
+def legacy_clean_content(content):
+    if not content:
+        return ""
+    content = content.replace('\u3000', ' ')
+    content = content.replace('\xa0', ' ')
+    cleaned_chars = []
+    for char in content:
+        if unicodedata.category(char)[0] != 'C' or char in '\n\t':
+            cleaned_chars.append(char)
+    content = ''.join(cleaned_chars)
+    content = content.replace('\r\n', '\n').replace('\r', '\n')
+    lines = [line.strip() for line in content.split('\n')]
+    cleaned_lines = []
+    prev_empty = False
+    for line in lines:
+        if not line:
+            if not prev_empty:
+                cleaned_lines.append('')
+            prev_empty = True
+        else:
+            cleaned_lines.append(line)
+            prev_empty = False
+    result_paragraphs = []
+    current_paragraph = []
+    for line in cleaned_lines:
+        if not line:
+            if current_paragraph:
+                result_paragraphs.append(' '.join(current_paragraph))
+                current_paragraph = []
+        else:
+            current_paragraph.append(line)
+    if current_paragraph:
+        result_paragraphs.append(' '.join(current_paragraph))
+    result = '\n\n'.join(result_paragraphs).strip()
+    if len(result) > 5000:
+        result = result[:5000] + '...'
+    return result
+
+
+def legacy_filter_readable_lines(text):
+    cleaned_lines = []
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line or len(line) <= 1:
+            continue
+        special_char_ratio = sum(1 for c in line if ord(c) < 32 or ord(c) == 65533) / len(line)
+        if special_char_ratio > 0.3:
+            continue
+        readable_chars = sum(1 for c in line if c.isalnum() or '\u4e00' <= c <= '\u9fff')
+        if readable_chars < len(line) * 0.3:
+            continue
+        if re.match(r'^[\d\s\-\+\=\.\/\|\\\(\)\[\]\{\}<>]+$', line):
+            continue
+        line = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f\ufffd]', '', line)
+        cleaned_lines.append(line)
+    return cleaned_lines
+
+
+# ========== 语料 ==========
+
+NOISE = ['\x00', '\x01', '\x07', '\x0b', '\x0c', '\x1f', '\x7f', '\x85', '\x9f', '\ufffd', '\u3000',
+         '\xa0', '\r', '\r\n', '\t', '\u200b', '\ufeff', '\u2028', '\ue000', '\U0001d400', '\xad']
+
+WORDS = ('the model data learning results method training network paper proposed approach '
+         'performance analysis 模型 数据 方法 实验 结果 分析 研究 Ω α β ∑ ≤ — “quoted” '
+         '12.5% (3) [4] {x} <y> | / = + -').split()
+
+
+def synthetic_pages(num_pages: int, seed: int = 20240607):
+    """生成带噪声的页面：正文行为主，夹杂控制字符、乱码行、纯符号行和空行"""
+    rng = random.Random(seed)
+    pages = []
+    for _ in range(num_pages):
+        lines = []
+        for _ in range(rng.randint(30, 60)):
+            roll = rng.random()
+            if roll < 0.70:
+                words = [rng.choice(WORDS) for _ in range(rng.randint(3, 18))]
+                for _ in range(rng.randint(0, 2)):
+                    words.insert(rng.randrange(len(words) + 1), rng.choice(NOISE))
+                lines.append(' '.join(words))
+            elif roll < 0.80:
+                lines.append(''.join(rng.choice(NOISE + ['?', '#', 'a']) for _ in range(rng.randint(1, 20))))
+            elif roll < 0.88:
+                lines.append(' '.join(str(rng.randint(0, 999)) for _ in range(rng.randint(1, 8))) + ' - |')
+            elif roll < 0.95:
+                lines.append(rng.choice(['', ' ', '\u3000', 'x', '1']))
+            else:
+                lines.append(f'{rng.randint(1, 9)}. {rng.choice(WORDS)} {rng.choice(WORDS)}')
+        pages.append('\n'.join(lines))
+    return pages
+
+
+def pdf_pages(paths):
+    pages = []
+    for path in paths:
+        with contextlib.redirect_stdout(io.StringIO()):
+            try:
+                pages.extend(text for _, text in PDFParser(path).iter_raw_pages())
+            except Exception as e:
+                print(f'  跳过 {path}: {e}', file=sys.stderr)
+    return pages
+
+
+def find_pdfs(pdf_dir):
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    paths = [os.path.join(root, name) for name in os.listdir(root) if name.lower().endswith('.pdf')]
+    if pdf_dir:
+        for dirpath, _, filenames in os.walk(pdf_dir):
+            paths.extend(os.path.join(dirpath, name) for name in filenames if name.lower().endswith('.pdf'))
+    return paths
+
+
+# ========== 比对与计时 ==========
+
+def check_equivalence(pages):
+    mismatches = 0
+    for page in pages:
+        for keep_lines in (False, True):
+            if legacy_clean_pdf_text(page, keep_lines) != text_normalize.clean_pdf_text(page, keep_lines):
+                mismatches += 1
+                print(f'  clean_pdf_text(keep_lines={keep_lines}) 不一致: {page[:60]!r}')
+        if legacy_clean_content(page) != text_normalize.clean_content(page):
+            mismatches += 1
+            print(f'  clean_content 不一致: {page[:60]!r}')
+        if legacy_filter_readable_lines(page) != text_normalize.filter_readable_lines(page):
+            mismatches += 1
+            print(f'  filter_readable_lines 不一致: {page[:60]!r}')
+
+    # 整篇批量清理只少了空页产生的空行，章节提取结果应相同
+    parser = PDFParser('benchmark.pdf')
+    with contextlib.redirect_stdout(io.StringIO()):
+        per_page = parser._extract_sections('\n'.join(legacy_clean_pdf_text(p, True) for p in pages), None)
+        batched = parser._extract_sections(text_normalize.clean_pages(pages), None)
+    if per_page != batched:
+        mismatches += 1
+        print('  clean_pages 章节提取结果不一致')
+    return mismatches
+
+
+def throughput(func, pages, size_mb, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for page in pages:
+            func(page)
+        best = min(best, time.perf_counter() - start)
+    return size_mb / best
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='文本清理基准测试')
+    arg_parser.add_argument('--pdf-dir', default=None, help='额外的论文PDF目录（递归查找）')
+    arg_parser.add_argument('--synthetic-pages', type=int, default=200, help='合成页面数')
+    arg_parser.add_argument('--repeat', type=int, default=5, help='重复次数，取最快一次')
+    args = arg_parser.parse_args()
+
+    paper_pages = pdf_pages(find_pdfs(args.pdf_dir))
+    noisy_pages = synthetic_pages(args.synthetic_pages)
+    mismatches = check_equivalence(paper_pages + noisy_pages)
+    print(f'一致性检查: 论文 {len(paper_pages)} 页 + 合成 {len(noisy_pages)} 页, 不一致 {mismatches} 处')
+    if mismatches:
+        sys.exit(1)
+
+    cases = [
+        ('clean_pdf_text', legacy_clean_pdf_text, text_normalize.clean_pdf_text),
+        ('clean_pdf_text(keep_lines)', lambda p: legacy_clean_pdf_text(p, True),
+         lambda p: text_normalize.clean_pdf_text(p, True)),
+        ('clean_content', legacy_clean_content, text_normalize.clean_content),
+        ('filter_readable_lines', legacy_filter_readable_lines, text_normalize.filter_readable_lines),
+    ]
+    for corpus_name, pages in (('论文', paper_pages), ('合成', noisy_pages)):
+        if not pages:
+            continue
+        size_mb = sum(len(p.encode('utf-8')) for p in pages) / 1024 / 1024
+        print(f'{corpus_name}语料 {len(pages)} 页, {size_mb * 1024:.1f} KB:')
+        for name, legacy, new in cases:
+            legacy_rate = throughput(legacy, pages, size_mb, args.repeat)
+            new_rate = throughput(new, pages, size_mb, args.repeat)
+            print(f'  {name:<28} 旧实现 {legacy_rate:8.1f} MB/s  新实现 {new_rate:8.1f} MB/s  '
+                  f'加速比 {new_rate / legacy_rate:.1f}x')
+
+        per_page = throughput(lambda _: '\n'.join(legacy_clean_pdf_text(p, True) for p in pages),
+                              [None], size_mb, args.repeat)
+        batched = throughput(lambda _: text_normalize.clean_pages(pages), [None], size_mb, args.repeat)
+        print(f'  {"clean_pages（整篇批量）":<24} 逐页清理 {per_page:8.1f} MB/s  批量 {batched:8.1f} MB/s  '
+              f'加速比 {batched / per_page:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -23,8 +23,42 @@ class Config:
     MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50MB
     ALLOWED_EXTENSIONS = {'pdf'}
 
+    # 批量上传配置（/api/paper/upload/batch）
+    UPLOAD_BATCH_MAX_FILES = int(os.environ.get('UPLOAD_BATCH_MAX_FILES', 50))  # 单次最多文件数
+    UPLOAD_BATCH_MAX_SIZE = int(os.environ.get('UPLOAD_BATCH_MAX_SIZE', 500)) * 1024 * 1024  # 单次请求总大小（MB）
+
+    # 分块上传配置（/api/paper/upload/chunked）
+    UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 5)) * 1024 * 1024  # 单个分块上限（MB）
+    UPLOAD_SESSION_TTL = int(os.environ.get('UPLOAD_SESSION_TTL', 86400))  # 未完成的上传保留时长（秒）
+
+    # 后台任务队列配置（worker.py 独立进程消费 jobs 表）
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))  # worker 进程数
+    JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 1.0))  # 空闲时轮询间隔（秒）
+    JOB_STALE_TIMEOUT = int(os.environ.get('JOB_STALE_TIMEOUT', 900))  # running 任务超过该时长没有心跳（进度写入）视为 worker 已退出，重新入队
+    JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+    JOB_IO_THREADS = int(os.environ.get('JOB_IO_THREADS', 4))  # 每个 worker 进程中执行生成任务（等待模型响应）的线程数
+
+    # 解析进度事件流（/api/paper/<id>/events）
+    EVENT_POLL_INTERVAL = float(os.environ.get('EVENT_POLL_INTERVAL', 0.5))  # 中继线程读取进度的间隔（秒）
+    EVENT_HEARTBEAT_INTERVAL = 15  # 心跳间隔（秒）
+    EVENT_STREAM_TIMEOUT = 600  # 单个连接最长保持时间（秒），客户端会自动重连
+
+    # PDF解析配置：进程数大于1时按页分块并行提取文本
+    PDF_PARSE_WORKERS = int(os.environ.get('PDF_PARSE_WORKERS', 1))
+    PDF_PARSE_CHUNK_SIZE = int(os.environ.get('PDF_PARSE_CHUNK_SIZE', 10))  # 每批页数
+
+    # 解析内存：按页抽样跟踪解析器自身的分配（不看整个进程的RSS），章节提取的全文超过阈值时转存临时文件
+    PDF_MEMORY_BUDGET = int(os.environ.get('PDF_MEMORY_BUDGET_MB', 256)) * 1024 * 1024  # 单页提取内存预算，0 不检查
+    PDF_MEMORY_SAMPLE_EVERY = int(os.environ.get('PDF_MEMORY_SAMPLE_EVERY', 25))  # 每隔多少页抽样一次
+    PDF_SPILL_THRESHOLD = int(os.environ.get('PDF_SPILL_THRESHOLD_MB', 4)) * 1024 * 1024  # 字符数
+
+    # AI元数据提取：默认并发调用（标题作者/摘要关键词），可改为单次调用返回全部字段
+    PDF_AI_SINGLE_CALL = os.environ.get('PDF_AI_SINGLE_CALL', 'false').lower() == 'true'
+    PDF_AI_CALL_DEADLINE = float(os.environ.get('PDF_AI_CALL_DEADLINE', 20))  # 单次调用截止时间（秒）
+
     # 智谱AI配置
     ZHIPUAI_API_KEY = os.environ.get('ZHIPUAI_API_KEY') or ''
+    LLM_HTTP_POOL_SIZE = int(os.environ.get('LLM_HTTP_POOL_SIZE', 10))  # 每个进程共享客户端的长连接池大小
 
     # 支持的AI模型
     AI_MODELS = {
@@ -55,9 +89,32 @@ class Config:
         }
     }
 
+    # 各生成任务中论文内容（章节、正文节选、逐页文本）的token预算，
+    # 实际预算不超过模型上下文减去输出长度和提示词余量（见 app/services/chunker.py）
+    AI_INPUT_TOKEN_BUDGETS = {
+        'mindmap': 3000,    # 只含章节标题
+        'timeline': 6000,
+        'graph': 5000,
+        'summary': 8000,
+        'review': 2000,
+        'translate': 2000,  # 每个翻译分段（页或章节）的原文，超出时按行拆分为多段
+        'chat': 6000        # 多篇论文共用
+    }
+
     # 默认模型
     DEFAULT_AI_MODEL = os.environ.get('DEFAULT_AI_MODEL') or 'glm-4-flash'
 
+    # 生成结果缓存（/api/generate/*，按论文内容哈希共享）
+    GENERATION_CACHE_TTL = int(os.environ.get('GENERATION_CACHE_TTL', 7 * 86400))  # 超过该时长未使用即过期（秒），0 不缓存
+    GENERATION_CACHE_MAX_ENTRIES = int(os.environ.get('GENERATION_CACHE_MAX_ENTRIES', 5000))  # 超出时淘汰最久未使用的条目
+
+    # 一键生成（/api/generate/all）：同时调用模型的生成类型数
+    GENERATE_ALL_CONCURRENCY = int(os.environ.get('GENERATE_ALL_CONCURRENCY', 3))
+
+    # 翻译（按页或章节分段并发翻译）：每个翻译任务同时翻译的分段数、每分钟最多发起的模型调用数（0 不限制）
+    TRANSLATE_CONCURRENCY = int(os.environ.get('TRANSLATE_CONCURRENCY', 4))
+    TRANSLATE_REQUESTS_PER_MINUTE = int(os.environ.get('TRANSLATE_REQUESTS_PER_MINUTE', 0))
+
     # CORS配置
     # 从环境变量读取前端URL，支持多个域名（逗号分隔）
     frontend_url = os.environ.get('FRONTEND_URL', '')
@@ -43,6 +43,8 @@ echo.
 echo Starting Flask server...
 echo Server: http://localhost:5000
 echo.
+REM Background parse worker (separate window)
+start "worker" %PYTHON_CMD% worker.py
 %PYTHON_CMD% run.py
 
 pause
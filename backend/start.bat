@@ -44,6 +44,8 @@ echo.
 echo Server: http://localhost:5000
 echo Press Ctrl+C to stop
 echo.
+REM Background parse worker (separate window)
+start "worker" python worker.py
 python run.py
 
 pause
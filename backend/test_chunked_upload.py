@@ -0,0 +1,58 @@
+import io
+
+import pytest
+
+from test_job_queue import app  # noqa: F401 复用测试应用
+from app.models import db, UploadSession
+from app.services import chunked_upload
+
+
+class _ReentrantStream(io.BytesIO):
+    """读取第一块数据时发起同一位置的重复写入，模拟客户端超时后重试与原请求并发"""
+
+    def __init__(self, data, on_first_read):
+        super().__init__(data)
+        self.on_first_read = on_first_read
+
+    def read(self, size=-1):
+        if self.on_first_read:
+            callback, self.on_first_read = self.on_first_read, None
+            callback()
+        return super().read(size)
+
+
+def test_concurrent_chunk_at_same_offset_is_rejected(app):
+    folder = app.config['UPLOAD_FOLDER']
+    session = chunked_upload.create_session(1, 'a.pdf', 8, folder)
+    db.session.commit()
+
+    def retry():
+        with pytest.raises(chunked_upload.ChunkInProgressError) as exc:
+            chunked_upload.append_chunk(db.session.get(UploadSession, session.id), io.BytesIO(b'xxxx'), 0, folder)
+        assert exc.value.received == 0
+
+    assert chunked_upload.append_chunk(session, _ReentrantStream(b'abcd', retry), 0, folder) == 4
+    assert chunked_upload.append_chunk(session, io.BytesIO(b'efgh'), 4, folder) == 8
+
+    with pytest.raises(chunked_upload.OffsetMismatchError) as exc:
+        chunked_upload.append_chunk(session, io.BytesIO(b'abcd'), 0, folder)
+    assert exc.value.received == 8
+
+    with open(chunked_upload.part_path(folder, session.id), 'rb') as f:
+        assert f.read() == b'abcdefgh'
+    assert db.session.get(UploadSession, session.id).writer is None
+
+
+def test_failed_chunk_releases_the_write_claim(app):
+    from app.services.blob_store import FileTooLargeError
+
+    folder = app.config['UPLOAD_FOLDER']
+    session = chunked_upload.create_session(1, 'a.pdf', 4, folder)
+    db.session.commit()
+
+    with pytest.raises(FileTooLargeError):
+        chunked_upload.append_chunk(session, io.BytesIO(b'abcdefgh'), 0, folder)
+
+    session = db.session.get(UploadSession, session.id)
+    assert session.writer is None and session.received == 0
+    assert chunked_upload.append_chunk(session, io.BytesIO(b'abcd'), 0, folder) == 4
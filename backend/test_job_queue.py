@@ -0,0 +1,116 @@
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import pytest
+
+from config import Config, config
+from app import create_app
+from app.models import db, User, Paper, Job, GenerateRecord
+from app.services import generate_tasks, job_queue, paper_tasks  # noqa: F401 注册任务处理函数
+
+
+@pytest.fixture
+def app():
+    tmp = tempfile.mkdtemp()
+
+    class TestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tmp, 'app.db')
+        UPLOAD_FOLDER = os.path.join(tmp, 'uploads')
+
+    config['test_job_queue'] = TestConfig
+    app = create_app('test_job_queue')
+    with app.app_context():
+        user = User(username='alice', email='alice@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Paper(user_id=user.id, filename='a.pdf', filepath='a.pdf', filesize=1, status='parsed'))
+        db.session.commit()
+        yield app
+        db.session.remove()
+
+
+def _claim_and_abandon(kind):
+    """领取任务后让心跳过期，模拟 worker 执行中被强杀"""
+    job = job_queue.claim_next('dead-worker', [kind])
+    Job.query.filter_by(id=job.id).update({'heartbeat_at': datetime.utcnow() - timedelta(seconds=120)})
+    db.session.commit()
+    return job.id
+
+
+def _record(gen_type):
+    record = GenerateRecord(user_id=1, paper_id=1, type=gen_type, status='pending')
+    db.session.add(record)
+    db.session.flush()
+    return record
+
+
+def test_reclaimed_generate_job_fails_its_record(app):
+    record = _record('summary')
+    generate_tasks.enqueue_generation(record, 'glm-4-flash')
+    db.session.commit()
+
+    job_id = _claim_and_abandon('generate')
+    assert job_queue.requeue_stale(60) == 1
+
+    assert db.session.get(Job, job_id).status == 'failed'
+    record = db.session.get(GenerateRecord, record.id)
+    assert record.status == 'failed'
+    assert '超时未完成' in record.error_message
+
+
+def test_reclaimed_generate_all_job_fails_unfinished_records(app):
+    records = [_record('mindmap'), _record('timeline')]
+    records[0].status = 'completed'
+    generate_tasks.enqueue_generate_all(records, 'glm-4-flash')
+    db.session.commit()
+
+    _claim_and_abandon('generate_all')
+    job_queue.requeue_stale(60)
+
+    assert [db.session.get(GenerateRecord, r.id).status for r in records] == ['completed', 'failed']
+
+
+def test_reclaimed_parse_job_fails_the_paper(app):
+    paper = Paper(user_id=1, filename='b.pdf', filepath='b.pdf', filesize=1, status='parsing')
+    db.session.add(paper)
+    db.session.flush()
+    job_queue.enqueue('parse', paper_id=paper.id, max_attempts=1)
+    db.session.commit()
+
+    _claim_and_abandon('parse')
+    job_queue.requeue_stale(60)
+
+    paper = db.session.get(Paper, paper.id)
+    assert paper.status == 'failed'
+    assert '超时未完成' in paper.error_message
+
+
+def test_paper_snapshot_ignores_generation_jobs(app):
+    from app.services.event_bus import is_finished, paper_snapshot
+
+    paper = db.session.get(Paper, 1)
+    paper.sections_ready = True
+    generate_tasks.enqueue_generation(_record('summary'), 'glm-4-flash')
+    db.session.commit()
+
+    snapshot = paper_snapshot([1])[1]
+    assert snapshot['job'] is None
+    assert is_finished(snapshot)
+
+
+def test_paper_snapshot_finishes_when_sections_job_failed(app):
+    from app.services.event_bus import is_finished, paper_snapshot
+
+    job_queue.enqueue('sections', paper_id=1, max_attempts=1)
+    db.session.commit()
+    assert not is_finished(paper_snapshot([1])[1])
+
+    Job.query.filter_by(kind='sections').update({'status': 'failed'})
+    db.session.commit()
+    snapshot = paper_snapshot([1])[1]
+    assert is_finished(snapshot)
+    assert snapshot['sectionsReady'] is False
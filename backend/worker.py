@@ -0,0 +1,15 @@
+import argparse
+import os
+from dotenv import load_dotenv
+from app.services.job_queue import run_worker_pool
+
+# 加载 .env 文件
+load_dotenv()
+
+if __name__ == '__main__':
+    # 后台任务 worker：消费 jobs 表中的解析任务，与 Web 进程分开部署
+    arg_parser = argparse.ArgumentParser(description='后台任务 worker')
+    arg_parser.add_argument('--workers', type=int, default=int(os.getenv('JOB_WORKERS', 2)), help='worker 进程数')
+    args = arg_parser.parse_args()
+
+    run_worker_pool(os.getenv('FLASK_CONFIG', 'development'), args.workers)
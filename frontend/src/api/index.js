@@ -1,5 +1,117 @@
 import request from '@/utils/request'
 
+// 等待后台生成任务结束：订阅生成记录的事件流，连接失败时改为每2秒轮询，完成后返回记录详情
+export function waitForRecord(recordId) {
+  const baseURL = import.meta.env.VITE_API_BASE_URL || '/api'
+  const token = localStorage.getItem('token') || ''
+
+  const finish = async (resolve, reject) => {
+    const res = await request({ url: `/generate/record/${recordId}`, method: 'get' })
+    if (res.data.status === 'completed') {
+      resolve(res.data)
+      return true
+    }
+    if (res.data.status === 'failed') {
+      reject(new Error(res.data.errorMessage || '生成失败'))
+      return true
+    }
+    return false
+  }
+
+  return new Promise((resolve, reject) => {
+    const poll = () => {
+      finish(resolve, reject)
+        .then((done) => { if (!done) setTimeout(poll, 2000) })
+        .catch(reject)
+    }
+
+    const source = new EventSource(`${baseURL}/generate/record/${recordId}/events?token=${encodeURIComponent(token)}`)
+    source.addEventListener('done', () => {
+      source.close()
+      poll()
+    })
+    source.onerror = () => {
+      source.close()
+      poll()
+    }
+  })
+}
+
+// 提交生成请求：命中缓存时直接返回结果，加入队列（202）时等待生成完成，返回结构相同
+async function runGeneration(url, data) {
+  const res = await request({ url, method: 'post', data })
+  if (res.code !== 202) {
+    return res
+  }
+  const record = await waitForRecord(res.data.recordId)
+  return {
+    ...res,
+    code: 200,
+    data: { recordId: record.id, content: record.content, cached: false }
+  }
+}
+
+// 流式请求（请求体带 stream: true）：服务端以 Server-Sent Events 逐段返回模型输出，
+// 每段调用 onDelta(text)，其他事件调用 onEvent(event, data)，结束时返回 done 事件的数据；
+// 服务端直接返回 JSON 时（如命中缓存）返回其中的 data
+export async function streamRequest(url, data, onDelta, onEvent) {
+  const baseURL = import.meta.env.VITE_API_BASE_URL || '/api'
+  const token = localStorage.getItem('token') || ''
+  const response = await fetch(`${baseURL}${url}`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      Authorization: `Bearer ${token}`
+    },
+    body: JSON.stringify({ ...data, stream: true })
+  })
+
+  if (!(response.headers.get('Content-Type') || '').includes('text/event-stream')) {
+    const res = await response.json().catch(() => ({}))
+    if (!response.ok || res.code !== 200) {
+      throw new Error(res.message || '请求失败')
+    }
+    return res.data
+  }
+
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  for (;;) {
+    const { value, done } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+
+    let boundary
+    while ((boundary = buffer.indexOf('\n\n')) >= 0) {
+      const message = buffer.slice(0, boundary)
+      buffer = buffer.slice(boundary + 2)
+
+      let event = 'message'
+      let payload = ''
+      for (const line of message.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim()
+        else if (line.startsWith('data:')) payload += line.slice(5).trim()
+      }
+      if (!payload) continue
+
+      const body = JSON.parse(payload)
+      if (event === 'delta') {
+        onDelta?.(body.text)
+      } else if (event === 'done') {
+        reader.cancel()
+        return body
+      } else if (event === 'error') {
+        reader.cancel()
+        throw new Error(body.message || '请求失败')
+      } else {
+        onEvent?.(event, body)
+      }
+    }
+  }
+  throw new Error('连接已断开，请重试')
+}
+
 // 用户相关接口
 export const userApi = {
   // 登录
@@ -78,6 +190,67 @@ export const paperApi = {
     })
   },
 
+  // 分块上传论文：逐块发送原始字节，网络中断时查询已接收位置后续传
+  async uploadPaperChunked(file, { onProgress, maxRetries = 3 } = {}) {
+    const init = await request({
+      url: '/paper/upload/chunked',
+      method: 'post',
+      data: { filename: file.name, size: file.size }
+    })
+    const { uploadId, chunkSize } = init.data
+    let offset = 0
+    let retries = 0
+
+    while (offset < file.size) {
+      try {
+        const res = await request({
+          url: `/paper/upload/chunked/${uploadId}`,
+          method: 'put',
+          params: { offset },
+          data: file.slice(offset, offset + chunkSize),
+          headers: {
+            'Content-Type': 'application/octet-stream'
+          }
+        })
+        offset = res.data.received
+        retries = 0
+        onProgress?.(Math.round(offset / file.size * 100))
+      } catch (error) {
+        if (++retries > maxRetries) throw error
+        // 上一次发送的分块可能仍在写入（409），稍等后再查询进度
+        await new Promise(resolve => setTimeout(resolve, 1000 * retries))
+        // 以服务端已接收的字节数为准继续
+        const status = await request({ url: `/paper/upload/chunked/${uploadId}`, method: 'get' })
+        offset = status.data.received
+      }
+    }
+
+    return request({
+      url: `/paper/upload/chunked/${uploadId}/finalize`,
+      method: 'post'
+    })
+  },
+
+  // 批量上传论文（formData 中多个 files 字段）
+  uploadPaperBatch(formData) {
+    return request({
+      url: '/paper/upload/batch',
+      method: 'post',
+      data: formData,
+      headers: {
+        'Content-Type': 'multipart/form-data'
+      }
+    })
+  },
+
+  // 获取批量上传的汇总状态
+  getUploadBatch(batchId) {
+    return request({
+      url: `/paper/upload/batch/${batchId}`,
+      method: 'get'
+    })
+  },
+
   // 获取论文列表
   getPaperList(params) {
     return request({
@@ -95,6 +268,14 @@ export const paperApi = {
     })
   },
 
+  // 获取单个章节的完整内容（详情只返回章节预览）
+  getPaperSection(id, ordinal) {
+    return request({
+      url: `/paper/${id}/sections/${ordinal}`,
+      method: 'get'
+    })
+  },
+
   // 删除论文
   deletePaper(id) {
     return request({
@@ -103,11 +284,12 @@ export const paperApi = {
     })
   },
 
-  // 解析论文
-  parsePaper(id) {
+  // 解析论文（stages: 要重算的阶段，逗号分隔或 all；不传时只重算版本过期的阶段）
+  parsePaper(id, stages) {
     return request({
       url: `/paper/${id}/parse`,
-      method: 'post'
+      method: 'post',
+      params: stages ? { stages } : {}
     })
   },
 
@@ -115,6 +297,19 @@ export const paperApi = {
   getPaperViewUrl(id) {
     const baseURL = import.meta.env.VITE_API_BASE_URL || '/api'
     return `${baseURL}/paper/${id}/view`
+  },
+
+  // 订阅解析进度事件（Server-Sent Events），返回 EventSource，用完需调用 close()
+  subscribePaperEvents(id, { onProgress, onDone } = {}) {
+    const baseURL = import.meta.env.VITE_API_BASE_URL || '/api'
+    const token = localStorage.getItem('token') || ''
+    const source = new EventSource(`${baseURL}/paper/${id}/events?token=${encodeURIComponent(token)}`)
+    source.addEventListener('progress', (event) => onProgress?.(JSON.parse(event.data)))
+    source.addEventListener('done', (event) => {
+      source.close()
+      onDone?.(JSON.parse(event.data))
+    })
+    return source
   }
 }
 
@@ -122,46 +317,46 @@ export const paperApi = {
 export const generateApi = {
   // 生成思维导图
   generateMindMap(data) {
-    return request({
-      url: '/generate/mindmap',
-      method: 'post',
-      data
-    })
+    return runGeneration('/generate/mindmap', data)
   },
 
   // 生成时间线
   generateTimeline(data) {
-    return request({
-      url: '/generate/timeline',
-      method: 'post',
-      data
-    })
+    return runGeneration('/generate/timeline', data)
   },
 
   // 生成概念图谱
   generateGraph(data) {
-    return request({
-      url: '/generate/graph',
-      method: 'post',
-      data
-    })
+    return runGeneration('/generate/graph', data)
   },
 
   // 生成核心观点
   generateSummary(data) {
-    return request({
-      url: '/generate/summary',
-      method: 'post',
-      data
-    })
+    return runGeneration('/generate/summary', data)
+  },
+
+  // 流式生成论文阅读报告：onDelta 逐段接收模型输出，返回 {recordId, content, cached}
+  streamSummary(data, onDelta) {
+    return streamRequest('/generate/summary', data, onDelta)
   },
 
   // 生成论文评审报告
   generateReview(data) {
+    return runGeneration('/generate/review', data)
+  },
+
+  // 一键生成全部内容：每个类型完成时调用 onResult({recordId, type, status, content, errorMessage, cached})
+  generateAll(data, onResult) {
+    return streamRequest('/generate/all', data, null, (event, body) => {
+      if (event === 'result') onResult?.(body)
+    })
+  },
+
+  // 获取生成记录（后台任务的状态和结果）
+  getGenerateRecord(id) {
     return request({
-      url: '/generate/review',
-      method: 'post',
-      data
+      url: `/generate/record/${id}`,
+      method: 'get'
     })
   },
 
@@ -215,7 +410,7 @@ export const exportApi = {
 
 // 对话相关接口
 export const chatApi = {
-  // 翻译论文
+  // 翻译论文（后台任务，返回 recordId；分段译文通过 getTranslationSegments 逐段读取）
   translatePaper(data) {
     return request({
       url: '/chat/translate',
@@ -224,6 +419,15 @@ export const chatApi = {
     })
   },
 
+  // 获取翻译分段：since 为上次返回的 serverTime，只返回之后更新的分段
+  getTranslationSegments(recordId, since) {
+    return request({
+      url: `/chat/translate/${recordId}/segments`,
+      method: 'get',
+      params: since ? { since } : {}
+    })
+  },
+
   // 与所有论文对话
   chatWithPapers(data) {
     return request({
@@ -242,6 +446,16 @@ export const chatApi = {
     })
   },
 
+  // 与所有论文对话（流式）：onDelta 逐段接收回答，返回 {answer, papersCount}
+  streamChatWithPapers(data, onDelta) {
+    return streamRequest('/chat/papers', data, onDelta)
+  },
+
+  // 与单篇论文对话（流式）
+  streamChatWithPaper(paperId, data, onDelta) {
+    return streamRequest(`/chat/papers/${paperId}`, data, onDelta)
+  },
+
   // 获取知识库列表
   getKnowledgeBases() {
     return request({